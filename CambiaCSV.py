@@ -1,9 +1,14 @@
 import streamlit as st
 import pandas as pd
-import re
-from io import BytesIO
+import os
+import tempfile
 from datetime import datetime
 import pytz
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from catalogo import id_sesion
+from reservas import sesion_terminada
 
 st.set_page_config(
     page_title="Convertidor de CSV a Excel",
@@ -13,65 +18,206 @@ st.set_page_config(
 
 st.title("📁 Convertidor de CSV")
 
-def limpiar_id(valor):
-    if pd.isnull(valor):
-        return ""
-    return str(valor).replace('.', '')
+# Filas que se procesan por vez: la memoria usada depende de esto, no del tamaño del CSV
+TAMAÑO_BLOQUE = 20000
+FILAS_VISTA_PREVIA = 100
 
-def convertir_a_excel(df):
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Hoja1')
-    return buffer.getvalue()
+# Archivos convertidos, uno por sesión y tipo: '<sesión>_<tipo>_....<ext>'
+DIRECTORIO_CONVERSIONES = os.path.join(tempfile.gettempdir(), 'soop_conversiones')
 
-def procesar_archivo(uploaded_file, tipo, columnas_a_renombrar, columnas_a_eliminar, columnas_a_agregar, columnas_id):
-    if uploaded_file is not None:
-        try:
-            df = pd.read_csv(
-                uploaded_file,
-                encoding='ISO-8859-1',
-                sep=';',
-                on_bad_lines='skip',
-                dtype=str
-            )
-            df.columns = df.columns.str.strip().str.replace(r'\s+', ' ', regex=True)
-            
-            # Verificar el nombre exacto de la columna y corregirlo
-            for col in df.columns:
-                if 'Precio Jugueterias' in col and 'face' in col:
-                    df.rename(columns={col: 'Precio Venta'}, inplace=True)
-                    break
+FORMATOS_SALIDA = {
+    'Excel (.xlsx)': ('.xlsx', "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'CSV (.csv)': ('.csv', "text/csv"),
+    'Parquet (.parquet)': ('.parquet', "application/octet-stream"),
+}
 
-            st.write(f"🔍 **Columnas encontradas en {tipo}:**")
-            st.write(df.columns.tolist())
+# Quita los puntos de miles de una columna de IDs (vacío si no hay valor)
+def limpiar_ids(serie):
+    return serie.str.replace('.', '', regex=False).fillna('')
+
+# Decide, a partir de los encabezados del CSV, cómo queda cada bloque:
+# nombres normalizados, renombres, columnas a borrar y columnas a agregar
+def armar_plan_columnas(columnas, columnas_a_renombrar, columnas_a_eliminar, columnas_a_agregar, columnas_id):
+    columnas = pd.Index(columnas).str.strip().str.replace(r'\s+', ' ', regex=True)
+    renombres = dict(columnas_a_renombrar)
+    # Verificar el nombre exacto de la columna y corregirlo
+    for col in columnas:
+        if 'Precio Jugueterias' in col and 'face' in col:
+            renombres = {col: 'Precio Venta', **{k: v for k, v in renombres.items() if k != col}}
+            break
+    columnas_finales = [renombres.get(col, col) for col in columnas]
+    columnas_finales = [col for col in columnas_finales if col not in columnas_a_eliminar]
+    columnas_finales += [col for col in columnas_a_agregar if col not in columnas_finales]
+    return {
+        'originales': columnas.tolist(),
+        'ids': [col for col in columnas_id if col in columnas],
+        'renombres': renombres,
+        'finales': columnas_finales,
+    }
+
+def transformar_bloque(bloque, plan):
+    bloque.columns = plan['originales']
+    for columna in plan['ids']:
+        bloque[columna] = limpiar_ids(bloque[columna])
+    bloque = bloque.rename(columns=plan['renombres'])
+    # Las columnas agregadas quedan vacías
+    return bloque.reindex(columns=plan['finales'], fill_value='')
+
+# ===============================
+# Escritores por Formato (de a un bloque)
+# ===============================
+
+class EscritorExcel:
+    def __init__(self, ruta, columnas):
+        self.ruta = ruta
+        # Modo solo escritura: las filas van al archivo sin quedar en memoria
+        self.libro = Workbook(write_only=True)
+        self.hoja = self.libro.create_sheet('Hoja1')
+        self.hoja.append(columnas)
+
+    def escribir(self, bloque):
+        valores = bloque.astype(object).where(bloque.notna(), None)
+        for fila in valores.itertuples(index=False, name=None):
+            self.hoja.append(fila)
+
+    def cerrar(self):
+        self.libro.save(self.ruta)
+
+class EscritorCSV:
+    def __init__(self, ruta, columnas):
+        self.archivo = open(ruta, 'w', encoding='ISO-8859-1', newline='')
+        pd.DataFrame(columns=columnas).to_csv(self.archivo, sep=';', index=False)
 
-            for columna in columnas_id:
-                if columna in df.columns:
-                    df[columna] = df[columna].apply(limpiar_id)
+    def escribir(self, bloque):
+        bloque.to_csv(self.archivo, sep=';', index=False, header=False)
 
-            if columnas_a_renombrar:
-                df = df.rename(columns=columnas_a_renombrar)
+    def cerrar(self):
+        self.archivo.close()
 
-            if columnas_a_eliminar:
-                df = df.drop(columns=[col for col in columnas_a_eliminar if col in df.columns], errors='ignore')
+class EscritorParquet:
+    def __init__(self, ruta, columnas):
+        # Todo es texto (el CSV se lee con dtype=str)
+        self.esquema = pa.schema([(col, pa.string()) for col in columnas])
+        self.escritor = pq.ParquetWriter(ruta, self.esquema)
 
-            for columna in columnas_a_agregar:
-                if columna not in df.columns:
-                    df[columna] = ''
+    def escribir(self, bloque):
+        self.escritor.write_table(pa.Table.from_pandas(bloque, schema=self.esquema, preserve_index=False))
 
-            st.write(f"📊 **Archivo de {tipo} modificado:**")
-            st.dataframe(df)
+    def cerrar(self):
+        self.escritor.close()
+
+ESCRITORES = {'.xlsx': EscritorExcel, '.csv': EscritorCSV, '.parquet': EscritorParquet}
+
+# ===============================
+# Archivos Convertidos
+# ===============================
+
+# Borra los archivos de las sesiones que ya terminaron (pestaña cerrada o
+# servidor reiniciado), que nadie va a descargar
+def limpiar_conversiones_terminadas():
+    if not os.path.isdir(DIRECTORIO_CONVERSIONES):
+        return
+    for nombre in os.listdir(DIRECTORIO_CONVERSIONES):
+        sesion = nombre.split('_', 1)[0]
+        if sesion_terminada(sesion):
+            try:
+                os.remove(os.path.join(DIRECTORIO_CONVERSIONES, nombre))
+            except FileNotFoundError:
+                pass
+
+# Olvida la conversión de un tipo y borra su archivo
+def descartar_conversion(tipo):
+    anterior = st.session_state.get('conversiones', {}).pop(tipo, None)
+    if anterior is not None and os.path.exists(anterior['ruta']):
+        os.remove(anterior['ruta'])
+
+# Convierte el CSV bloque por bloque a un archivo temporal.
+# Devuelve (ruta, columnas originales, vista previa, cantidad de filas).
+def convertir_por_bloques(uploaded_file, tipo, extension, columnas_a_renombrar, columnas_a_eliminar, columnas_a_agregar, columnas_id, avance):
+    uploaded_file.seek(0)
+    lector = pd.read_csv(
+        uploaded_file,
+        encoding='ISO-8859-1',
+        sep=';',
+        on_bad_lines='skip',
+        dtype=str,
+        chunksize=TAMAÑO_BLOQUE
+    )
+    os.makedirs(DIRECTORIO_CONVERSIONES, exist_ok=True)
+    descriptor, ruta = tempfile.mkstemp(suffix=extension, prefix=f"{id_sesion()}_{tipo.lower()}_", dir=DIRECTORIO_CONVERSIONES)
+    os.close(descriptor)
+    plan = None
+    escritor = None
+    vista_previa = None
+    filas = 0
+    try:
+        for bloque in lector:
+            if plan is None:
+                plan = armar_plan_columnas(bloque.columns, columnas_a_renombrar, columnas_a_eliminar, columnas_a_agregar, columnas_id)
+                escritor = ESCRITORES[extension](ruta, plan['finales'])
+            bloque = transformar_bloque(bloque, plan)
+            if vista_previa is None:
+                vista_previa = bloque.head(FILAS_VISTA_PREVIA)
+            escritor.escribir(bloque)
+            filas += len(bloque)
+            avance.write(f"⏳ {filas:,} filas procesadas...")
+        if plan is None:
+            raise ValueError("el archivo está vacío")
+        escritor.cerrar()
+    except Exception:
+        os.remove(ruta)
+        raise
+    return ruta, plan['originales'], vista_previa, filas
+
+# Convierte una sola vez por archivo subido y formato; las siguientes
+# recargas de la página reutilizan el resultado guardado en la sesión
+def procesar_archivo(uploaded_file, tipo, columnas_a_renombrar, columnas_a_eliminar, columnas_a_agregar, columnas_id):
+    if uploaded_file is not None:
+        try:
+            formato = st.selectbox("Formato de salida", list(FORMATOS_SALIDA), key=f"formato_{tipo}")
+            extension, mime = FORMATOS_SALIDA[formato]
+
+            conversiones = st.session_state.setdefault('conversiones', {})
+            clave = (uploaded_file.file_id, extension)
+            anterior = conversiones.get(tipo)
+            if anterior is None or anterior['clave'] != clave or not os.path.exists(anterior['ruta']):
+                # Antes de escribir uno nuevo se borran el anterior de esta
+                # sesión y los que dejaron las sesiones terminadas
+                descartar_conversion(tipo)
+                limpiar_conversiones_terminadas()
+                avance = st.empty()
+                ruta, columnas, vista_previa, filas = convertir_por_bloques(
+                    uploaded_file, tipo, extension, columnas_a_renombrar, columnas_a_eliminar, columnas_a_agregar, columnas_id, avance
+                )
+                avance.empty()
+                timestamp = datetime.now(pytz.timezone('America/Argentina/Buenos_Aires')).strftime("%Y%m%d_%H%M%S")
+                conversiones[tipo] = {
+                    'clave': clave,
+                    'ruta': ruta,
+                    'columnas': columnas,
+                    'vista_previa': vista_previa,
+                    'filas': filas,
+                    'file_name': f"archivo_modificado_{tipo.lower()}_{timestamp}{extension}",
+                }
+            conversion = conversiones[tipo]
+
+            st.write(f"🔍 **Columnas encontradas en {tipo}:**")
+            st.write(conversion['columnas'])
 
-            excel = convertir_a_excel(df)
-            timestamp = datetime.now(pytz.timezone('America/Argentina/Buenos_Aires')).strftime("%Y%m%d_%H%M%S")
-            file_name = f"archivo_modificado_{tipo.lower()}_{timestamp}.xlsx"
+            st.write(f"📊 **Archivo de {tipo} modificado** ({conversion['filas']:,} filas, se muestran las primeras {FILAS_VISTA_PREVIA}):")
+            st.dataframe(conversion['vista_previa'])
 
-            st.download_button(
-                label=f"📥 Descargar archivo modificado de {tipo}",
-                data=excel,
-                file_name=file_name,
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            # La conversión usa memoria acotada, pero st.download_button no
+            # transmite por partes: lee el archivo entero y lo guarda en la
+            # memoria del servidor mientras el botón esté en pantalla. Es el
+            # límite que queda para archivos muy grandes.
+            with open(conversion['ruta'], 'rb') as archivo:
+                st.download_button(
+                    label=f"📥 Descargar archivo modificado de {tipo}",
+                    data=archivo,
+                    file_name=conversion['file_name'],
+                    mime=mime
+                )
         except Exception as e:
             st.error(f"❌ Ocurrió un error al procesar el archivo de {tipo}: {e}")
 
@@ -89,18 +235,24 @@ if uploaded_file_productos is not None:
     columnas_id = ['Id']
 
     procesar_archivo(uploaded_file_productos, "Productos", columnas_a_renombrar, columnas_a_eliminar, columnas_a_agregar, columnas_id)
+else:
+    descartar_conversion("Productos")
 
 st.header("👥 Convertidor para CSV de Clientes")
 uploaded_file_clientes = st.file_uploader("📤 Subí tu archivo CSV de Clientes", type=["csv"], key="clientes_file")
 
 if uploaded_file_clientes is not None:
     procesar_archivo(uploaded_file_clientes, "Clientes", {}, [], [], ['Id', 'Id Cliente'])
+else:
+    descartar_conversion("Clientes")
 
 st.header("📦 Convertidor para CSV de Pedidos")
 uploaded_file_pedidos = st.file_uploader("📤 Subí tu archivo CSV de Pedidos", type=["csv"], key="pedidos_file")
 
 if uploaded_file_pedidos is not None:
     procesar_archivo(uploaded_file_pedidos, "Pedidos", {}, [], [], ['Id', 'Id Cliente'])
+else:
+    descartar_conversion("Pedidos")
 
 footer = """
 <style>
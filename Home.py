@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 from openpyxl import load_workbook, Workbook
 import json
 from datetime import datetime
@@ -11,6 +10,8 @@ from io import BytesIO
 import os
 import re
 from fpdf import FPDF  # Para la generación de PDF
+from catalogo import ARCHIVO_PRODUCTOS, ARCHIVO_CLIENTES, obtener_productos, obtener_clientes
+from repositorio import listar_equipo
 
 # ===============================
 # Configuración de la Página (ESTO DEBE IR AL PRINCIPIO)
@@ -25,71 +26,33 @@ st.set_page_config(page_title="🛍 Módulo de Ventas", layout="wide")
 if 'pedido' not in st.session_state:
     st.session_state.pedido = []
 
-# Inicializar 'df_productos' si no existe
-if 'df_productos' not in st.session_state:
-    file_path_productos = 'archivo_modificado_productos_20240928_201237.xlsx'  # Archivo de productos
-    if os.path.exists(file_path_productos):
-        try:
-            st.session_state.df_productos = pd.read_excel(file_path_productos)
-        except Exception as e:
-            st.error(f"Error al cargar el archivo de productos: {e}")
-            st.stop()
-    else:
-        st.warning(f"⚠️ El archivo {file_path_productos} no existe. Por favor, súbelo desde el módulo Productos.")
-        st.session_state.df_productos = pd.DataFrame()  # DataFrame vacío
-
-# Inicializar 'df_clientes' si no existe
-if 'df_clientes' not in st.session_state:
-    file_path_clientes = 'archivo_modificado_clientes_20240928_200050.xlsx'  # Archivo de clientes
-    if os.path.exists(file_path_clientes):
-        try:
-            st.session_state.df_clientes = pd.read_excel(file_path_clientes)
-        except Exception as e:
-            st.error(f"Error al cargar el archivo de clientes: {e}")
-            st.stop()
-    else:
-        st.warning(f"⚠️ El archivo {file_path_clientes} no existe. Por favor, súbelo desde el módulo Convertidor de CSV.")
-        st.session_state.df_clientes = pd.DataFrame()  # DataFrame vacío
-
-# Inicializar 'df_equipo' si no existe
+# Cargar el catálogo de productos compartido por todas las sesiones
+if os.path.exists(ARCHIVO_PRODUCTOS):
+    try:
+        obtener_productos()
+    except Exception as e:
+        st.error(f"Error al cargar el archivo de productos: {e}")
+        st.stop()
+else:
+    st.warning(f"⚠️ El archivo {ARCHIVO_PRODUCTOS} no existe. Por favor, súbelo desde el módulo Productos.")
+
+# Cargar la tabla de clientes compartida por todas las sesiones
+if os.path.exists(ARCHIVO_CLIENTES):
+    try:
+        obtener_clientes()
+    except Exception as e:
+        st.error(f"Error al cargar el archivo de clientes: {e}")
+        st.stop()
+else:
+    st.warning(f"⚠️ El archivo {ARCHIVO_CLIENTES} no existe. Por favor, súbelo desde el módulo Convertidor de CSV.")
+
+# Equipo de trabajo desde la base (la primera vez se importa equipo.xlsx)
 if 'df_equipo' not in st.session_state:
-    file_path_equipo = 'equipo.xlsx'
-    if os.path.exists(file_path_equipo):
-        try:
-            st.session_state.df_equipo = pd.read_excel(file_path_equipo)
-        except Exception as e:
-            st.error(f"Error al cargar el archivo de equipo: {e}")
-            st.stop()
-    else:
-        # Definir los miembros del equipo
-        data_equipo = {
-            'Nombre': [
-                'Joni', 'Eduardo', 'Johan', 'Martin',
-                'Marian', 'Sofi', 'Valen', 'Emily',
-                'Maria-Jose', 'Vasco'
-            ],
-            'Rol': [
-                'Presidente', 'Gerente General', 'Jefe de Depósito', 'Armar Pedidos',
-                'Vendedora', 'Vendedora', 'Vendedora', 'Vendedora',
-                'Fotógrafa y Catalogador', 'Super Admin'
-            ],
-            'Departamento': [
-                'Dirección', 'Dirección', 'Depósito', 'Depósito',
-                'Ventas', 'Ventas', 'Ventas', 'Ventas',
-                'Marketing', 'Dirección'
-            ],
-            'Nivel de Acceso': [
-                'Alto', 'Alto', 'Medio', 'Medio',
-                'Bajo', 'Bajo', 'Bajo', 'Bajo',
-                'Medio', 'Super Admin'
-            ]
-        }
-        st.session_state.df_equipo = pd.DataFrame(data_equipo)
-        # Guardar el DataFrame inicial en Excel
-        try:
-            st.session_state.df_equipo.to_excel(file_path_equipo, index=False)
-        except Exception as e:
-            st.error(f"Error al guardar el archivo de equipo: {e}")
+    try:
+        st.session_state.df_equipo = listar_equipo()
+    except Exception as e:
+        st.error(f"Error al cargar el equipo: {e}")
+        st.stop()
 
 # Inicializar 'usuario' en sesión si no existe
 if 'usuario' not in st.session_state:
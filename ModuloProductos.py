@@ -7,6 +7,23 @@ from io import BytesIO
 from datetime import datetime
 import pytz
 import os
+from openpyxl import load_workbook
+from base_datos import bloqueo_excel
+from cache_columnar import leer_excel, firma_archivo
+from indice_productos import IndiceProductos
+from buscador import MotorBusqueda, selector_busqueda
+from cache_imagenes import obtener_miniatura
+from motor_precios import (
+    cargar_reglas, guardar_reglas, calcular_precios, precios_producto, diferencias_precios, aplicar_precios,
+    cotizacion_dolar, sin_cotizacion
+)
+from importar_proveedor import cargar_proveedores, leer_lista_proveedor, importar_lista, FACTOR_COSTO_DUDOSO
+from tabla_paginada import tabla_paginada
+from cambios_productos import (
+    ALTA, MODIFICACION, BAJA, registrar_cambio, aplicar_cambio, aplicar_pendientes, cambios_pendientes,
+    historial_deshacer, deshacer_ultimo, debe_exportar,
+    exportar_cambios, exportar_cambios_en_segundo_plano, guardar_cambio_masivo
+)
 
 st.set_page_config(
     page_title="📁 Módulo Productos",
@@ -27,56 +44,117 @@ columnas_esperadas = [
     'Ultima Actualizacion'
 ]
 
+ARCHIVO_EXCEL = 'Produt2.xlsx'
+HOJA_PRODUCTOS = 'Productos'
+
+# Versión del formato de Produt2.xlsx. Se guarda en las propiedades del libro
+# (palabras clave) al migrarlo; si cambian las columnas esperadas hay que subirla.
+VERSION_ESQUEMA = 1
+MARCA_ESQUEMA = f"soop-productos-v{VERSION_ESQUEMA}"
+
+# El libro ya está en el formato actual si tiene la marca y los encabezados esperados.
+# Solo lee las propiedades y la primera fila, una vez por versión del archivo
+# (la firma cambia cada vez que se guarda), no en cada sesión nueva.
+@st.cache_resource(show_spinner=False, max_entries=4)
+def esquema_al_dia(excel_path, firma):
+    book = load_workbook(excel_path, read_only=True)
+    try:
+        encabezados = [celda.value for celda in next(book.worksheets[0].iter_rows(max_row=1), [])]
+        return book.properties.keywords == MARCA_ESQUEMA and encabezados == columnas_esperadas
+    finally:
+        book.close()
+
+# Guarda el catálogo con la marca de versión (así el próximo inicio no lo vuelve a migrar)
+def guardar_excel(df, excel_path=ARCHIVO_EXCEL):
+    temporal = f"{excel_path}.tmp.xlsx"
+    with bloqueo_excel:
+        with pd.ExcelWriter(temporal, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name=HOJA_PRODUCTOS)
+            writer.book.properties.keywords = MARCA_ESQUEMA
+        os.replace(temporal, excel_path)
+
+# Lleva un Produt2.xlsx viejo al formato actual: nombres de columnas, columnas
+# faltantes y orden. Corre una sola vez; volver a correrla no cambia nada.
+def migrar_excel(excel_path):
+    df = pd.read_excel(excel_path, engine='openpyxl')
+
+    # Normalizar nombres de columnas
+    columnas_actuales = df.columns.str.strip().str.lower()
+    mapeo_columnas = {
+        'precio jugueterias face': 'Precio Venta',
+        'precio': 'Precio x Mayor',
+        'costo fob': 'Costo (USD)',
+        'costo': 'Costo (Pesos)',
+        'id': 'id',
+        'id externo': 'id externo',
+        'ultimo costo (pesos)': 'Ultimo Costo (Pesos)',
+        'ultimo costo (usd)': 'Ultimo Costo (USD)'
+    }
+
+    for col_actual, col_esperada in mapeo_columnas.items():
+        if col_actual in columnas_actuales:
+            df.rename(columns={df.columns[columnas_actuales.get_loc(col_actual)]: col_esperada}, inplace=True)
+
+    # Añadir columnas faltantes
+    for col in columnas_esperadas:
+        if col not in df.columns:
+            df[col] = ''
+
+    # Reordenar columnas
+    df = df[columnas_esperadas]
+
+    # La fecha de actualización se completa solo donde falta: es por producto
+    df['Ultima Actualizacion'] = df['Ultima Actualizacion'].astype(object)
+    sin_fecha = df['Ultima Actualizacion'].isna() | (df['Ultima Actualizacion'].astype(str).str.strip() == '')
+    df.loc[sin_fecha, 'Ultima Actualizacion'] = datetime.now(pytz.timezone('America/Argentina/Buenos_Aires')).strftime("%Y-%m-%d %H:%M:%S")
+
+    guardar_excel(df, excel_path)
+    return df
+
+# Abrir la página solo lee el catálogo (desde la caché columnar mientras el
+# Excel no cambie) y le aplica los cambios todavía no exportados. Se escribe
+# únicamente si el libro necesita migrarse.
 def cargar_excel():
-    excel_path = 'Produt2.xlsx'
+    excel_path = ARCHIVO_EXCEL
     if os.path.exists(excel_path):
         try:
-            df = pd.read_excel(excel_path, engine='openpyxl')
-            st.success("✅ **Archivo Excel leído correctamente.**")
-
-            # Normalizar nombres de columnas
-            columnas_actuales = df.columns.str.strip().str.lower()
-            mapeo_columnas = {
-                'precio jugueterias face': 'Precio Venta',
-                'precio': 'Precio x Mayor',
-                'costo fob': 'Costo (USD)',
-                'costo': 'Costo (Pesos)',
-                'id': 'id',
-                'id externo': 'id externo',
-                'ultimo costo (pesos)': 'Ultimo Costo (Pesos)',
-                'ultimo costo (usd)': 'Ultimo Costo (USD)'
-            }
-
-            for col_actual, col_esperada in mapeo_columnas.items():
-                if col_actual in columnas_actuales:
-                    df.rename(columns={df.columns[columnas_actuales.get_loc(col_actual)]: col_esperada}, inplace=True)
-
-            # Añadir columnas faltantes
-            for col in columnas_esperadas:
-                if col not in df.columns:
-                    df[col] = ''
-
-            # Reordenar columnas
-            df = df[columnas_esperadas]
+            if not esquema_al_dia(excel_path, firma_archivo(excel_path)):
+                df = migrar_excel(excel_path)
+                st.success(f"✅ Archivo '{excel_path}' actualizado al formato actual (versión {VERSION_ESQUEMA}).")
+                st.write("### Vista Previa de los Datos Convertidos:")
+                st.dataframe(df.head(10))
+            # Cada sesión edita su propia copia
+            return aplicar_pendientes(leer_excel(excel_path))
+        except Exception as e:
+            st.error(f"❌ Error al leer '{excel_path}': {e}")
+    else:
+        st.warning(f"⚠️ El archivo '{excel_path}' no se encontró en la carpeta raíz.")
+    return None
 
-            # Añadir o actualizar la columna de última actualización
-            df['Ultima Actualizacion'] = datetime.now(pytz.timezone('America/Argentina/Buenos_Aires')).strftime("%Y-%m-%d %H:%M:%S")
+# Próximo 'id' libre para un producto nuevo
+def siguiente_id(df):
+    ids = pd.to_numeric(df['id'], errors='coerce') if 'id' in df.columns else pd.Series(dtype=float)
+    return int(ids.max()) + 1 if ids.notna().any() else 1
 
-            # Guardar el DataFrame actualizado
-            df.to_excel('Produt2.xlsx', index=False, engine='openpyxl')
-            st.success("✅ Archivo 'Produt2.xlsx' actualizado con éxito.")
+# Quién hizo el cambio (si la sesión tiene usuario)
+def usuario_actual():
+    usuario = st.session_state.get('usuario')
+    return usuario.get('Nombre') if isinstance(usuario, dict) else usuario
 
-            st.write("### Vista Previa de los Datos Convertidos:")
-            st.dataframe(df.head(10))
+# Valor numérico de una celda, o None (las columnas que faltaban en el Excel se agregan vacías)
+def valor_numerico(producto, columna):
+    if producto is None or columna not in producto:
+        return None
+    valor = pd.to_numeric(producto[columna], errors='coerce')
+    return None if pd.isna(valor) else float(valor)
 
-            return df
-        except Exception as e:
-            st.error(f"❌ Error al leer 'Produt2.xlsx': {e}")
-    else:
-        st.warning("⚠️ El archivo 'Produt2.xlsx' no se encontró en la carpeta raíz.")
-    return None
+# Cada cambio al catálogo de la sesión sube la versión (invalida la descarga preparada)
+def catalogo_modificado():
+    st.session_state.version_catalogo = st.session_state.get('version_catalogo', 0) + 1
 
 # Cargar datos al inicio y mantener en el estado de la sesión
+if 'version_catalogo' not in st.session_state:
+    st.session_state.version_catalogo = 0
 if 'df_productos' not in st.session_state:
     df_convertido = cargar_excel()
     if df_convertido is not None:
@@ -84,36 +162,52 @@ if 'df_productos' not in st.session_state:
     else:
         st.session_state.df_productos = pd.DataFrame(columns=columnas_esperadas)
 
+# Reglas de recargos y descuentos (reglas_precios.json)
+if 'reglas_precios' not in st.session_state:
+    st.session_state.reglas_precios = cargar_reglas()
+
+# Índice por Código y Nombre y buscador; se rearman juntos cada vez que cambia
+# el catálogo (un buscador viejo devuelve posiciones de la tabla anterior)
+def armar_busqueda_productos():
+    st.session_state.indice_productos = IndiceProductos(st.session_state.df_productos)
+    st.session_state.motor_productos = MotorBusqueda.desde_dataframe(
+        st.session_state.df_productos, ['Nombre', 'Codigo', 'Codigo de Barras']
+    )
+
+if 'indice_productos' not in st.session_state or st.session_state.indice_productos.df is not st.session_state.df_productos:
+    armar_busqueda_productos()
+
+# Después de guardar o borrar se limpia la búsqueda (antes de crear los widgets)
+if st.session_state.pop('limpiar_busqueda', False):
+    st.session_state.buscar_codigo = ''
+    st.session_state.buscar_nombre_texto = ''
+
 # Sección de búsqueda de productos
 if not st.session_state.df_productos.empty:
     st.subheader("🔍 Buscar Producto para Editar")
     col_search1, col_search2 = st.columns(2)
     with col_search1:
-        buscar_codigo = st.selectbox(
+        buscar_codigo = st.text_input(
             "Buscar por Código",
-            options=[''] + st.session_state.df_productos.get('Codigo', pd.Series(dtype='str')).astype(str).unique().tolist(),
+            placeholder="Código exacto del producto",
             key="buscar_codigo"
         )
     with col_search2:
-        buscar_nombre = st.selectbox(
+        df_busqueda = st.session_state.df_productos
+        posicion_nombre = selector_busqueda(
             "Buscar por Nombre",
-            options=[''] + st.session_state.df_productos['Nombre'].fillna('').unique().tolist(),
+            st.session_state.motor_productos,
+            lambda posicion: f"{df_busqueda['Nombre'].iat[posicion]} ({df_busqueda['Codigo'].iat[posicion]})",
             key="buscar_nombre"
         )
 
     producto_seleccionado = None
     if buscar_codigo:
-        try:
-            producto_seleccionado = st.session_state.df_productos[st.session_state.df_productos.get('Codigo', pd.Series(dtype='str')).astype(str) == buscar_codigo].iloc[0]
-            st.session_state.buscar_nombre = producto_seleccionado['Nombre']
-        except Exception as e:
-            st.error(f"❌ Error al seleccionar el producto por Código: {e}")
-    elif buscar_nombre:
-        try:
-            producto_seleccionado = st.session_state.df_productos[st.session_state.df_productos['Nombre'] == buscar_nombre].iloc[0]
-            st.session_state.buscar_codigo = producto_seleccionado['Codigo']
-        except Exception as e:
-            st.error(f"❌ Error al seleccionar el producto por Nombre: {e}")
+        producto_seleccionado = st.session_state.indice_productos.buscar_codigo(buscar_codigo.strip())
+        if producto_seleccionado is None:
+            st.error(f"❌ No se encontró ningún producto con el código '{buscar_codigo}'.")
+    elif posicion_nombre is not None:
+        producto_seleccionado = st.session_state.df_productos.iloc[posicion_nombre]
 
     if producto_seleccionado is not None:
         st.write(f"**Producto Seleccionado: {producto_seleccionado['Nombre']}**")
@@ -128,13 +222,13 @@ with st.form(key='agregar_producto_unique'):
     col_histo1, col_histo2 = st.columns(2)
     with col_histo1:
         st.markdown("**Último Costo (Pesos):**")
-        if producto_seleccionado and pd.notna(producto_seleccionado['Ultimo Costo (Pesos)']):
-            ultimo_costo_pesos = float(producto_seleccionado['Ultimo Costo (Pesos)'])
+        ultimo_costo_pesos = valor_numerico(producto_seleccionado, 'Ultimo Costo (Pesos)')
+        if ultimo_costo_pesos is not None:
             nuevo_costo_pesos = st.number_input(
                 "Nuevo Costo (Pesos)",
                 min_value=0.0,
                 step=0.01,
-                value=float(producto_seleccionado['Costo (Pesos)']) if (producto_seleccionado is not None and 'Costo (Pesos)' in producto_seleccionado and pd.notna(producto_seleccionado['Costo (Pesos)'])) else 0.0,
+                value=valor_numerico(producto_seleccionado, 'Costo (Pesos)') or 0.0,
                 key="costo_pesos"
             )
             # Verificar si el nuevo costo es mayor que el último costo
@@ -153,13 +247,13 @@ with st.form(key='agregar_producto_unique'):
 
     with col_histo2:
         st.markdown("**Último Costo (USD):**")
-        if producto_seleccionado and pd.notna(producto_seleccionado['Ultimo Costo (USD)']):
-            ultimo_costo_usd = float(producto_seleccionado['Ultimo Costo (USD)'])
+        ultimo_costo_usd = valor_numerico(producto_seleccionado, 'Ultimo Costo (USD)')
+        if ultimo_costo_usd is not None:
             nuevo_costo_usd = st.number_input(
                 "Nuevo Costo (USD)",
                 min_value=0.0,
                 step=0.01,
-                value=float(producto_seleccionado['Costo (USD)']) if (producto_seleccionado is not None and 'Costo (USD)' in producto_seleccionado and pd.notna(producto_seleccionado['Costo (USD)'])) else 0.0,
+                value=valor_numerico(producto_seleccionado, 'Costo (USD)') or 0.0,
                 key="costo_usd"
             )
             # Verificar si el nuevo costo es mayor que el último costo
@@ -240,9 +334,10 @@ with st.form(key='agregar_producto_unique'):
             key="nuevo_ancho"
         )
 
-    categorias = st.session_state.df_productos['Categorias'].dropna().unique().tolist()
+    # Cada producto puede tener varias categorías separadas por coma
+    categorias = sorted({cat.strip() for valor in st.session_state.df_productos['Categorias'].dropna() for cat in str(valor).split(',') if cat.strip()})
     if producto_seleccionado is not None and 'Categorias' in producto_seleccionado and pd.notna(producto_seleccionado['Categorias']):
-        default_categorias = [cat.strip() for cat in producto_seleccionado['Categorias'].split(',')]
+        default_categorias = [cat.strip() for cat in str(producto_seleccionado['Categorias']).split(',') if cat.strip()]
     else:
         default_categorias = []
     nueva_categoria = st.multiselect(
@@ -253,7 +348,11 @@ with st.form(key='agregar_producto_unique'):
     )
 
     st.write("### Proveedor")
-    proveedores = st.session_state.df_productos['Proveedor'].dropna().unique().tolist()
+    # Los del catálogo más los del directorio de proveedores
+    proveedores = list(dict.fromkeys(
+        st.session_state.df_productos['Proveedor'].dropna().astype(str).str.strip().tolist() + sorted(cargar_proveedores())
+    ))
+    proveedores = [proveedor for proveedor in proveedores if proveedor]
     proveedor_seleccionado = st.selectbox(
         "Selecciona un proveedor",
         options=proveedores if proveedores else ["Seleccione..."],
@@ -267,7 +366,7 @@ with st.form(key='agregar_producto_unique'):
             "Unidades por Bulto",
             min_value=0,
             step=1,
-            value=int(producto_seleccionado['Unidades por Bulto']) if (producto_seleccionado is not None and 'Unidades por Bulto' in producto_seleccionado and pd.notna(producto_seleccionado['Unidades por Bulto'])) else 0,
+            value=int(valor_numerico(producto_seleccionado, 'Unidades por Bulto') or 0),
             key="unidades_por_bulto"
         )
     with col7:
@@ -277,42 +376,59 @@ with st.form(key='agregar_producto_unique'):
             key="presentacion"
         )
     with col8:
+        fecha_vencimiento_actual = pd.to_datetime(producto_seleccionado['Fecha de Vencimiento'], format="%Y-%m-%d", errors='coerce') if (producto_seleccionado is not None and 'Fecha de Vencimiento' in producto_seleccionado) else pd.NaT
         fecha_vencimiento = st.date_input(
             "Fecha de Vencimiento",
-            value=datetime.strptime(producto_seleccionado['Fecha de Vencimiento'], "%Y-%m-%d").date() if (producto_seleccionado is not None and 'Fecha de Vencimiento' in producto_seleccionado and pd.notna(producto_seleccionado['Fecha de Vencimiento'])) else datetime.today(),
+            value=fecha_vencimiento_actual.date() if pd.notna(fecha_vencimiento_actual) else datetime.today(),
             key="fecha_vencimiento"
         )
 
-    # Precios y Costos (no editables)
+    # Precios y Costos (no editables): salen de las reglas del motor de precios
+    precios = precios_producto(nuevo_costo_pesos, nuevo_costo_usd, nueva_categoria, proveedor_seleccionado, st.session_state.reglas_precios)
+    # Sin cotización del dólar, un producto con costo solo en USD no tiene precio
+    # calculado y al guardarlo conserva los que tenía
+    sin_precio = pd.isna(precios['Precio Venta'])
+    if sin_precio and producto_seleccionado is not None:
+        precios = {
+            columna: producto_seleccionado[columna] if columna in producto_seleccionado else precio
+            for columna, precio in precios.items()
+        }
+    precio_x_mayor = precios['Precio x Mayor']
+    precio_venta_calculado = precios['Precio Venta']
+    precio_x_menor = precios['Precio x Menor']
+    precio_promocional_mayor = precios['Precio Promocional x Mayor']
+    precio_promocional = precios['Precio Promocional']
+    precio_promocional_menor = precios['Precio Promocional x Menor']
+
     st.write("### Precios y Costos")
-    col9, col10, col11 = st.columns([1, 1, 1])
-    with col9:
-        st.markdown("**Precio x Mayor (Calculado):**")
-        precio_x_mayor = nuevo_costo_pesos * 1.5  # Ejemplo de cálculo
-        st.text(f"${precio_x_mayor:.2f}")
-    with col10:
-        st.markdown("**Precio Venta (Calculado):**")
-        precio_venta_calculado = nuevo_costo_pesos * 2.0  # Ejemplo de cálculo
-        st.text(f"${precio_venta_calculado:.2f}")
-    with col11:
-        st.markdown("**Precio x Menor (Calculado):**")
-        precio_x_menor = nuevo_costo_pesos * 1.8  # Ejemplo de cálculo
-        st.text(f"${precio_x_menor:.2f}")
-
-    st.write("### Precios Promocionales (Calculados)")
-    col12, col13, col14 = st.columns([1, 1, 1])
-    with col12:
-        precio_promocional_mayor = precio_x_mayor * 0.9  # Ejemplo de 10% de descuento
-        st.markdown("**Promoción x Mayor:**")
-        st.text(f"${precio_promocional_mayor:.2f}")
-    with col13:
-        precio_promocional = precio_venta_calculado * 0.85  # Ejemplo de 15% de descuento
-        st.markdown("**Promoción Venta:**")
-        st.text(f"${precio_promocional:.2f}")
-    with col14:
-        precio_promocional_menor = precio_x_menor * 0.95  # Ejemplo de 5% de descuento
-        st.markdown("**Promoción x Menor:**")
-        st.text(f"${precio_promocional_menor:.2f}")
+    if sin_precio:
+        st.warning(
+            "⚠️ El producto solo tiene costo en USD y no hay cotización del dólar cargada "
+            "(se carga en '💲 Actualizar precios de todo el catálogo'): sus precios no se calculan."
+        )
+    else:
+        col9, col10, col11 = st.columns([1, 1, 1])
+        with col9:
+            st.markdown("**Precio x Mayor (Calculado):**")
+            st.text(f"${precio_x_mayor:.2f}")
+        with col10:
+            st.markdown("**Precio Venta (Calculado):**")
+            st.text(f"${precio_venta_calculado:.2f}")
+        with col11:
+            st.markdown("**Precio x Menor (Calculado):**")
+            st.text(f"${precio_x_menor:.2f}")
+
+        st.write("### Precios Promocionales (Calculados)")
+        col12, col13, col14 = st.columns([1, 1, 1])
+        with col12:
+            st.markdown("**Promoción x Mayor:**")
+            st.text(f"${precio_promocional_mayor:.2f}")
+        with col13:
+            st.markdown("**Promoción Venta:**")
+            st.text(f"${precio_promocional:.2f}")
+        with col14:
+            st.markdown("**Promoción x Menor:**")
+            st.text(f"${precio_promocional_menor:.2f}")
 
     # Ubicación en Tienda
     st.write("### Ubicación en Tienda")
@@ -353,6 +469,10 @@ with st.form(key='agregar_producto_unique'):
         with open(ruta_imagen, "wb") as f:
             f.write(imagen_bytes)
         st.success(f"✅ Imagen '{imagen_nombre}' subida correctamente.")
+        # Generar las miniaturas ahora, así ventas no tiene que procesar la original
+        miniatura = obtener_miniatura(ruta_imagen, 200)
+        if miniatura:
+            st.image(miniatura, width=200)
     else:
         ruta_imagen = producto_seleccionado['Imagen'] if (producto_seleccionado is not None and 'Imagen' in producto_seleccionado) else ""
 
@@ -375,7 +495,7 @@ with st.form(key='agregar_producto_unique'):
         else:
             # Preparar los datos del producto
             nuevo_producto = {
-                'id': producto_seleccionado['id'] if (producto_seleccionado is not None and 'id' in producto_seleccionado) else len(st.session_state.df_productos) + 1,
+                'id': producto_seleccionado['id'] if (producto_seleccionado is not None and 'id' in producto_seleccionado) else siguiente_id(st.session_state.df_productos),
                 'id externo': producto_seleccionado['id externo'] if (producto_seleccionado is not None and 'id externo' in producto_seleccionado) else "",
                 'Codigo': nuevo_codigo,
                 'Codigo de Barras': nuevo_codigo_barras,
@@ -410,52 +530,256 @@ with st.form(key='agregar_producto_unique'):
                 'Ultima Actualizacion': datetime.now(pytz.timezone('America/Argentina/Buenos_Aires')).strftime("%Y-%m-%d %H:%M:%S")
             }
 
-            # Si se está editando un producto existente
-            if producto_seleccionado is not None:
-                df_index = st.session_state.df_productos.index[st.session_state.df_productos['id'] == nuevo_producto['id']].tolist()
-                if df_index:
-                    st.session_state.df_productos.loc[df_index[0]] = nuevo_producto
-                    st.success(f"✅ **Producto '{nuevo_nombre}' actualizado exitosamente.**")
-            else:
-                # Agregar un nuevo producto
-                st.session_state.df_productos = st.session_state.df_productos.append(nuevo_producto, ignore_index=True)
-                st.success(f"✅ **Producto '{nuevo_nombre}' agregado exitosamente.**")
-
-            # Guardar los cambios en el archivo Excel
+            # Solo se registra este producto; el Excel se actualiza cada tanto con todos los cambios juntos
             try:
-                st.session_state.df_productos.to_excel('Produt2.xlsx', index=False, engine='openpyxl')
-                st.success("✅ Los cambios han sido guardados en 'Produt2.xlsx'.")
+                if producto_seleccionado is not None:
+                    registrar_cambio(MODIFICACION, nuevo_producto['id'], antes=producto_seleccionado, despues=nuevo_producto, usuario=usuario_actual())
+                    st.success(f"✅ **Producto '{nuevo_nombre}' actualizado exitosamente.**")
+                else:
+                    registrar_cambio(ALTA, nuevo_producto['id'], despues=nuevo_producto, usuario=usuario_actual())
+                    st.success(f"✅ **Producto '{nuevo_nombre}' agregado exitosamente.**")
+                st.session_state.df_productos = aplicar_cambio(st.session_state.df_productos, MODIFICACION if producto_seleccionado is not None else ALTA, nuevo_producto['id'], nuevo_producto)
+                # La fila puede haber cambiado en el lugar: se rearman índice y buscador
+                armar_busqueda_productos()
+                catalogo_modificado()
+                if debe_exportar():
+                    exportar_cambios_en_segundo_plano(ARCHIVO_EXCEL, guardar_excel)
             except Exception as e:
-                st.error(f"❌ Error al guardar los cambios en 'Produt2.xlsx': {e}")
+                st.error(f"❌ Error al guardar el producto: {e}")
 
             # Actualizar la vista previa
             st.write("### Vista Previa de los Datos Actualizados:")
-            st.dataframe(st.session_state.df_productos.head(10))
+            st.dataframe(st.session_state.df_productos.tail(10))
 
-            # Resetear los campos del formulario si se desea
-            st.session_state.buscar_codigo = ''
-            st.session_state.buscar_nombre = ''
+            # Resetear los campos de búsqueda
+            st.session_state.limpiar_busqueda = True
 
     if borrar_button:
         if producto_seleccionado is not None:
-            confirmacion = st.warning("⚠️ ¿Estás seguro de que deseas borrar este producto?", icon="⚠️")
-            borrar_confirm = st.button("Confirmar Borrado")
-            if borrar_confirm:
-                try:
-                    st.session_state.df_productos = st.session_state.df_productos[st.session_state.df_productos['id'] != producto_seleccionado['id']]
-                    st.session_state.df_productos.to_excel('Produt2.xlsx', index=False, engine='openpyxl')
-                    st.success(f"✅ **Producto '{producto_seleccionado['Nombre']}' borrado exitosamente.**")
-                    # Resetear la selección
-                    st.session_state.buscar_codigo = ''
-                    st.session_state.buscar_nombre = ''
-                except Exception as e:
-                    st.error(f"❌ Error al borrar el producto: {e}")
+            # Los botones de confirmación van fuera del formulario
+            st.session_state.borrado_pendiente = producto_seleccionado.to_dict()
         else:
             st.error("❌ No hay un producto seleccionado para borrar.")
 
-# Opcional: Mostrar todos los productos en una tabla
+# Confirmación del borrado
+if st.session_state.get('borrado_pendiente') is not None:
+    producto_a_borrar = st.session_state.borrado_pendiente
+    st.warning(f"⚠️ ¿Estás seguro de que deseas borrar '{producto_a_borrar['Nombre']}'?", icon="⚠️")
+    col_borrar_si, col_borrar_no = st.columns(2)
+    with col_borrar_si:
+        if st.button("Confirmar Borrado"):
+            try:
+                registrar_cambio(BAJA, producto_a_borrar['id'], antes=producto_a_borrar, usuario=usuario_actual())
+                st.session_state.df_productos = aplicar_cambio(st.session_state.df_productos, BAJA, producto_a_borrar['id'], None)
+                catalogo_modificado()
+                st.success(f"✅ **Producto '{producto_a_borrar['Nombre']}' borrado exitosamente.**")
+                if debe_exportar():
+                    exportar_cambios_en_segundo_plano(ARCHIVO_EXCEL, guardar_excel)
+                # Resetear la selección
+                st.session_state.limpiar_busqueda = True
+            except Exception as e:
+                st.error(f"❌ Error al borrar el producto: {e}")
+            st.session_state.borrado_pendiente = None
+    with col_borrar_no:
+        if st.button("Cancelar"):
+            st.session_state.borrado_pendiente = None
+            st.rerun()
+
+# ===============================
+# Historial de Cambios y Deshacer
+# ===============================
+
+with st.expander("↩️ Últimos cambios"):
+    # Cada usuario ve y deshace solo sus propios cambios
+    historial = historial_deshacer(usuario_actual())
+    if historial:
+        st.dataframe(pd.DataFrame(
+            [(cambio['fecha'], cambio['tipo'], cambio['id_producto'], cambio['usuario']) for cambio in historial],
+            columns=['Fecha', 'Cambio', 'id', 'Usuario']
+        ))
+        ultimo = historial[0]
+        st.caption(f"Se deshace tu último cambio: {ultimo['tipo']} del producto {ultimo['id_producto']} ({ultimo['fecha']}).")
+        if st.button("↩️ Deshacer mi último cambio"):
+            st.session_state.df_productos, cambio = deshacer_ultimo(st.session_state.df_productos, usuario=usuario_actual())
+            if cambio is not None:
+                armar_busqueda_productos()
+                catalogo_modificado()
+                st.success(f"✅ Se deshizo la {cambio['tipo']} del producto {cambio['id_producto']}.")
+                st.rerun()
+    else:
+        st.write("No hay cambios para deshacer.")
+
+    pendientes = len(cambios_pendientes())
+    st.caption(f"{pendientes} cambio(s) todavía no escritos en '{ARCHIVO_EXCEL}'.")
+    if pendientes and st.button("📤 Escribir los cambios en el Excel ahora"):
+        try:
+            exportados = exportar_cambios(ARCHIVO_EXCEL, guardar_excel)
+            st.success(f"✅ {exportados} cambio(s) guardados en '{ARCHIVO_EXCEL}'.")
+        except Exception as e:
+            st.error(f"❌ Error al guardar los cambios en '{ARCHIVO_EXCEL}': {e}")
+
+# ===============================
+# Actualización Masiva de Precios
+# ===============================
+
+# Recalcula los precios de todo el catálogo con las reglas (por ejemplo, cuando
+# cambia el dólar). Primero se simula y se muestra qué cambia; recién al
+# confirmar se guarda.
+with st.expander("💲 Actualizar precios de todo el catálogo"):
+    reglas = st.session_state.reglas_precios
+
+    col_dolar, col_usd = st.columns(2)
+    with col_dolar:
+        # 0 = sin cotización: los productos con costo solo en USD no se recalculan
+        cotizacion = st.number_input("Cotización del dólar (ARS)", min_value=0.0, step=1.0, value=cotizacion_dolar(reglas) or 0.0, key="cotizacion_dolar")
+    with col_usd:
+        preferir_usd = st.checkbox("Usar el costo en USD cuando el producto lo tenga", value=bool(reglas['preferir_usd']), key="preferir_usd")
+
+    st.write("**Recargos sobre el costo**")
+    recargos = {}
+    for col_recargo, (columna, recargo) in zip(st.columns(len(reglas['recargos'])), reglas['recargos'].items()):
+        with col_recargo:
+            recargos[columna] = st.number_input(columna, min_value=0.0, step=0.05, value=float(recargo), key=f"recargo_{columna}")
+
+    st.write("**Descuentos promocionales (%)**")
+    promociones = {}
+    for col_promo, (columna, (columna_lista, descuento)) in zip(st.columns(len(reglas['promociones'])), reglas['promociones'].items()):
+        with col_promo:
+            porcentaje = st.number_input(f"{columna} (sobre {columna_lista})", min_value=0.0, max_value=100.0, step=1.0, value=float(descuento) * 100, key=f"descuento_{columna}")
+            promociones[columna] = [columna_lista, porcentaje / 100]
+
+    st.write("**Factores por categoría y por proveedor** (1.10 = 10% más de recargo)")
+    col_cat, col_prov = st.columns(2)
+    with col_cat:
+        factores_categoria = st.data_editor(
+            pd.DataFrame({'Categoría': pd.Series(list(reglas['por_categoria']), dtype='string'), 'Factor': pd.Series(list(reglas['por_categoria'].values()), dtype=float)}),
+            num_rows="dynamic", key="factores_categoria"
+        )
+    with col_prov:
+        factores_proveedor = st.data_editor(
+            pd.DataFrame({'Proveedor': pd.Series(list(reglas['por_proveedor']), dtype='string'), 'Factor': pd.Series(list(reglas['por_proveedor'].values()), dtype=float)}),
+            num_rows="dynamic", key="factores_proveedor"
+        )
+
+    reglas_nuevas = {
+        **reglas,
+        'cotizacion_dolar': cotizacion or None,
+        'preferir_usd': preferir_usd,
+        'recargos': recargos,
+        'promociones': promociones,
+        'por_categoria': {str(fila['Categoría']).strip(): float(fila['Factor']) for _, fila in factores_categoria.dropna().iterrows()},
+        'por_proveedor': {str(fila['Proveedor']).strip(): float(fila['Factor']) for _, fila in factores_proveedor.dropna().iterrows()},
+    }
+
+    col_simular, col_aplicar = st.columns(2)
+    with col_simular:
+        if st.button("🔎 Simular (sin guardar)"):
+            nuevos_precios = calcular_precios(st.session_state.df_productos, reglas_nuevas)
+            st.session_state.simulacion_precios = (reglas_nuevas, nuevos_precios, diferencias_precios(st.session_state.df_productos, nuevos_precios))
+
+    simulacion = st.session_state.get('simulacion_precios')
+    if simulacion is not None:
+        reglas_simuladas, nuevos_precios, reporte = simulacion
+        st.write(f"**{reporte['Codigo'].nunique()} productos cambiarían de precio ({len(reporte)} precios).**")
+        sin_precio = int(sin_cotizacion(st.session_state.df_productos, reglas_simuladas).sum())
+        if sin_precio:
+            st.warning(f"⚠️ Productos con costo solo en USD y sin cotización del dólar: {sin_precio} (conservan su precio actual).")
+        st.dataframe(reporte.head(1000))
+        if reglas_simuladas != reglas_nuevas:
+            st.warning("⚠️ Las reglas cambiaron desde la simulación. Volvé a simular antes de aplicar.")
+        with col_aplicar:
+            if st.button("✅ Aplicar precios", disabled=reglas_simuladas != reglas_nuevas):
+                marca_tiempo = datetime.now(pytz.timezone('America/Argentina/Buenos_Aires')).strftime("%Y-%m-%d %H:%M:%S")
+                st.session_state.reglas_precios = reglas_simuladas
+                del st.session_state.simulacion_precios
+                try:
+                    guardar_reglas(reglas_simuladas)
+                    # Se recalcula sobre el catálogo al día (con los cambios de las otras sesiones)
+                    st.session_state.df_productos = guardar_cambio_masivo(
+                        ARCHIVO_EXCEL, guardar_excel,
+                        lambda df: aplicar_precios(df, calcular_precios(df, reglas_simuladas), marca_tiempo)
+                    )
+                    catalogo_modificado()
+                    st.success(f"✅ Precios actualizados en {reporte['Codigo'].nunique()} productos y guardados en 'Produt2.xlsx'.")
+                except Exception as e:
+                    st.error(f"❌ Error al guardar los precios: {e}")
+
+# ===============================
+# Importación de Listas de Proveedores
+# ===============================
+
+# Carga masiva de costos desde la lista de un proveedor: se cruza con el
+# catálogo, se recalculan los precios de lo que cambió y se guarda de una vez
+with st.expander("📦 Importar lista de precios de proveedor"):
+    proveedores_directorio = cargar_proveedores()
+    lista_subida = st.file_uploader("Lista del proveedor (Excel o CSV)", type=['xlsx', 'csv'], key="lista_proveedor")
+    proveedor_lista = st.selectbox(
+        "Proveedor (se asigna a los productos que no tienen)",
+        ["(ninguno)"] + sorted(proveedores_directorio),
+        key="proveedor_lista"
+    )
+    if proveedor_lista == "(ninguno)":
+        proveedor_lista = None
+
+    if lista_subida is not None and st.button("🔎 Simular importación"):
+        try:
+            lista = leer_lista_proveedor(lista_subida, lista_subida.name)
+            marca_tiempo = datetime.now(pytz.timezone('America/Argentina/Buenos_Aires')).strftime("%Y-%m-%d %H:%M:%S")
+            parametros = {
+                'proveedor': proveedor_lista,
+                'prefijo': proveedores_directorio.get(proveedor_lista, '') if proveedor_lista else '',
+                'marca_tiempo': marca_tiempo,
+            }
+            # Se guarda la lista para volver a cruzarla al aplicar
+            st.session_state.importacion_proveedor = (lista, parametros) + importar_lista(
+                st.session_state.df_productos, lista, st.session_state.reglas_precios, **parametros
+            )
+        except Exception as e:
+            st.error(f"❌ Error al leer la lista del proveedor: {e}")
+
+    importacion = st.session_state.get('importacion_proveedor')
+    if importacion is not None:
+        lista, parametros, _, resumen, detalle, no_encontradas = importacion
+        col_res1, col_res2, col_res3, col_res4 = st.columns(4)
+        col_res1.metric("Filas en la lista", resumen['filas_lista'])
+        col_res2.metric("Encontradas", resumen['encontradas'])
+        col_res3.metric("Costos actualizados", resumen['costos_actualizados'])
+        col_res4.metric("No encontradas", resumen['no_encontradas'])
+        if resumen['costos_dudosos']:
+            st.warning(
+                f"⚠️ Costos que cambian más de {FACTOR_COSTO_DUDOSO} veces: {resumen['costos_dudosos']} "
+                "(marcados en 'Revisar'). Verificá el formato de los números de la lista antes de aplicar."
+            )
+            st.dataframe(detalle[detalle['Revisar']].head(1000))
+        st.write("**Cambios de costo:**")
+        st.dataframe(detalle.head(1000))
+        if not no_encontradas.empty:
+            st.write("**Filas de la lista sin producto en el catálogo:**")
+            st.dataframe(no_encontradas.head(1000))
+
+        col_aplicar_lista, col_descartar_lista = st.columns(2)
+        with col_aplicar_lista:
+            if st.button("✅ Aplicar importación", disabled=resumen['costos_actualizados'] == 0 and not proveedor_lista):
+                del st.session_state.importacion_proveedor
+                try:
+                    # La lista se aplica al catálogo al día (con los cambios de las otras sesiones)
+                    reglas_sesion = st.session_state.reglas_precios
+                    st.session_state.df_productos = guardar_cambio_masivo(
+                        ARCHIVO_EXCEL, guardar_excel,
+                        lambda df: importar_lista(df, lista, reglas_sesion, **parametros)[0]
+                    )
+                    catalogo_modificado()
+                    st.success(f"✅ {resumen['costos_actualizados']} productos actualizados y guardados en 'Produt2.xlsx'.")
+                except Exception as e:
+                    st.error(f"❌ Error al guardar los cambios en 'Produt2.xlsx': {e}")
+        with col_descartar_lista:
+            if st.button("Descartar"):
+                del st.session_state.importacion_proveedor
+                st.rerun()
+
+# Opcional: Mostrar todos los productos en una tabla (paginada)
 st.subheader("📊 Todos los Productos")
-st.dataframe(st.session_state.df_productos)
+tabla_paginada(st.session_state.df_productos, key="tabla_productos")
 
 # Opcional: Descargar la base de datos actualizada
 def descargar_excel(df):
@@ -465,9 +789,18 @@ def descargar_excel(df):
     processed_data = output.getvalue()
     return processed_data
 
-st.download_button(
-    label="📥 Descargar Base de Datos Actualizada",
-    data=descargar_excel(st.session_state.df_productos),
-    file_name='Produt2_actualizado.xlsx',
-    mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-)
+# El Excel se arma recién cuando se pide y se reutiliza mientras el catálogo no cambie
+descarga = st.session_state.get('descarga_catalogo')
+if descarga is None or descarga['version'] != st.session_state.version_catalogo:
+    if st.button("📦 Preparar Base de Datos para descargar"):
+        st.session_state.descarga_catalogo = descarga = {
+            'version': st.session_state.version_catalogo,
+            'datos': descargar_excel(st.session_state.df_productos)
+        }
+if descarga is not None and descarga['version'] == st.session_state.version_catalogo:
+    st.download_button(
+        label="📥 Descargar Base de Datos Actualizada",
+        data=descarga['datos'],
+        file_name='Produt2_actualizado.xlsx',
+        mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
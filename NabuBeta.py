@@ -1,13 +1,29 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from cache_columnar import leer_excel, firma_archivo
+from cache_imagenes import obtener_miniatura
+from historial_ventas import registrar_venta, debe_compactar_historial, compactar_historial_en_segundo_plano
+from directorio_clientes import DirectorioClientes
+from esquemas import aplicar_esquema
+
+ARCHIVO_PRODUCTOS = "archivo_modificado_corregido.xlsx"  # Asegurate de tener el archivo de productos cargado
+ARCHIVO_CLIENTES_CSV = "ClientesMundo27sep.csv"
+
+# Productos con los tipos de su esquema, una sola vez por versión del Excel
+@st.cache_resource(show_spinner=False, max_entries=4)
+def cargar_productos(path, firma):
+    return aplicar_esquema(leer_excel(path), 'productos')
+
+# Clientes y su directorio, una sola vez por versión del CSV (compartidos entre sesiones)
+@st.cache_resource(show_spinner=False, max_entries=4)
+def cargar_clientes(path, firma):
+    df = aplicar_esquema(pd.read_csv(path, encoding='ISO-8859-1', sep=';', on_bad_lines='skip'), 'clientes')
+    return df, DirectorioClientes(df)
 
 # Cargar los datos de productos y clientes
-df_productos = pd.read_excel("archivo_modificado_corregido.xlsx")  # Asegurate de tener el archivo de productos cargado
-df_clientes = pd.read_csv("ClientesMundo27sep.csv", encoding='ISO-8859-1', sep=';', on_bad_lines='skip')
-
-# Extraer nombres de clientes y vendedores
-clientes = df_clientes["Nombre"].fillna("Cliente desconocido").tolist()
+df_productos = cargar_productos(ARCHIVO_PRODUCTOS, firma_archivo(ARCHIVO_PRODUCTOS))
+df_clientes, directorio_clientes = cargar_clientes(ARCHIVO_CLIENTES_CSV, firma_archivo(ARCHIVO_CLIENTES_CSV))
 
 # Inicializar lista de vendedores
 vendedores = ['Emily', 'Joni', 'Johan', 'Valen', 'Marian', 'Sofi', 'Aniel', 'Mostrador']
@@ -19,21 +35,22 @@ st.title("Sistema de Gestión de Ventas")
 col1, col2, col3 = st.columns([2, 1, 1])
 
 with col1:
-    # Seleccionar cliente
-    cliente_seleccionado = st.selectbox("Seleccioná el Cliente", clientes)
+    # Seleccionar cliente (por posición: los nombres repetidos se muestran con su empresa y ciudad)
+    posicion_cliente = st.selectbox("Seleccioná el Cliente", range(len(directorio_clientes)), format_func=directorio_clientes.etiqueta)
 
-# Encontrar el vendedor por defecto asociado al cliente seleccionado
-cliente_info = df_clientes[df_clientes["Nombre"] == cliente_seleccionado]
-vendedor_defecto = cliente_info["Vendedores"].values[0] if not cliente_info.empty else "Mostrador"
+# Ficha del cliente seleccionado: acceso directo, sin filtrar la tabla por cada dato
+cliente_info = directorio_clientes.ficha(posicion_cliente) or {}
+cliente_seleccionado = directorio_clientes.nombre(posicion_cliente) if cliente_info else None
+vendedor_defecto = cliente_info.get('Vendedores') or "Mostrador"
 
 # Mostrar el descuento del cliente al lado del cliente seleccionado
 with col2:
-    descuento_cliente = cliente_info['Descuento'].values[0] if not cliente_info.empty else 0
+    descuento_cliente = cliente_info.get('Descuento') or 0
     st.write(f"**Descuento**: {descuento_cliente}%")
 
 # Mostrar solo el ícono de WhatsApp debajo del descuento
 with col3:
-    celular = cliente_info['Celular'].values[0] if not cliente_info.empty else None
+    celular = cliente_info.get('Celular')
     if celular:
         whatsapp_link = f"https://wa.me/{celular}"
         st.markdown(f'<a href="{whatsapp_link}" target="_blank"><img src="https://upload.wikimedia.org/wikipedia/commons/6/6b/WhatsApp.svg" width="25"/></a>', unsafe_allow_html=True)
@@ -44,15 +61,15 @@ col_datos, col_vendedor = st.columns([2, 2])
 # Mostrar el botón "+ Datos" y desplegar información adicional del cliente
 with col_datos:
     if st.checkbox("+ Datos"):
-        if not cliente_info.empty:
+        if cliente_info:
             # Mostrar datos en columnas
             col_a, col_b = st.columns(2)
             with col_a:
-                st.write(f"**Teléfono**: {cliente_info['Telefono'].values[0]}")
-                st.write(f"**CUIT/DNI**: {cliente_info['CUIT'].values[0]}")
+                st.write(f"**Teléfono**: {cliente_info.get('Telefono')}")
+                st.write(f"**CUIT/DNI**: {cliente_info.get('CUIT')}")
             with col_b:
-                st.write(f"**Celular**: {cliente_info['Celular'].values[0]}")
-                st.write(f"**Dirección**: {cliente_info['Direccion'].values[0]}, {cliente_info['Ciudad'].values[0]}, {cliente_info['Provincia'].values[0]}")
+                st.write(f"**Celular**: {cliente_info.get('Celular')}")
+                st.write(f"**Dirección**: {cliente_info.get('Direccion')}, {cliente_info.get('Ciudad')}, {cliente_info.get('Provincia')}")
 
 # Vinculación automática del vendedor y advertencia si se cambia
 with col_vendedor:
@@ -73,15 +90,17 @@ with col_prod:
 
 with col_img:
     imagen_url = df_productos[df_productos["Nombre"] == producto_seleccionado]["imagen"].values[0]
-    if imagen_url:
-        st.image(imagen_url, width=100)
+    miniatura = obtener_miniatura(imagen_url, 100)
+    if miniatura:
+        st.image(miniatura, width=100)
 
 # Campo para cantidad
 cantidad = st.number_input("Cantidad", min_value=1, value=1)
 
 # Verificar si la venta está forzada
 venta_forzada = df_productos[df_productos["Nombre"] == producto_seleccionado]["forzar multiplos"].values[0]
-if venta_forzada:
+# La columna es Int32: los productos sin valor traen pd.NA
+if pd.notna(venta_forzada) and venta_forzada > 0:
     st.write("Venta forzada: El precio es por unidad y será multiplicado por la cantidad seleccionada.")
 subtotal = cantidad * precio_unitario
 
@@ -116,17 +135,10 @@ if st.button("Guardar Venta"):
         df_venta["Fecha"] = timestamp
         df_venta["Total"] = total
         
-        # Cargar el archivo de ventas (o crear uno nuevo si no existe)
-        try:
-            df_historial = pd.read_csv("historial_ventas.csv")
-        except FileNotFoundError:
-            df_historial = pd.DataFrame()
-
-        # Agregar la nueva venta al historial
-        df_historial = pd.concat([df_historial, df_venta], ignore_index=True)
-
-        # Guardar el historial actualizado
-        df_historial.to_csv("historial_ventas.csv", index=False)
+        # Agregar la venta al final del historial del mes (sin reescribir lo anterior)
+        registrar_venta(df_venta)
+        if debe_compactar_historial():
+            compactar_historial_en_segundo_plano()
 
         st.success("Venta guardada exitosamente")
         st.session_state['venta'] = []  # Limpiar la venta después de guardarla
@@ -0,0 +1,105 @@
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+# ===============================
+# Base de Datos Embebida (SQLite)
+# ===============================
+
+ARCHIVO_BASE = 'soop.db'
+
+# Un solo hilo a la vez puede reescribir un archivo .xlsx
+bloqueo_excel = threading.Lock()
+
+# Una conexión por hilo (Streamlit atiende cada sesión en su propio hilo)
+_local = threading.local()
+
+logger = logging.getLogger(__name__)
+
+# Esquemas ya creados en este proceso
+_esquemas_creados = set()
+_bloqueo_esquemas = threading.Lock()
+
+def obtener_conexion():
+    conexion = getattr(_local, 'conexion', None)
+    if conexion is None:
+        # isolation_level=None: las transacciones se abren explícitamente con transaccion()
+        conexion = sqlite3.connect(ARCHIVO_BASE, timeout=30, isolation_level=None)
+        conexion.row_factory = sqlite3.Row
+        # WAL: los lectores no bloquean al que escribe; FULL: fsync en cada commit
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.execute('PRAGMA synchronous=FULL')
+        conexion.execute('PRAGMA foreign_keys=ON')
+        _local.conexion = conexion
+    return conexion
+
+# Transacción de escritura: BEGIN IMMEDIATE toma el lock de escritura al empezar,
+# así dos sesiones nunca leen el mismo estado para después pisarse
+@contextmanager
+def transaccion():
+    conexion = obtener_conexion()
+    conexion.execute('BEGIN IMMEDIATE')
+    try:
+        yield conexion
+    except BaseException:
+        conexion.execute('ROLLBACK')
+        raise
+    else:
+        conexion.execute('COMMIT')
+
+# Crea las tablas de un módulo la primera vez que se usan en el proceso
+def asegurar_esquema(nombre, sql):
+    if nombre in _esquemas_creados:
+        return
+    with _bloqueo_esquemas:
+        if nombre not in _esquemas_creados:
+            obtener_conexion().executescript(sql)
+            _esquemas_creados.add(nombre)
+
+# Valor de una celda de pandas apto para JSON o para un parámetro de SQLite
+# (sqlite3 no acepta tipos de numpy ni Timestamp)
+def valor_json(valor):
+    if valor is None or (pd.api.types.is_scalar(valor) and pd.isna(valor)):
+        return None
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, (pd.Timestamp, datetime, date)):
+        return valor.isoformat()
+    return valor
+
+# ===============================
+# Tareas en Segundo Plano
+# ===============================
+
+# Escrituras lentas (regenerar hojas de Excel) que no deben bloquear la página.
+# Corren de a una en un hilo aparte; si la misma tarea se pide varias veces
+# mientras espera, se ejecuta una sola vez.
+_tareas_pendientes = {}
+_hilo_tareas = None
+_bloqueo_tareas = threading.Lock()
+
+def _procesar_tareas():
+    global _hilo_tareas
+    while True:
+        with _bloqueo_tareas:
+            if not _tareas_pendientes:
+                _hilo_tareas = None
+                return
+            clave = next(iter(_tareas_pendientes))
+            funcion, args = _tareas_pendientes.pop(clave)
+        try:
+            funcion(*args)
+        except Exception:
+            logger.exception("Error en la tarea en segundo plano %s", clave)
+
+def agendar_tarea(clave, funcion, *args):
+    global _hilo_tareas
+    with _bloqueo_tareas:
+        _tareas_pendientes[clave] = (funcion, args)
+        if _hilo_tareas is None:
+            _hilo_tareas = threading.Thread(target=_procesar_tareas, name='tareas-soop', daemon=True)
+            _hilo_tareas.start()
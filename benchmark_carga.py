@@ -0,0 +1,42 @@
+# ===============================
+# Benchmark: Excel (openpyxl) vs. Caché Columnar
+# ===============================
+# Uso: python benchmark_carga.py [repeticiones]
+#
+# Para cada .xlsx de la carpeta compara la lectura en frío con pd.read_excel
+# contra la lectura en caliente desde el sidecar Arrow de cache_columnar.
+
+import glob
+import sys
+import time
+import pandas as pd
+from cache_columnar import leer_excel, ruta_sidecar, limpiar_cache
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    archivos = sorted(glob.glob('*.xlsx'))
+
+    print(f"{'Archivo':<52} {'Filas':>6} {'Excel (ms)':>11} {'Arrow (ms)':>11} {'Mejora':>8}")
+    print("-" * 92)
+    for archivo in archivos:
+        limpiar_cache(archivo)
+        frio = medir(lambda: pd.read_excel(archivo, engine='openpyxl'), repeticiones)
+
+        # Primera lectura: genera el sidecar
+        df = leer_excel(archivo)
+        if not glob.glob(ruta_sidecar(archivo)):
+            print(f"{archivo:<52} {len(df):>6} {frio * 1000:>11.1f} {'(sin caché: tipos mezclados)':>21}")
+            continue
+        caliente = medir(lambda: leer_excel(archivo), repeticiones)
+        print(f"{archivo:<52} {len(df):>6} {frio * 1000:>11.1f} {caliente * 1000:>11.1f} {frio / caliente:>7.0f}x")
+
+if __name__ == '__main__':
+    main()
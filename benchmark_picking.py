@@ -0,0 +1,112 @@
+# ===============================
+# Benchmark: Picking por Pedido vs. por Olas
+# ===============================
+# Uso: python benchmark_picking.py [pedidos por ola] [olas]
+#
+# Arma un depósito sintético (pasillos x estantes x columnas) con productos
+# de popularidad desigual y pedidos al azar. Para cada tamaño de ola mide
+# cuánto tarda armar_ola y compara lo que se camina armando pedido por pedido
+# (en el orden en que se cargaron o en orden de recorrido) contra una sola
+# vuelta por ola con los productos juntos.
+
+import sys
+import time
+import numpy as np
+from picking import armar_ola, dividir_en_olas, orden_ruta
+
+PASILLOS = 20
+ESTANTES = 10
+COLUMNAS = 8
+PRODUCTOS = 5000
+LINEAS_POR_PEDIDO = (1, 20)
+TAMAÑOS_OLA = [50, 100, 250, 500, 1000]
+
+# Metros entre pasillos y entre posiciones de un mismo pasillo
+ANCHO_PASILLO = 3.0
+PASO = 1.0
+LARGO_PASILLO = ESTANTES * COLUMNAS * PASO
+
+def crear_deposito(semilla=7):
+    generador = np.random.default_rng(semilla)
+    lugares = generador.choice(PASILLOS * ESTANTES * COLUMNAS, size=PRODUCTOS, replace=PRODUCTOS > PASILLOS * ESTANTES * COLUMNAS)
+    ubicaciones = {}
+    for numero, lugar in enumerate(lugares):
+        pasillo, resto = divmod(int(lugar), ESTANTES * COLUMNAS)
+        estante, columna = divmod(resto, COLUMNAS)
+        ubicaciones[f"P{numero:05d}"] = (str(pasillo + 1), str(estante + 1), str(columna + 1))
+    return ubicaciones
+
+def crear_pedidos(cantidad, codigos, semilla=11):
+    generador = np.random.default_rng(semilla)
+    # Pocos productos se piden mucho (Zipf acotado)
+    pesos = 1.0 / np.arange(1, len(codigos) + 1) ** 0.8
+    pesos /= pesos.sum()
+    pedidos = []
+    for id_pedido in range(1, cantidad + 1):
+        lineas = generador.integers(LINEAS_POR_PEDIDO[0], LINEAS_POR_PEDIDO[1] + 1)
+        elegidos = generador.choice(len(codigos), size=lineas, replace=False, p=pesos)
+        items = [
+            {'Codigo': codigos[i], 'Nombre': f"Producto {codigos[i]}", 'Cantidad': int(generador.integers(1, 6))}
+            for i in elegidos
+        ]
+        pedidos.append({'id': id_pedido, 'items': items})
+    return pedidos
+
+# Posición física de una ubicación: (pasillo, metros desde el frente)
+def _punto(ubicacion):
+    pasillo, estante, columna = (int(valor) for valor in ubicacion)
+    return pasillo - 1, ((estante - 1) * COLUMNAS + (columna - 1)) * PASO
+
+# Depósito de un solo bloque: para cambiar de pasillo se sale por el frente
+# o por el fondo (lo más corto). Se sale y se vuelve al frente del pasillo 1.
+def metros_recorrido(ubicaciones):
+    actual = (0, 0.0)
+    total = 0.0
+    for punto in [_punto(ubicacion) for ubicacion in ubicaciones] + [(0, 0.0)]:
+        if punto[0] == actual[0]:
+            total += abs(punto[1] - actual[1])
+        else:
+            total += min(punto[1] + actual[1], 2 * LARGO_PASILLO - punto[1] - actual[1])
+            total += abs(punto[0] - actual[0]) * ANCHO_PASILLO
+        actual = punto
+    return total
+
+def medir(funcion, repeticiones=3):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return resultado, min(tiempos)
+
+def main():
+    tamaños = [int(sys.argv[1])] if len(sys.argv) > 1 else TAMAÑOS_OLA
+    olas = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    ubicaciones = crear_deposito()
+    codigos = sorted(ubicaciones)
+
+    print(f"Depósito: {PASILLOS} pasillos x {ESTANTES} estantes x {COLUMNAS} columnas, {PRODUCTOS} productos")
+    print(f"{'Pedidos':>8} {'Líneas':>7} {'Productos':>9} {'Armado (ms)':>12} "
+          f"{'Km sin orden':>13} {'Km por pedido':>14} {'Km ola':>8} {'Mejora':>7}")
+    print("-" * 86)
+    for tamaño in tamaños:
+        pedidos = crear_pedidos(tamaño * olas, codigos)
+        for ola_pedidos in dividir_en_olas(pedidos, tamaño):
+            ola, segundos = medir(lambda: armar_ola(ola_pedidos, ubicaciones))
+            lineas = sum(len(pedido['items']) for pedido in ola_pedidos)
+            # Un viaje por pedido, productos en el orden en que se cargaron
+            sin_orden = sum(
+                metros_recorrido([ubicaciones[item['Codigo']] for item in pedido['items']]) for pedido in ola_pedidos
+            )
+            # Un viaje por pedido, en orden de recorrido (lista de picking por pedido)
+            por_pedido = 0.0
+            for pedido in ola_pedidos:
+                lugares = [ubicaciones[item['Codigo']] for item in pedido['items']]
+                por_pedido += metros_recorrido([lugares[posicion] for posicion in orden_ruta(lugares)])
+            # Una sola vuelta para toda la ola
+            en_ola = metros_recorrido(list(zip(ola['Pasillo'], ola['Estante'], ola['Columna'])))
+            print(f"{tamaño:>8} {lineas:>7} {len(ola):>9} {segundos * 1000:>12.1f} "
+                  f"{sin_orden / 1000:>13.1f} {por_pedido / 1000:>14.1f} {en_ola / 1000:>8.2f} {por_pedido / en_ola:>6.0f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+from base_datos import obtener_conexion, transaccion, asegurar_esquema, valor_json
+
+# ===============================
+# Borradores de Pedidos (pedido en curso de cada vendedor)
+# ===============================
+
+# El pedido que se está cargando vive en la sesión de Streamlit y se pierde
+# si se recarga el navegador o se reinicia el servidor. Cada alta, cambio o
+# baja de un ítem se escribe además en la base (una fila por ítem, clave
+# vendedor + sesión + código). Cada pestaña tiene su propio borrador, igual
+# que sus reservas de stock; al volver a entrar, la sesión nueva adopta el
+# borrador de una sesión del mismo vendedor que ya terminó.
+
+ESQUEMA_BORRADORES = """
+CREATE TABLE IF NOT EXISTS borradores (
+    usuario TEXT NOT NULL,
+    sesion TEXT NOT NULL,
+    codigo TEXT NOT NULL,
+    posicion INTEGER NOT NULL,
+    item TEXT NOT NULL,
+    actualizado REAL NOT NULL,
+    PRIMARY KEY (usuario, sesion, codigo)
+);
+"""
+
+_tablas_listas = False
+_bloqueo_tablas = threading.Lock()
+
+# Los borradores guardados antes de separarlos por sesión quedan sin sesión
+# ('' no es una sesión activa: la próxima sesión del vendedor los adopta)
+def _migrar_sin_sesion():
+    conexion = obtener_conexion()
+    columnas = [fila['name'] for fila in conexion.execute("PRAGMA table_info(borradores)")]
+    if not columnas or 'sesion' in columnas:
+        return
+    with transaccion() as conexion:
+        conexion.execute("ALTER TABLE borradores RENAME TO borradores_sin_sesion")
+        conexion.execute(ESQUEMA_BORRADORES)
+        conexion.execute(
+            "INSERT INTO borradores (usuario, sesion, codigo, posicion, item, actualizado) "
+            "SELECT usuario, '', codigo, posicion, item, actualizado FROM borradores_sin_sesion"
+        )
+        conexion.execute("DROP TABLE borradores_sin_sesion")
+
+def _asegurar_tablas():
+    global _tablas_listas
+    if _tablas_listas:
+        return
+    with _bloqueo_tablas:
+        if not _tablas_listas:
+            _migrar_sin_sesion()
+            asegurar_esquema('borradores', ESQUEMA_BORRADORES)
+            _tablas_listas = True
+
+def _item_json(item):
+    return json.dumps({clave: valor_json(valor) for clave, valor in item.items()}, ensure_ascii=False)
+
+# Alta o cambio de cantidad de un ítem (conserva su lugar en el pedido)
+def guardar_item_borrador(usuario, sesion, item):
+    _asegurar_tablas()
+    with transaccion() as conexion:
+        conexion.execute(
+            """
+            INSERT INTO borradores (usuario, sesion, codigo, posicion, item, actualizado)
+            VALUES (?, ?, ?, (SELECT COALESCE(MAX(posicion), 0) + 1 FROM borradores WHERE usuario = ? AND sesion = ?), ?, ?)
+            ON CONFLICT (usuario, sesion, codigo) DO UPDATE SET item = excluded.item, actualizado = excluded.actualizado
+            """,
+            (usuario, sesion, str(item['Codigo']), usuario, sesion, _item_json(item), time.time())
+        )
+
+def quitar_item_borrador(usuario, sesion, codigo):
+    _asegurar_tablas()
+    with transaccion() as conexion:
+        conexion.execute(
+            "DELETE FROM borradores WHERE usuario = ? AND sesion = ? AND codigo = ?", (usuario, sesion, str(codigo))
+        )
+
+# Después de guardar (o descartar) el pedido
+def vaciar_borrador(usuario, sesion):
+    _asegurar_tablas()
+    with transaccion() as conexion:
+        conexion.execute("DELETE FROM borradores WHERE usuario = ? AND sesion = ?", (usuario, sesion))
+
+# Ítems del borrador en el orden en que se agregaron
+def cargar_borrador(usuario, sesion):
+    _asegurar_tablas()
+    filas = obtener_conexion().execute(
+        "SELECT item FROM borradores WHERE usuario = ? AND sesion = ? ORDER BY posicion", (usuario, sesion)
+    ).fetchall()
+    return [json.loads(fila['item']) for fila in filas]
+
+# Pasa a 'sesion' el borrador más reciente del vendedor cuya sesión ya
+# terminó ('terminada(sesion)' lo decide). Si otra pestaña del vendedor sigue
+# abierta, su borrador no se toca. Devuelve la sesión anterior, o None.
+def adoptar_borrador(usuario, sesion, terminada):
+    _asegurar_tablas()
+    candidatas = obtener_conexion().execute(
+        "SELECT sesion FROM borradores WHERE usuario = ? AND sesion != ? "
+        "GROUP BY sesion ORDER BY MAX(actualizado) DESC",
+        (usuario, sesion)
+    ).fetchall()
+    for fila in candidatas:
+        anterior = fila['sesion']
+        if anterior and not terminada(anterior):
+            continue
+        with transaccion() as conexion:
+            # Solo si esta sesión no tiene borrador propio (no se mezclan pedidos)
+            if conexion.execute(
+                "SELECT 1 FROM borradores WHERE usuario = ? AND sesion = ? LIMIT 1", (usuario, sesion)
+            ).fetchone() is not None:
+                return None
+            movidas = conexion.execute(
+                "UPDATE borradores SET sesion = ? WHERE usuario = ? AND sesion = ?", (sesion, usuario, anterior)
+            ).rowcount
+        # Otra sesión nueva pudo haberlo adoptado primero
+        if movidas:
+            return anterior
+    return None
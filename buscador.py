@@ -0,0 +1,110 @@
+import unicodedata
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# ===============================
+# Buscador por Trigramas
+# ===============================
+
+# Índice invertido de trigramas sobre el texto normalizado (minúsculas, sin
+# acentos). Cada palabra se indexa con relleno al principio, así una consulta
+# corta encuentra los prefijos de palabra ("pul" -> "Pulsera"), y las faltas de
+# tipeo igual suman por los trigramas que coinciden. Al navegador solo llegan
+# los N mejores resultados, no el catálogo entero.
+
+def normalizar(texto):
+    if texto is None or (not isinstance(texto, str) and pd.isna(texto)):
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto).lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.split())
+
+# Trigramas de un texto normalizado. Con 'prefijo' la última palabra no se
+# cierra, para que coincida con palabras que todavía se están escribiendo.
+def trigramas(texto, prefijo=False):
+    palabras = texto.split()
+    resultado = set()
+    for i, palabra in enumerate(palabras):
+        abierta = prefijo and i == len(palabras) - 1
+        relleno = f"  {palabra}" if abierta else f"  {palabra} "
+        for j in range(len(relleno) - 2):
+            resultado.add(relleno[j:j + 3])
+    return resultado
+
+class MotorBusqueda:
+    # Proporción mínima de trigramas de la consulta que debe tener un resultado
+    UMBRAL = 0.5
+
+    # 'textos': un texto por fila (en el orden de las filas del DataFrame)
+    def __init__(self, textos):
+        self.textos = [normalizar(texto) for texto in textos]
+        self.longitudes = np.array([len(texto) for texto in self.textos], dtype=np.int32)
+        postings = {}
+        for posicion, texto in enumerate(self.textos):
+            for trigrama in trigramas(texto):
+                postings.setdefault(trigrama, []).append(posicion)
+        self.postings = {t: np.array(p, dtype=np.int32) for t, p in postings.items()}
+
+    # Arma el motor a partir de varias columnas de un DataFrame
+    @classmethod
+    def desde_dataframe(cls, df, columnas):
+        columnas = [col for col in columnas if col in df.columns]
+        if not columnas:
+            return cls([''] * len(df))
+        partes = df[columnas].astype('string').fillna('')
+        return cls(partes.agg(' '.join, axis=1).tolist())
+
+    # Posiciones de las filas que mejor coinciden, de mejor a peor
+    def buscar(self, consulta, limite=20):
+        consulta = normalizar(consulta)
+        if not consulta or not self.textos:
+            return []
+        trigramas_consulta = trigramas(consulta, prefijo=True)
+        listas = [self.postings[t] for t in trigramas_consulta if t in self.postings]
+        if not listas:
+            return []
+
+        # Cuántos trigramas de la consulta tiene cada fila, en una sola pasada
+        coincidencias = np.bincount(np.concatenate(listas), minlength=len(self.textos))
+        minimo = max(1, int(np.ceil(self.UMBRAL * len(trigramas_consulta))))
+        candidatos = np.flatnonzero(coincidencias >= minimo)
+        if candidatos.size == 0:
+            return []
+
+        # Más coincidencias primero; a igualdad, el texto más corto
+        puntaje = coincidencias[candidatos] * 1000 - np.minimum(self.longitudes[candidatos], 999)
+        cantidad = min(candidatos.size, limite * 3)
+        mejores = candidatos[np.argpartition(-puntaje, cantidad - 1)[:cantidad]]
+
+        # Entre los mejores, premiar la coincidencia literal y al comienzo del texto
+        def orden(posicion):
+            texto = self.textos[posicion]
+            return (
+                -int(coincidencias[posicion]),
+                not texto.startswith(consulta),
+                consulta not in texto,
+                len(texto)
+            )
+        return sorted(mejores.tolist(), key=orden)[:limite]
+
+# ===============================
+# Widget de Búsqueda
+# ===============================
+
+# Caja de texto + lista con los primeros resultados. Devuelve la posición de la
+# fila elegida (o None). 'etiqueta_fila' arma el texto a mostrar para cada posición.
+def selector_busqueda(etiqueta, motor, etiqueta_fila, key, limite=20, placeholder="Escribí para buscar...", help=None):
+    texto = st.text_input(etiqueta, key=f"{key}_texto", placeholder=placeholder, help=help)
+    if not texto:
+        return None
+    posiciones = motor.buscar(texto, limite)
+    if not posiciones:
+        st.caption("Sin resultados.")
+        return None
+    return st.selectbox(
+        f"Resultados para '{texto}'",
+        posiciones,
+        format_func=etiqueta_fila,
+        key=f"{key}_resultado"
+    )
@@ -0,0 +1,93 @@
+import os
+import json
+import threading
+import pandas as pd
+import pyarrow as pa
+
+# ===============================
+# Caché Columnar de los Excel Maestros
+# ===============================
+
+# Al leer un Excel por primera vez se guarda una copia en formato Arrow IPC
+# (sin comprimir, para poder mapearla en memoria). Las lecturas siguientes usan
+# esa copia mientras el Excel no cambie; si el Excel cambia se vuelve a generar.
+
+DIRECTORIO_CACHE = os.path.join('.cache_soop', 'columnar')
+CLAVE_ORIGEN = b'soop_origen'
+
+# Firma del archivo en disco: cambia cada vez que el Excel se guarda
+def firma_archivo(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def ruta_sidecar(path, sheet_name=0):
+    nombre = os.path.basename(path)
+    return os.path.join(DIRECTORIO_CACHE, f"{nombre}.{sheet_name}.arrow")
+
+def _descripcion_origen(path, sheet_name):
+    mtime_ns, size = firma_archivo(path)
+    return json.dumps({
+        'archivo': os.path.abspath(path),
+        'hoja': sheet_name,
+        'mtime_ns': mtime_ns,
+        'size': size
+    }).encode('utf-8')
+
+# Lee el sidecar si existe y corresponde a la versión actual del Excel
+def _leer_sidecar(ruta, origen):
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with pa.memory_map(ruta, 'r') as fuente:
+            lector = pa.ipc.open_file(fuente)
+            metadata = lector.schema.metadata or {}
+            if metadata.get(CLAVE_ORIGEN) != origen:
+                return None
+            return lector.read_all().to_pandas()
+    except (OSError, pa.ArrowException):
+        # Sidecar corrupto o incompleto: se regenera desde el Excel
+        return None
+
+def _escribir_sidecar(df, ruta, origen):
+    try:
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Columnas con tipos mezclados que Arrow no puede representar:
+        # seguimos leyendo ese archivo directamente del Excel
+        return False
+    metadata = dict(tabla.schema.metadata or {})
+    metadata[CLAVE_ORIGEN] = origen
+    tabla = tabla.replace_schema_metadata(metadata)
+
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    # Escribir en un temporal y renombrar, para que ningún lector vea un archivo a medias
+    ruta_temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with pa.OSFile(ruta_temporal, 'wb') as destino:
+            with pa.ipc.new_file(destino, tabla.schema) as escritor:
+                escritor.write_table(tabla)
+        os.replace(ruta_temporal, ruta)
+    except OSError:
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+        return False
+    return True
+
+# Reemplazo de pd.read_excel(path, sheet_name=...) que usa el sidecar columnar
+def leer_excel(path, sheet_name=0):
+    ruta = ruta_sidecar(path, sheet_name)
+    origen = _descripcion_origen(path, sheet_name)
+    df = _leer_sidecar(ruta, origen)
+    if df is None:
+        df = pd.read_excel(path, sheet_name=sheet_name, engine='openpyxl')
+        _escribir_sidecar(df, ruta, origen)
+    return df
+
+# Borra los sidecars (todos, o solo los del archivo indicado)
+def limpiar_cache(path=None):
+    if not os.path.isdir(DIRECTORIO_CACHE):
+        return
+    prefijo = f"{os.path.basename(path)}." if path else ''
+    for nombre in os.listdir(DIRECTORIO_CACHE):
+        if nombre.startswith(prefijo):
+            os.remove(os.path.join(DIRECTORIO_CACHE, nombre))
@@ -0,0 +1,231 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import pandas as pd
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from base_datos import obtener_conexion, transaccion, asegurar_esquema
+from cache_columnar import firma_archivo
+
+# ===============================
+# Caché de Imágenes y Miniaturas
+# ===============================
+
+# Las imágenes de los productos se descargan una sola vez y se guardan como
+# miniaturas de los tamaños que usa la interfaz. Los archivos se nombran por el
+# hash del contenido original (dos URLs con la misma foto comparten miniaturas)
+# y la tabla 'imagenes' de SQLite recuerda qué hash corresponde a cada origen.
+# Cuando la carpeta supera LIMITE_BYTES se borran las miniaturas usadas hace
+# más tiempo; si después se vuelven a pedir, se descargan de nuevo.
+
+DIRECTORIO_IMAGENES = os.path.join('.cache_soop', 'imagenes')
+TAMAÑOS = (100, 200)
+LIMITE_BYTES = 200 * 1024 * 1024
+CALIDAD_JPEG = 85
+
+# Un origen que falló no se vuelve a pedir hasta que pase este tiempo
+ESPERA_REINTENTO = 10 * 60
+
+ESQUEMA_IMAGENES = """
+CREATE TABLE IF NOT EXISTS imagenes (
+    origen TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+"""
+
+_fallidos = {}
+_bytes_totales = None
+_bloqueo_disco = threading.Lock()
+
+# Sesión HTTP compartida: reutiliza las conexiones abiertas con cada servidor
+_sesion_http = requests.Session()
+_adaptador = HTTPAdapter(
+    pool_connections=8, pool_maxsize=16,
+    max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504))
+)
+_sesion_http.mount('http://', _adaptador)
+_sesion_http.mount('https://', _adaptador)
+
+def _asegurar_tablas():
+    asegurar_esquema('imagenes', ESQUEMA_IMAGENES)
+
+def ruta_miniatura(hash_imagen, tamaño):
+    return os.path.join(DIRECTORIO_IMAGENES, f"{hash_imagen}_{tamaño}.jpg")
+
+def _es_origen_valido(origen):
+    if origen is None or (not isinstance(origen, str) and pd.isna(origen)):
+        return False
+    return str(origen).strip() != ''
+
+def _es_url(origen):
+    return origen.startswith('http://') or origen.startswith('https://')
+
+# Los archivos locales pueden cambiar con el mismo nombre: la clave incluye su firma
+def _clave_origen(origen):
+    if _es_url(origen):
+        return origen
+    mtime_ns, tamaño = firma_archivo(origen)
+    return f"{os.path.abspath(origen)}|{mtime_ns}|{tamaño}"
+
+def _leer_origen(origen):
+    if _es_url(origen):
+        respuesta = _sesion_http.get(origen, timeout=10)
+        respuesta.raise_for_status()
+        return respuesta.content
+    with open(origen, 'rb') as archivo:
+        return archivo.read()
+
+# ===============================
+# Generación de Miniaturas
+# ===============================
+
+def _guardar_atomico(imagen, ruta):
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    imagen.save(temporal, format='JPEG', quality=CALIDAD_JPEG, optimize=True)
+    os.replace(temporal, ruta)
+    return os.path.getsize(ruta)
+
+# Genera todas las miniaturas de una imagen (de la más grande a la más chica)
+def _generar_miniaturas(contenido, hash_imagen):
+    imagen = Image.open(BytesIO(contenido))
+    # En los JPEG grandes decodifica directamente a una escala reducida
+    imagen.draft('RGB', (max(TAMAÑOS), max(TAMAÑOS)))
+    if imagen.mode in ('RGBA', 'LA', 'P'):
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.getchannel('A'))
+        imagen = fondo
+    else:
+        imagen = imagen.convert('RGB')
+
+    os.makedirs(DIRECTORIO_IMAGENES, exist_ok=True)
+    escritos = 0
+    for tamaño in sorted(TAMAÑOS, reverse=True):
+        imagen.thumbnail((tamaño, tamaño))
+        escritos += _guardar_atomico(imagen, ruta_miniatura(hash_imagen, tamaño))
+    _sumar_bytes(escritos)
+
+# Descarga (o lee) un origen, genera sus miniaturas y lo registra en la base
+def _cachear_origen(origen, clave):
+    contenido = _leer_origen(origen)
+    hash_imagen = hashlib.sha256(contenido).hexdigest()
+    if not all(os.path.exists(ruta_miniatura(hash_imagen, t)) for t in TAMAÑOS):
+        _generar_miniaturas(contenido, hash_imagen)
+    with transaccion() as conexion:
+        conexion.execute(
+            "INSERT OR REPLACE INTO imagenes (origen, hash) VALUES (?, ?)", (clave, hash_imagen)
+        )
+    return hash_imagen
+
+# Ruta local de la miniatura de 'origen' (URL o archivo) del tamaño pedido,
+# o None si no hay imagen o no se pudo obtener. Solo va a la red la primera vez.
+def obtener_miniatura(origen, tamaño=200):
+    if not _es_origen_valido(origen):
+        return None
+    origen = str(origen).strip()
+    _asegurar_tablas()
+    try:
+        clave = _clave_origen(origen)
+    except OSError:
+        return None
+
+    fila = obtener_conexion().execute(
+        "SELECT hash FROM imagenes WHERE origen = ?", (clave,)
+    ).fetchone()
+    if fila is not None:
+        ruta = ruta_miniatura(fila['hash'], tamaño)
+        if os.path.exists(ruta):
+            _marcar_uso(ruta)
+            return ruta
+
+    fallo = _fallidos.get(clave)
+    if fallo is not None and time.time() - fallo < ESPERA_REINTENTO:
+        return None
+    try:
+        hash_imagen = _cachear_origen(origen, clave)
+    except Exception:
+        _fallidos[clave] = time.time()
+        return None
+    _fallidos.pop(clave, None)
+    _liberar_espacio()
+    return ruta_miniatura(hash_imagen, tamaño)
+
+# ===============================
+# Límite de Espacio (LRU)
+# ===============================
+
+# La fecha de modificación de cada miniatura marca su último uso
+def _marcar_uso(ruta):
+    try:
+        os.utime(ruta)
+    except OSError:
+        pass
+
+def _archivos_cache():
+    if not os.path.isdir(DIRECTORIO_IMAGENES):
+        return []
+    return [entrada for entrada in os.scandir(DIRECTORIO_IMAGENES) if entrada.is_file() and entrada.name.endswith('.jpg')]
+
+def _sumar_bytes(cantidad):
+    global _bytes_totales
+    with _bloqueo_disco:
+        if _bytes_totales is None:
+            _bytes_totales = sum(entrada.stat().st_size for entrada in _archivos_cache())
+        else:
+            _bytes_totales += cantidad
+
+# Borra las miniaturas menos usadas hasta quedar en el 90% del límite
+def _liberar_espacio():
+    global _bytes_totales
+    with _bloqueo_disco:
+        if _bytes_totales is None or _bytes_totales <= LIMITE_BYTES:
+            return
+        archivos = sorted(((entrada.stat(), entrada.path) for entrada in _archivos_cache()), key=lambda par: par[0].st_mtime)
+        total = sum(estado.st_size for estado, _ in archivos)
+        objetivo = LIMITE_BYTES * 0.9
+        for estado, ruta in archivos:
+            if total <= objetivo:
+                break
+            try:
+                os.remove(ruta)
+                total -= estado.st_size
+            except OSError:
+                pass
+        _bytes_totales = total
+
+# ===============================
+# Precarga del Catálogo Completo
+# ===============================
+
+# Descarga en paralelo las imágenes que todavía no están en caché.
+# Devuelve (cantidad con miniatura, cantidad sin imagen disponible).
+def precargar_imagenes(origenes, hilos=8):
+    origenes = list(dict.fromkeys(str(o).strip() for o in origenes if _es_origen_valido(o)))
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        resultados = list(ejecutor.map(obtener_miniatura, origenes))
+    correctas = sum(1 for ruta in resultados if ruta is not None)
+    return correctas, len(resultados) - correctas
+
+# Uso: python cache_imagenes.py [archivo_productos.xlsx] [hilos]
+def main():
+    from cache_columnar import leer_excel
+    from maestros import ARCHIVO_PRODUCTOS
+    archivo = sys.argv[1] if len(sys.argv) > 1 else ARCHIVO_PRODUCTOS
+    hilos = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    df = leer_excel(archivo)
+    origenes = df['imagen'].tolist() if 'imagen' in df.columns else []
+    if os.path.isdir('imagenes_productos'):
+        origenes += [os.path.join('imagenes_productos', nombre) for nombre in sorted(os.listdir('imagenes_productos'))]
+
+    inicio = time.perf_counter()
+    correctas, fallidas = precargar_imagenes(origenes, hilos)
+    print(f"{correctas} imágenes en caché, {fallidas} sin imagen disponible ({time.perf_counter() - inicio:.1f} s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+import json
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from base_datos import obtener_conexion, transaccion, asegurar_esquema, agendar_tarea, valor_json
+from cache_columnar import leer_excel
+
+# ===============================
+# Registro de Cambios del Catálogo
+# ===============================
+
+# Cada alta, modificación o baja de un producto se guarda como una fila en
+# SQLite (con la fila anterior y la nueva, por 'id'), así guardar un producto
+# no depende del tamaño del catálogo. El Excel sigue siendo la base: al abrir
+# la página se le aplican los cambios todavía no exportados, y cada tanto se
+# exportan todos juntos en una sola escritura del libro.
+
+ESQUEMA_CAMBIOS = """
+CREATE TABLE IF NOT EXISTS cambios_productos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_producto TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    antes TEXT,
+    despues TEXT,
+    usuario TEXT,
+    fecha TEXT NOT NULL,
+    deshace INTEGER,
+    deshecho INTEGER NOT NULL DEFAULT 0,
+    exportado INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_cambios_pendientes ON cambios_productos (exportado, id);
+"""
+
+ALTA = 'alta'
+MODIFICACION = 'modificacion'
+BAJA = 'baja'
+
+# Cuántos cambios se pueden deshacer
+LIMITE_DESHACER = 20
+
+# Cuándo vale la pena volver a escribir el Excel
+UMBRAL_CAMBIOS = 50
+INTERVALO_EXPORTACION = timedelta(minutes=10)
+
+_bloqueo_exportacion = threading.Lock()
+
+def _asegurar_tablas():
+    asegurar_esquema('cambios_productos', ESQUEMA_CAMBIOS)
+
+def _ahora():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def _fila_json(fila):
+    if fila is None:
+        return None
+    return json.dumps({columna: valor_json(valor) for columna, valor in dict(fila).items()}, ensure_ascii=False)
+
+def clave_producto(id_producto):
+    # 12 y 12.0 son el mismo producto
+    if isinstance(id_producto, (float, np.floating)) and float(id_producto).is_integer():
+        id_producto = int(id_producto)
+    return str(id_producto)
+
+def registrar_cambio(tipo, id_producto, antes=None, despues=None, usuario=None, deshace=None):
+    _asegurar_tablas()
+    with transaccion() as conexion:
+        cursor = conexion.execute(
+            "INSERT INTO cambios_productos (id_producto, tipo, antes, despues, usuario, fecha, deshace) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (clave_producto(id_producto), tipo, _fila_json(antes), _fila_json(despues), usuario, _ahora(), deshace)
+        )
+        if deshace is not None:
+            conexion.execute("UPDATE cambios_productos SET deshecho = 1 WHERE id = ?", (deshace,))
+        return cursor.lastrowid
+
+def cambios_pendientes(hasta=None):
+    _asegurar_tablas()
+    if hasta is None:
+        return obtener_conexion().execute(
+            "SELECT * FROM cambios_productos WHERE exportado = 0 ORDER BY id"
+        ).fetchall()
+    return obtener_conexion().execute(
+        "SELECT * FROM cambios_productos WHERE exportado = 0 AND id <= ? ORDER BY id", (hasta,)
+    ).fetchall()
+
+# ===============================
+# Aplicar Cambios a un DataFrame
+# ===============================
+
+# Si el valor no entra en el tipo de la columna, la columna pasa a 'object'
+def _admite(serie, valor):
+    if serie.dtype == object or valor is None:
+        return serie.dtype == object or pd.api.types.is_float_dtype(serie)
+    if isinstance(valor, bool):
+        return pd.api.types.is_bool_dtype(serie)
+    if pd.api.types.is_float_dtype(serie):
+        return isinstance(valor, (int, float))
+    if pd.api.types.is_integer_dtype(serie):
+        return isinstance(valor, int)
+    return False
+
+# Aplica un cambio sobre el DataFrame (devuelve el DataFrame resultante).
+# Es idempotente: aplicar dos veces el mismo cambio deja lo mismo.
+def aplicar_cambio(df, tipo, id_producto, fila):
+    claves = df['id'].map(clave_producto) if 'id' in df.columns else pd.Series(dtype='object')
+    coincide = (claves == clave_producto(id_producto)).to_numpy()
+    if tipo == BAJA:
+        return df[~coincide] if coincide.any() else df
+    fila = {columna: fila.get(columna) for columna in df.columns}
+    if coincide.any():
+        etiqueta = df.index[int(np.flatnonzero(coincide)[0])]
+    else:
+        # Fila nueva vacía al final (reindexar evita concatenar con columnas vacías)
+        etiqueta = df.index.max() + 1 if len(df) else 0
+        df = df.reindex(df.index.append(pd.Index([etiqueta])))
+    for columna, valor in fila.items():
+        if not _admite(df[columna], valor):
+            df[columna] = df[columna].astype(object)
+    df.loc[etiqueta] = pd.Series(fila)
+    return df
+
+def aplicar_pendientes(df, cambios=None):
+    if cambios is None:
+        cambios = cambios_pendientes()
+    for cambio in cambios:
+        fila = json.loads(cambio['despues']) if cambio['despues'] else None
+        df = aplicar_cambio(df, cambio['tipo'], cambio['id_producto'], fila)
+    return df
+
+# ===============================
+# Deshacer
+# ===============================
+
+# Últimos cambios de un usuario que se pueden deshacer (de más nuevo a más
+# viejo). Cada uno deshace solo lo suyo; sin usuario, los cambios sin usuario.
+def historial_deshacer(usuario=None, limite=LIMITE_DESHACER):
+    _asegurar_tablas()
+    return obtener_conexion().execute(
+        "SELECT id, id_producto, tipo, antes, despues, usuario, fecha FROM cambios_productos "
+        "WHERE deshecho = 0 AND deshace IS NULL AND usuario IS ? ORDER BY id DESC LIMIT ?", (usuario, limite)
+    ).fetchall()
+
+# Registra el cambio inverso al último del usuario y lo aplica al DataFrame.
+# Devuelve (DataFrame, cambio deshecho) o (df, None) si no hay nada para deshacer.
+def deshacer_ultimo(df, usuario=None):
+    historial = historial_deshacer(usuario, 1)
+    if not historial:
+        return df, None
+    cambio = historial[0]
+    antes = json.loads(cambio['antes']) if cambio['antes'] else None
+    if cambio['tipo'] == ALTA:
+        tipo_inverso = BAJA
+    elif cambio['tipo'] == BAJA:
+        tipo_inverso = ALTA
+    else:
+        tipo_inverso = MODIFICACION
+    despues = json.loads(cambio['despues']) if cambio['despues'] else None
+    registrar_cambio(tipo_inverso, cambio['id_producto'], antes=despues, despues=antes, usuario=usuario, deshace=cambio['id'])
+    return aplicar_cambio(df, tipo_inverso, cambio['id_producto'], antes), cambio
+
+# ===============================
+# Exportación al Excel
+# ===============================
+
+def debe_exportar():
+    _asegurar_tablas()
+    fila = obtener_conexion().execute(
+        "SELECT COUNT(*) AS cantidad, MIN(fecha) AS primera FROM cambios_productos WHERE exportado = 0"
+    ).fetchone()
+    if not fila['cantidad']:
+        return False
+    if fila['cantidad'] >= UMBRAL_CAMBIOS:
+        return True
+    primera = datetime.strptime(fila['primera'], "%Y-%m-%d %H:%M:%S")
+    return datetime.now() - primera >= INTERVALO_EXPORTACION
+
+# Marca como exportados los cambios hasta 'hasta' (los que ya están en el
+# catálogo que se guardó; los que llegaron después quedan pendientes)
+def marcar_exportados(hasta):
+    _asegurar_tablas()
+    with transaccion() as conexion:
+        conexion.execute("UPDATE cambios_productos SET exportado = 1 WHERE exportado = 0 AND id <= ?", (hasta,))
+
+# Escribe en el Excel los cambios pendientes. 'guardar(df, excel_path)' es la
+# función que escribe el libro. Los cambios que llegan mientras tanto quedan
+# para la próxima exportación.
+def exportar_cambios(excel_path, guardar):
+    with _bloqueo_exportacion:
+        cambios = cambios_pendientes()
+        if not cambios:
+            return 0
+        df = aplicar_pendientes(leer_excel(excel_path), cambios)
+        guardar(df, excel_path)
+        marcar_exportados(cambios[-1]['id'])
+    return len(cambios)
+
+# Cambio masivo (precios, listas de proveedores): se parte del Excel con los
+# cambios pendientes de todas las sesiones aplicados, no de la copia de una
+# sesión que puede estar vieja. 'transformar(df)' devuelve el catálogo nuevo,
+# que se guarda de una vez; solo se marcan como exportados los cambios que
+# entraron. Devuelve el catálogo guardado.
+def guardar_cambio_masivo(excel_path, guardar, transformar):
+    with _bloqueo_exportacion:
+        cambios = cambios_pendientes()
+        df = transformar(aplicar_pendientes(leer_excel(excel_path), cambios))
+        guardar(df, excel_path)
+        if cambios:
+            marcar_exportados(cambios[-1]['id'])
+    return df
+
+def exportar_cambios_en_segundo_plano(excel_path, guardar):
+    agendar_tarea(('exportar_cambios_productos', excel_path), exportar_cambios, excel_path, guardar)
@@ -0,0 +1,211 @@
+import threading
+import uuid
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from cache_columnar import firma_archivo, leer_excel
+from maestros import ARCHIVO_PRODUCTOS, ARCHIVO_CLIENTES, COLUMNAS_UBICACION
+from esquemas import aplicar_esquema
+from registro_stock import delta_pendiente, marca_compactacion, a_entero
+from reservas import obtener_gestor
+from indice_productos import IndiceProductos
+from buscador import MotorBusqueda
+from directorio_clientes import DirectorioClientes
+
+# ===============================
+# Catálogo Compartido entre Sesiones
+# ===============================
+
+ESQUEMA_POR_ARCHIVO = {
+    ARCHIVO_PRODUCTOS: 'productos',
+    ARCHIVO_CLIENTES: 'clientes',
+}
+
+# Última firma cargada por archivo, para descartar versiones viejas del caché
+_firmas_cargadas = {}
+_bloqueo_firmas = threading.Lock()
+
+# Carga una versión del archivo una sola vez por proceso del servidor, con los
+# tipos compactos de su esquema (ver esquemas.py).
+# El DataFrame devuelto es compartido por todas las sesiones: NO se debe modificar.
+# Los productos llevan en attrs la marca de compactación de esa versión del
+# libro (ver registro_stock.py); las filas la heredan.
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _cargar_tabla(path, firma):
+    marca = marca_compactacion(path) if path == ARCHIVO_PRODUCTOS else None
+    df = leer_excel(path)
+    if path in ESQUEMA_POR_ARCHIVO:
+        df = aplicar_esquema(df, ESQUEMA_POR_ARCHIVO[path])
+    if marca is not None:
+        df.attrs['marca_stock'] = marca
+    return df
+
+# Firma actual del archivo; si cambió desde la última vez, libera del caché
+# la versión anterior (tabla e índices) para no retener dos copias
+def _firma_vigente(path):
+    firma = firma_archivo(path)
+    with _bloqueo_firmas:
+        firma_anterior = _firmas_cargadas.get(path)
+        _firmas_cargadas[path] = firma
+    if firma_anterior is not None and firma_anterior != firma:
+        for cache in _CACHES_POR_VERSION:
+            cache.clear(path, firma_anterior)
+    return firma
+
+# Devuelve la tabla compartida para 'path', recargándola solo si el archivo cambió
+def obtener_tabla(path):
+    return _cargar_tabla(path, _firma_vigente(path))
+
+# Índice por Código y Nombre, armado una sola vez por versión del catálogo
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _construir_indice_productos(path, firma):
+    return IndiceProductos(_cargar_tabla(path, firma))
+
+def obtener_indice_productos():
+    return _construir_indice_productos(ARCHIVO_PRODUCTOS, _firma_vigente(ARCHIVO_PRODUCTOS))
+
+# Buscadores por trigramas, también uno por versión de cada archivo
+COLUMNAS_BUSQUEDA = {
+    ARCHIVO_PRODUCTOS: ['Nombre', 'Codigo', 'Codigo de Barras'],
+    ARCHIVO_CLIENTES: ['Nombre', 'Empresa'],
+}
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _construir_motor(path, firma):
+    return MotorBusqueda.desde_dataframe(_cargar_tabla(path, firma), COLUMNAS_BUSQUEDA[path])
+
+# Índice y buscador de una misma versión del catálogo (las posiciones coinciden)
+def obtener_busqueda_productos():
+    firma = _firma_vigente(ARCHIVO_PRODUCTOS)
+    return _construir_indice_productos(ARCHIVO_PRODUCTOS, firma), _construir_motor(ARCHIVO_PRODUCTOS, firma)
+
+# Fichas de clientes por posición, Id y nombre, una vez por versión del archivo
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _construir_directorio_clientes(path, firma):
+    return DirectorioClientes(_cargar_tabla(path, firma))
+
+# Tabla de clientes, su buscador y su directorio, de una misma versión del archivo
+def obtener_busqueda_clientes():
+    firma = _firma_vigente(ARCHIVO_CLIENTES)
+    return (
+        _cargar_tabla(ARCHIVO_CLIENTES, firma),
+        _construir_motor(ARCHIVO_CLIENTES, firma),
+        _construir_directorio_clientes(ARCHIVO_CLIENTES, firma)
+    )
+
+# Código -> 'Categorias' del producto, para agrupar ventas por categoría.
+# Se devuelve junto con la firma del archivo, que identifica la versión del
+# catálogo (sirve de clave para guardar resúmenes calculados con él)
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _construir_categorias(path, firma):
+    df = _cargar_tabla(path, firma)
+    if 'Codigo' not in df.columns or 'Categorias' not in df.columns:
+        return {}
+    return {
+        str(codigo): categorias for codigo, categorias in zip(df['Codigo'], df['Categorias'])
+        if pd.notna(codigo) and pd.notna(categorias)
+    }
+
+def obtener_categorias_productos():
+    firma = _firma_vigente(ARCHIVO_PRODUCTOS)
+    return firma, _construir_categorias(ARCHIVO_PRODUCTOS, firma)
+
+# Ubicación en el depósito de cada código: {codigo: (Pasillo, Estante, Columna)}
+# (las columnas que no tenga el archivo quedan como '')
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _construir_ubicaciones(path, firma):
+    df = _cargar_tabla(path, firma)
+    if 'Codigo' not in df.columns:
+        return {}
+    valores = [
+        df[columna].astype(object).where(df[columna].notna(), '') if columna in df.columns else [''] * len(df)
+        for columna in COLUMNAS_UBICACION
+    ]
+    return {
+        str(codigo): tuple(str(valor) for valor in fila)
+        for codigo, *fila in zip(df['Codigo'], *valores) if pd.notna(codigo)
+    }
+
+def obtener_ubicaciones_productos():
+    return _construir_ubicaciones(ARCHIVO_PRODUCTOS, _firma_vigente(ARCHIVO_PRODUCTOS))
+
+def obtener_productos():
+    return obtener_tabla(ARCHIVO_PRODUCTOS)
+
+def obtener_clientes():
+    return obtener_tabla(ARCHIVO_CLIENTES)
+
+# Cachés que guardan algo por (archivo, firma) y se limpian cuando el archivo cambia
+_CACHES_POR_VERSION = [
+    _cargar_tabla, _construir_indice_productos, _construir_motor,
+    _construir_directorio_clientes, _construir_categorias, _construir_ubicaciones
+]
+
+# ===============================
+# Stock Reservado por los Pedidos en Curso
+# ===============================
+
+# Las reservas son compartidas entre todas las sesiones (ver reservas.py): lo
+# que un vendedor agrega a su pedido deja de estar disponible para los demás.
+
+# Identificador de la sesión de Streamlit actual
+def id_sesion():
+    contexto = get_script_run_ctx()
+    if contexto is not None:
+        return contexto.session_id
+    if 'id_sesion' not in st.session_state:
+        st.session_state.id_sesion = uuid.uuid4().hex
+    return st.session_state.id_sesion
+
+# Stock real: el de esa versión del catálogo más los movimientos que todavía
+# no tenía (los posteriores a su marca de compactación)
+def stock_real(producto_data):
+    codigo = producto_data['Codigo']
+    marca = getattr(producto_data, 'attrs', {}).get('marca_stock')
+    if marca is None:
+        marca = marca_compactacion(ARCHIVO_PRODUCTOS)
+    return a_entero(producto_data['Stock']) + delta_pendiente(codigo, marca)
+
+# Reserva 'cantidad' para el pedido de esta sesión. Devuelve False si otro
+# pedido ya tomó el stock que quedaba.
+def reservar_stock_sesion(producto_data, cantidad):
+    return obtener_gestor().reservar(id_sesion(), producto_data['Codigo'], int(cantidad), stock_real(producto_data))
+
+def liberar_stock_sesion(codigo, cantidad):
+    obtener_gestor().liberar(id_sesion(), codigo, int(cantidad))
+
+def reservado_sesion(codigo):
+    return obtener_gestor().reservado_por(id_sesion(), codigo)
+
+# Cada recarga de la página de ventas mantiene vivas las reservas de la sesión
+def renovar_reservas_sesion():
+    obtener_gestor().renovar(id_sesion())
+
+# Al guardar el pedido el registro de stock ya tiene el movimiento: las reservas se quitan
+def confirmar_reservas_sesion():
+    obtener_gestor().liberar_sesion(id_sesion())
+
+# Vuelve a reservar lo que haya vencido de un pedido (si la sesión estuvo
+# inactiva más que la duración de la reserva). Devuelve los ítems sin stock.
+def asegurar_reservas_pedido(pedido, productos_por_codigo):
+    sin_stock = []
+    for item in pedido:
+        faltante = item['Cantidad'] - reservado_sesion(item['Codigo'])
+        if faltante <= 0:
+            continue
+        producto_data = productos_por_codigo(item['Codigo'])
+        if producto_data is None or not reservar_stock_sesion(producto_data, faltante):
+            sin_stock.append(item['Nombre'])
+    return sin_stock
+
+# Al adoptar el borrador de una sesión que terminó, sus reservas pasan a
+# esta: se sueltan las de la sesión anterior y se toman de nuevo acá
+def heredar_reservas_sesion(sesion_anterior, pedido, productos_por_codigo):
+    obtener_gestor().liberar_sesion(sesion_anterior)
+    return asegurar_reservas_pedido(pedido, productos_por_codigo)
+
+# Stock que todavía se puede agregar a un pedido: el real menos todo lo
+# reservado por los pedidos en curso (de esta sesión y de las demás)
+def stock_disponible(producto_data):
+    return stock_real(producto_data) - obtener_gestor().reservado(producto_data['Codigo'])
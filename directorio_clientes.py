@@ -0,0 +1,85 @@
+import pandas as pd
+from base_datos import valor_json
+from buscador import normalizar
+
+# ===============================
+# Directorio de Clientes
+# ===============================
+
+# Ficha chica de cada cliente (solo los campos que muestran las páginas de
+# ventas) con acceso directo por posición, por 'Id' y por nombre normalizado.
+# Se arma una vez por versión del archivo de clientes; elegir un cliente y
+# mostrar su detalle ya no filtra la tabla entera por cada dato.
+
+CAMPOS_CLIENTE = [
+    'Id', 'Nombre', 'Empresa', 'Descuento', 'Celular', 'Telefono', 'CUIT',
+    'Direccion', 'Ciudad', 'Provincia', 'Vendedores', 'Fecha Modificado'
+]
+
+# Números que Excel guarda como float (5491123456789.0) y se muestran como enteros
+CAMPOS_ENTEROS = ['Id', 'Celular', 'Telefono', 'CUIT']
+
+NOMBRE_DESCONOCIDO = "Cliente desconocido"
+FORMATO_FECHA = "%d/%m/%Y %H:%M:%S"
+
+def _valor_ficha(campo, valor):
+    # Las fechas se muestran como en el archivo original
+    if isinstance(valor, pd.Timestamp):
+        return valor.strftime(FORMATO_FECHA)
+    valor = valor_json(valor)
+    if campo in CAMPOS_ENTEROS and isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+class DirectorioClientes:
+    def __init__(self, df):
+        campos = [campo for campo in CAMPOS_CLIENTE if campo in df.columns]
+        # Una ficha por fila, en el mismo orden que el DataFrame (las posiciones
+        # coinciden con las del buscador armado sobre la misma tabla)
+        self.fichas = [
+            {campo: _valor_ficha(campo, valor) for campo, valor in zip(campos, fila)}
+            for fila in df[campos].itertuples(index=False, name=None)
+        ]
+        self.por_id = {}
+        self.por_nombre = {}
+        for posicion, ficha in enumerate(self.fichas):
+            if ficha.get('Id') is not None:
+                self.por_id.setdefault(str(ficha['Id']), posicion)
+            # Los nombres repetidos quedan todos, en orden de aparición
+            self.por_nombre.setdefault(normalizar(ficha.get('Nombre')), []).append(posicion)
+
+    def __len__(self):
+        return len(self.fichas)
+
+    def ficha(self, posicion):
+        if posicion is None:
+            return None
+        return self.fichas[posicion]
+
+    def buscar_id(self, id_cliente):
+        return self.ficha(self.por_id.get(str(id_cliente)))
+
+    # Posiciones de todos los clientes con ese nombre (sin distinguir
+    # mayúsculas, acentos ni espacios de más)
+    def posiciones_nombre(self, nombre):
+        return self.por_nombre.get(normalizar(nombre), [])
+
+    # Primer cliente con ese nombre, o None
+    def buscar_nombre(self, nombre):
+        posiciones = self.posiciones_nombre(nombre)
+        return self.ficha(posiciones[0]) if posiciones else None
+
+    def nombre(self, posicion):
+        return self.fichas[posicion].get('Nombre') or NOMBRE_DESCONOCIDO
+
+    # Texto para los selectores. Si otro cliente se llama igual se agregan
+    # empresa, ciudad e Id para poder distinguirlos.
+    def etiqueta(self, posicion):
+        ficha = self.fichas[posicion]
+        nombre = self.nombre(posicion)
+        if len(self.posiciones_nombre(ficha.get('Nombre'))) < 2:
+            return nombre
+        extras = [str(ficha[campo]) for campo in ('Empresa', 'Ciudad') if ficha.get(campo)]
+        if ficha.get('Id') is not None:
+            extras.append(f"#{ficha['Id']}")
+        return f"{nombre} ({' · '.join(extras)})" if extras else f"{nombre} (fila {posicion + 1})"
@@ -0,0 +1,336 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from fpdf import FPDF
+from PIL import Image
+from base_datos import agendar_tarea
+from cache_columnar import firma_archivo
+from maestros import COLUMNAS_UBICACION
+from catalogo import obtener_busqueda_clientes, obtener_ubicaciones_productos
+from picking import orden_ruta
+from repositorio import obtener_pedido, pedidos_por_fecha
+
+# ===============================
+# Documentos de los Pedidos (PDF)
+# ===============================
+
+# Lista de picking (en el orden de recorrido del depósito, ver picking.py)
+# y remito para el cliente de cada pedido guardado. El logo se achica una
+# sola vez a un JPEG chico (el PNG original pesa más de medio MB y fpdf no
+# acepta su canal alfa), que fpdf lee rápido en cada documento; las fuentes
+# son las de base de fpdf, que se cargan una vez por proceso. Los documentos
+# de un día se generan en varios procesos aparte (fpdf es Python puro y
+# ocupa la CPU) sin frenar las páginas de venta.
+
+DIRECTORIO_DOCUMENTOS = 'documentos_pedidos'
+DIRECTORIO_CACHE = os.path.join('.cache_soop', 'documentos')
+ARCHIVO_LOGO = 'logomundo.png'
+ANCHO_LOGO_PX = 400
+ANCHO_LOGO_MM = 30
+CALIDAD_JPEG = 85
+
+TIPOS_DOCUMENTO = {
+    'picking': 'Lista de picking',
+    'remito': 'Remito',
+}
+
+# Con pocos documentos no conviene levantar procesos
+MINIMO_PARA_PROCESOS = 20
+PROCESOS = max(1, min(4, (os.cpu_count() or 1)))
+
+CAMPOS_CLIENTE_REMITO = [
+    ('Empresa', 'Empresa'), ('CUIT', 'CUIT'), ('Direccion', 'Dirección'),
+    ('Ciudad', 'Ciudad'), ('Provincia', 'Provincia'), ('Telefono', 'Teléfono'), ('Celular', 'Celular')
+]
+
+# fpdf (fuentes de base) solo escribe latin-1
+REEMPLAZOS_LATIN1 = {
+    '–': '-', '—': '-', '‘': "'", '’': "'", '“': '"',
+    '”': '"', '…': '...', '•': '-', '™': '(TM)', '€': 'EUR',
+}
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    texto = str(valor)
+    for original, reemplazo in REEMPLAZOS_LATIN1.items():
+        texto = texto.replace(original, reemplazo)
+    return texto.encode('latin-1', 'replace').decode('latin-1')
+
+def _numero(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _cantidad(valor):
+    numero = _numero(valor)
+    return str(int(numero)) if numero.is_integer() else f"{numero:g}"
+
+# ===============================
+# Logo (se prepara una vez)
+# ===============================
+
+_logo = {}
+_bloqueo_logo = threading.Lock()
+
+# JPEG chico del logo sobre fondo blanco, regenerado solo si cambia el PNG
+def _preparar_logo():
+    mtime_ns, tamaño = firma_archivo(ARCHIVO_LOGO)
+    ruta = os.path.join(DIRECTORIO_CACHE, f"logo_{mtime_ns}_{tamaño}.jpg")
+    if os.path.exists(ruta):
+        return ruta
+    imagen = Image.open(ARCHIVO_LOGO)
+    imagen.thumbnail((ANCHO_LOGO_PX, ANCHO_LOGO_PX))
+    imagen = imagen.convert('RGBA')
+    fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+    fondo.paste(imagen, mask=imagen.getchannel('A'))
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fondo.save(temporal, format='JPEG', quality=CALIDAD_JPEG, optimize=True)
+    os.replace(temporal, ruta)
+    return ruta
+
+# Ruta del JPEG del logo, o None si no hay logo
+def _obtener_logo():
+    if not os.path.exists(ARCHIVO_LOGO):
+        return None
+    firma = firma_archivo(ARCHIVO_LOGO)
+    if firma not in _logo:
+        with _bloqueo_logo:
+            if firma not in _logo:
+                ruta = _preparar_logo()
+                _logo.clear()
+                _logo[firma] = ruta
+    return _logo[firma]
+
+# ===============================
+# Plantilla de Página
+# ===============================
+
+class DocumentoPedido(FPDF):
+    def __init__(self, titulo, subtitulo):
+        super().__init__('P', 'mm', 'A4')
+        self.titulo = _texto(titulo)
+        self.subtitulo = _texto(subtitulo)
+        # Columnas de la tabla (ver definir_columnas): se repiten en cada página
+        self.columnas = []
+        self.set_auto_page_break(True, margin=15)
+        self.set_margins(10, 10, 10)
+        self.alias_nb_pages()
+        self.ruta_logo = _obtener_logo()
+
+    def header(self):
+        if self.ruta_logo is not None:
+            self.image(self.ruta_logo, 10, 8, ANCHO_LOGO_MM)
+        self.set_font('Helvetica', 'B', 16)
+        self.cell(0, 8, self.titulo, 0, 1, 'R')
+        self.set_font('Helvetica', '', 10)
+        self.cell(0, 6, self.subtitulo, 0, 1, 'R')
+        self.set_y(max(self.get_y(), 8 + ANCHO_LOGO_MM) + 2)
+        if self.columnas and self.page_no() > 1:
+            self.encabezado_tabla()
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font('Helvetica', 'I', 8)
+        self.cell(0, 6, f"Página {self.page_no()} de {{nb}}", 0, 0, 'C')
+
+    # Columnas (ancho, título, alineación); la de ancho 0 ocupa lo que dejan las demás
+    def definir_columnas(self, columnas):
+        libre = self.w - self.l_margin - self.r_margin - sum(ancho for ancho, _, _ in columnas)
+        self.columnas = [(ancho or libre, titulo, alineacion) for ancho, titulo, alineacion in columnas]
+        self.encabezado_tabla()
+
+    def encabezado_tabla(self):
+        self.set_font('Helvetica', 'B', 9)
+        self.set_fill_color(230, 230, 230)
+        for ancho, titulo, alineacion in self.columnas:
+            self.cell(ancho, 7, titulo, 1, 0, alineacion, True)
+        self.ln()
+        self.set_font('Helvetica', '', 9)
+
+    # Texto recortado para que entre en la celda
+    def ajustar(self, texto, ancho):
+        texto = _texto(texto)
+        if self.get_string_width(texto) <= ancho - 2:
+            return texto
+        while texto and self.get_string_width(texto + '...') > ancho - 2:
+            texto = texto[:-1]
+        return texto + '...'
+
+    def fila(self, valores):
+        for (ancho, _, alineacion), valor in zip(self.columnas, valores):
+            self.cell(ancho, 7, self.ajustar(valor, ancho), 1, 0, alineacion)
+        self.ln()
+
+    def salida(self):
+        return self.output(dest='S').encode('latin-1')
+
+# ===============================
+# Lista de Picking y Remito
+# ===============================
+
+def _subtitulo(pedido):
+    return f"Pedido #{pedido['id']} - {pedido.get('fecha') or ''} {pedido.get('hora') or ''}"
+
+def _picking(documento):
+    pedido = documento['pedido']
+    ubicaciones = documento['ubicaciones']
+    vacia = ('',) * len(COLUMNAS_UBICACION)
+    ruta = orden_ruta([ubicaciones.get(str(item.get('Codigo')), vacia) for item in pedido['items']])
+    items = [pedido['items'][posicion] for posicion in ruta]
+    pdf = DocumentoPedido(TIPOS_DOCUMENTO['picking'], _subtitulo(pedido))
+    pdf.add_page()
+    pdf.set_font('Helvetica', '', 10)
+    pdf.cell(0, 6, _texto(f"Cliente: {pedido.get('cliente') or ''}"), 0, 1)
+    pdf.cell(0, 6, _texto(f"Vendedor: {pedido.get('vendedor') or ''}"), 0, 1)
+    pdf.ln(2)
+    pdf.definir_columnas(
+        [(16, _texto(columna), 'C') for columna in COLUMNAS_UBICACION]
+        + [(30, 'Código', 'L'), (0, 'Producto', 'L'), (18, 'Cantidad', 'R'), (10, 'OK', 'C')]
+    )
+    unidades = 0.0
+    for item in items:
+        ubicacion = ubicaciones.get(str(item.get('Codigo')), vacia)
+        pdf.fila(list(ubicacion) + [item.get('Codigo'), item.get('Nombre'), _cantidad(item.get('Cantidad')), ''])
+        unidades += _numero(item.get('Cantidad'))
+    pdf.ln(2)
+    pdf.set_font('Helvetica', 'B', 10)
+    pdf.cell(0, 7, _texto(f"{len(items)} productos, {_cantidad(unidades)} unidades"), 0, 1, 'R')
+    return pdf.salida()
+
+def _remito(documento):
+    pedido = documento['pedido']
+    cliente = documento['cliente'] or {}
+    pdf = DocumentoPedido(TIPOS_DOCUMENTO['remito'], _subtitulo(pedido))
+    pdf.add_page()
+    pdf.set_font('Helvetica', 'B', 11)
+    pdf.cell(0, 7, _texto(f"Cliente: {pedido.get('cliente') or ''}"), 0, 1)
+    pdf.set_font('Helvetica', '', 9)
+    for campo, etiqueta in CAMPOS_CLIENTE_REMITO:
+        if cliente.get(campo) not in (None, ''):
+            pdf.cell(0, 5, _texto(f"{etiqueta}: {cliente[campo]}"), 0, 1)
+    pdf.cell(0, 5, _texto(f"Vendedor: {pedido.get('vendedor') or ''}"), 0, 1)
+    pdf.ln(3)
+    pdf.definir_columnas([(30, 'Código', 'L'), (0, 'Producto', 'L'), (20, 'Cantidad', 'R'), (28, 'Precio', 'R'), (30, 'Importe', 'R')])
+    total = 0.0
+    for item in pedido['items']:
+        importe = item.get('Importe')
+        importe = _numero(importe) if importe is not None else _numero(item.get('Cantidad')) * _numero(item.get('Precio'))
+        total += importe
+        pdf.fila([
+            item.get('Codigo'), item.get('Nombre'), _cantidad(item.get('Cantidad')),
+            f"${_numero(item.get('Precio')):,.2f}", f"${importe:,.2f}"
+        ])
+    pdf.ln(2)
+    pdf.set_font('Helvetica', 'B', 11)
+    pdf.cell(0, 8, f"Total: ${total:,.2f}", 0, 1, 'R')
+    return pdf.salida()
+
+_RENDERIZADORES = {'picking': _picking, 'remito': _remito}
+
+# PDF (bytes) de un documento armado con preparar_documentos
+def renderizar_documento(documento):
+    return _RENDERIZADORES[documento['tipo']](documento)
+
+# ===============================
+# Datos de los Documentos
+# ===============================
+
+# Cada documento lleva solo datos simples (se mandan a otros procesos):
+# el pedido, la ficha del cliente y la ubicación de sus productos
+def preparar_documentos(pedidos, tipos=tuple(TIPOS_DOCUMENTO)):
+    _, _, directorio_clientes = obtener_busqueda_clientes()
+    ubicaciones = obtener_ubicaciones_productos()
+    documentos = []
+    for pedido in pedidos:
+        codigos = {str(item.get('Codigo')) for item in pedido['items']}
+        datos = {
+            'pedido': pedido,
+            'cliente': directorio_clientes.buscar_nombre(pedido.get('cliente')),
+            'ubicaciones': {codigo: ubicaciones[codigo] for codigo in codigos if codigo in ubicaciones},
+        }
+        documentos.extend(dict(datos, tipo=tipo) for tipo in tipos)
+    return documentos
+
+# PDF de un pedido guardado, o None si no existe
+def documento_pedido(id_pedido, tipo):
+    pedido = obtener_pedido(id_pedido)
+    if pedido is None:
+        return None
+    return renderizar_documento(preparar_documentos([pedido], (tipo,))[0])
+
+# ===============================
+# Generación por Lotes
+# ===============================
+
+def ruta_documento(pedido, tipo):
+    dia = str(pedido.get('fecha') or '')[:10] or 'sin_fecha'
+    return os.path.join(DIRECTORIO_DOCUMENTOS, dia, f"pedido_{pedido['id']}_{tipo}.pdf")
+
+def _escribir_atomico(ruta, contenido):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporal, 'wb') as archivo:
+            archivo.write(contenido)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+# Lo que corre cada proceso: renderiza y escribe una tanda de documentos
+def _generar_tanda(documentos):
+    rutas = []
+    for documento in documentos:
+        ruta = ruta_documento(documento['pedido'], documento['tipo'])
+        _escribir_atomico(ruta, renderizar_documento(documento))
+        rutas.append(ruta)
+    return rutas
+
+_procesos = None
+_bloqueo_procesos = threading.Lock()
+
+# Procesos que quedan vivos entre lotes (con el logo y las fuentes ya cargados).
+# 'spawn': el servidor de Streamlit tiene hilos y no conviene copiarlo con fork.
+def _obtener_procesos():
+    global _procesos
+    with _bloqueo_procesos:
+        if _procesos is None:
+            _procesos = ProcessPoolExecutor(max_workers=PROCESOS, mp_context=multiprocessing.get_context('spawn'))
+        return _procesos
+
+# Genera los documentos de todos los pedidos de un día y devuelve sus rutas
+def generar_documentos_del_dia(fecha=None, tipos=tuple(TIPOS_DOCUMENTO)):
+    fecha = fecha or datetime.now().strftime("%Y-%m-%d")
+    documentos = preparar_documentos(pedidos_por_fecha(fecha), tipos)
+    if PROCESOS <= 1 or len(documentos) < MINIMO_PARA_PROCESOS:
+        return _generar_tanda(documentos)
+    # Tandas de varios documentos: menos ida y vuelta entre procesos
+    tamaño_tanda = max(1, len(documentos) // (PROCESOS * 4))
+    tandas = [documentos[inicio:inicio + tamaño_tanda] for inicio in range(0, len(documentos), tamaño_tanda)]
+    rutas = []
+    for rutas_tanda in _obtener_procesos().map(_generar_tanda, tandas):
+        rutas.extend(rutas_tanda)
+    return rutas
+
+# Agenda la generación sin bloquear la página
+def generar_documentos_en_segundo_plano(fecha=None, tipos=tuple(TIPOS_DOCUMENTO)):
+    fecha = fecha or datetime.now().strftime("%Y-%m-%d")
+    agendar_tarea(('generar_documentos', fecha, tuple(tipos)), generar_documentos_del_dia, fecha, tuple(tipos))
+    return os.path.join(DIRECTORIO_DOCUMENTOS, fecha)
+
+# Uso: python documentos.py [AAAA-MM-DD]
+def main():
+    fecha = sys.argv[1] if len(sys.argv) > 1 else None
+    inicio = time.perf_counter()
+    rutas = generar_documentos_del_dia(fecha)
+    print(f"{len(rutas)} documentos generados ({time.perf_counter() - inicio:.1f} s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import sys
+import numpy as np
+import pandas as pd
+from cache_columnar import leer_excel
+
+# ===============================
+# Tipos de Columnas de las Tablas Cargadas
+# ===============================
+
+# Lo que se lee de Excel/CSV queda casi todo como 'object' (un objeto de
+# Python por celda). Las tablas compartidas por todas las sesiones se pasan a
+# tipos compactos al cargarlas: texto repetido -> category, enteros -> enteros
+# con nulos (Int32/Int64), precios -> float32, fechas -> datetime64. Ninguna
+# conversión pierde datos: si una columna no entra en el tipo declarado
+# (texto en una columna numérica, un precio que float32 no representa
+# exacto, una fecha que no se entiende) se deja como estaba.
+
+ESQUEMAS = {
+    'productos': {
+        'enteros': ['Id', 'Stock', 'unidad por bulto', 'inner', 'forzar multiplos', 'Orden'],
+        # Además de estas, toda columna que empiece con 'Precio' o 'Costo'
+        'decimales': [],
+        'prefijos_decimales': ('Precio', 'Costo'),
+        'categorias': ['Activo', 'Marca', 'Categorias', 'Etiquetas', 'Proveedor', 'Pasillo', 'Estante'],
+        'fechas': ['Fecha Creado', 'Fecha Modificado'],
+        'formato_fecha': '%Y-%m-%d %H:%M:%S',
+    },
+    'clientes': {
+        'enteros': ['Id'],
+        'decimales': ['Descuento'],
+        'prefijos_decimales': (),
+        'categorias': [
+            'Vendedores', 'Provincia', 'Ciudad', 'Zona', 'Transporte', 'Empresa',
+            'Referido', 'Estado Credito', 'Forma Pago'
+        ],
+        'fechas': ['Fecha Modificado', 'Fecha Creado'],
+        'formato_fecha': '%d/%m/%Y %H:%M:%S',
+    },
+}
+
+# Una columna de texto pasa a category si tiene a lo sumo esta proporción de valores distintos
+PROPORCION_CATEGORIA = 0.5
+
+def _numeros_sin_perdida(serie):
+    numeros = pd.to_numeric(serie, errors='coerce')
+    # Si aparecen nulos nuevos es que había texto: no se convierte
+    if numeros.isna().sum() != serie.isna().sum():
+        return None
+    return numeros
+
+def _a_entero(serie):
+    numeros = _numeros_sin_perdida(serie)
+    if numeros is None:
+        return serie
+    valores = numeros.dropna()
+    if not (valores == np.round(valores)).all():
+        return serie
+    if valores.empty or (valores.abs() < 2 ** 31).all():
+        return numeros.astype('Int32')
+    return numeros.astype('Int64')
+
+def _a_decimal(serie):
+    numeros = _numeros_sin_perdida(serie)
+    if numeros is None:
+        return serie
+    numeros = numeros.astype(np.float64)
+    compacto = numeros.astype(np.float32)
+    # float32 solo si representa cada precio exacto (enteros, medios, cuartos...)
+    if np.array_equal(compacto.to_numpy(dtype=np.float64), numeros.to_numpy(), equal_nan=True):
+        return compacto
+    return numeros
+
+def _a_categoria(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    if serie.nunique() > max(1, PROPORCION_CATEGORIA * len(serie)):
+        return serie
+    return serie.astype('category')
+
+def _a_fecha(serie, formato):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    fechas = pd.to_datetime(serie, format=formato, errors='coerce')
+    if fechas.isna().sum() != serie.isna().sum():
+        return serie
+    return fechas
+
+# Columnas numéricas declaradas del esquema (incluye las que coinciden por prefijo)
+def _columnas_decimales(df, esquema):
+    return [
+        columna for columna in df.columns
+        if columna in esquema['decimales'] or str(columna).startswith(tuple(esquema['prefijos_decimales']))
+    ]
+
+# Devuelve una copia de df con los tipos del esquema ('productos', 'clientes')
+def aplicar_esquema(df, nombre):
+    esquema = ESQUEMAS[nombre]
+    conversiones = {}
+    for columna in esquema['enteros']:
+        if columna in df.columns:
+            conversiones[columna] = _a_entero(df[columna])
+    for columna in _columnas_decimales(df, esquema):
+        if columna not in conversiones:
+            conversiones[columna] = _a_decimal(df[columna])
+    for columna in esquema['categorias']:
+        if columna in df.columns:
+            conversiones[columna] = _a_categoria(df[columna])
+    for columna in esquema['fechas']:
+        if columna in df.columns:
+            conversiones[columna] = _a_fecha(df[columna], esquema['formato_fecha'])
+    return df.assign(**conversiones) if conversiones else df
+
+# ===============================
+# Reporte de Memoria
+# ===============================
+
+# Memoria real por columna (deep=True cuenta los objetos de Python), de mayor a menor
+def reporte_memoria(df):
+    memoria = df.memory_usage(deep=True, index=False)
+    reporte = pd.DataFrame({
+        'Columna': memoria.index,
+        'Tipo': [str(df[columna].dtype) for columna in memoria.index],
+        'MB': (memoria.to_numpy() / 1e6).round(3),
+    })
+    return reporte.sort_values('MB', ascending=False, kind='stable').reset_index(drop=True)
+
+def memoria_mb(df):
+    return df.memory_usage(deep=True, index=True).sum() / 1e6
+
+# Uso: python esquemas.py [archivo:esquema ...]
+# Sin argumentos compara los archivos de productos y clientes de las páginas de ventas
+def main():
+    from maestros import ARCHIVO_PRODUCTOS, ARCHIVO_CLIENTES
+    pares = [argumento.rsplit(':', 1) for argumento in sys.argv[1:]] or [
+        (ARCHIVO_PRODUCTOS, 'productos'), (ARCHIVO_CLIENTES, 'clientes')
+    ]
+    for archivo, nombre in pares:
+        original = leer_excel(archivo)
+        compacto = aplicar_esquema(original, nombre)
+        antes = reporte_memoria(original).set_index('Columna')
+        despues = reporte_memoria(compacto).set_index('Columna')
+        comparacion = antes.join(despues, lsuffix=' antes', rsuffix=' después')
+        comparacion = comparacion[comparacion['Tipo antes'] != comparacion['Tipo después']]
+        print(f"\n{archivo} ({len(original)} filas): {memoria_mb(original):.2f} MB -> {memoria_mb(compacto):.2f} MB")
+        print(comparacion.to_string())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from base_datos import obtener_conexion, agendar_tarea
+from registro_pedidos import asegurar_tablas_pedidos
+
+# ===============================
+# Motor de Estadísticas de Ventas
+# ===============================
+
+# Las líneas de los pedidos (tabla 'lineas_pedido') se copian una sola vez a
+# una tabla de hechos columnar en memoria: una fila por ítem con pedido,
+# fecha, cliente, vendedor, código, cantidad e importe. Cuando llegan pedidos
+# nuevos solo se leen esos (los pedidos no se modifican y su ID crece). Los
+# resúmenes se calculan con groupby sobre esa tabla y se guardan hasta el
+# próximo pedido, así los tableros no vuelven a leer JSON ni Excel en cada
+# recarga. La tabla se guarda en Parquet para no desplegar todo de nuevo al
+# reiniciar el servidor.
+
+DIRECTORIO_ESTADISTICAS = os.path.join('.cache_soop', 'estadisticas')
+ARCHIVO_HECHOS = os.path.join(DIRECTORIO_ESTADISTICAS, 'hechos.parquet')
+CLAVE_ULTIMO_PEDIDO = b'soop_ultimo_pedido'
+
+COLUMNAS_HECHOS = ['id_pedido', 'fecha', 'cliente', 'vendedor', 'codigo', 'cantidad', 'importe']
+COLUMNAS_TEXTO = ['cliente', 'vendedor', 'codigo']
+
+# Dimensión de los resúmenes -> columna de la tabla de hechos
+DIMENSIONES = {
+    'dia': 'fecha',
+    'vendedor': 'vendedor',
+    'cliente': 'cliente',
+    'producto': 'codigo',
+}
+
+# Resúmenes guardados como máximo (distintos rangos de fechas) antes de vaciar
+LIMITE_RESULTADOS = 256
+
+# Clases del análisis ABC: A hasta el 80% del importe acumulado, B hasta el 95%
+UMBRALES_ABC = (0.80, 0.95)
+
+def _hechos_vacios():
+    return _tipar(pd.DataFrame({columna: [] for columna in COLUMNAS_HECHOS}))
+
+# Tipos compactos: textos repetidos como category, fecha como día
+def _tipar(hechos):
+    hechos = hechos.astype({'id_pedido': 'int64', 'cantidad': 'float64', 'importe': 'float64'})
+    hechos['fecha'] = pd.to_datetime(hechos['fecha'], errors='coerce').dt.normalize()
+    for columna in COLUMNAS_TEXTO:
+        hechos[columna] = hechos[columna].astype('category')
+    return hechos
+
+def _ultimo_pedido():
+    return obtener_conexion().execute("SELECT COALESCE(MAX(id), 0) AS ultimo FROM pedidos").fetchone()['ultimo']
+
+# Líneas de los pedidos con ID en (desde, hasta]. Devuelve (hechos, nombres por código).
+def _leer_lineas(desde, hasta):
+    # 'fecha' puede traer hora (pedidos importados del Excel): vale el día
+    filas = obtener_conexion().execute(
+        """
+        SELECT l.id_pedido, SUBSTR(COALESCE(p.fecha, ''), 1, 10) AS fecha,
+               COALESCE(p.cliente, '') AS cliente, COALESCE(p.vendedor, '') AS vendedor,
+               COALESCE(l.codigo, '') AS codigo, COALESCE(l.cantidad, 0) AS cantidad,
+               COALESCE(l.importe, COALESCE(l.cantidad, 0) * COALESCE(l.precio, 0)) AS importe, l.nombre
+        FROM lineas_pedido l JOIN pedidos p ON p.id = l.id_pedido
+        WHERE l.id_pedido > ? AND l.id_pedido <= ?
+        ORDER BY l.id_pedido, l.linea
+        """,
+        (desde, hasta)
+    ).fetchall()
+    lineas = pd.DataFrame([tuple(fila) for fila in filas], columns=COLUMNAS_HECHOS + ['nombre'])
+    lineas[['cantidad', 'importe']] = lineas[['cantidad', 'importe']].apply(pd.to_numeric, errors='coerce').fillna(0.0)
+    con_nombre = lineas[lineas['nombre'].notna() & (lineas['nombre'] != '')]
+    nombres = dict(zip(con_nombre['codigo'], con_nombre['nombre']))
+    return _tipar(lineas[COLUMNAS_HECHOS]), nombres
+
+def _leer_parquet():
+    if not os.path.exists(ARCHIVO_HECHOS):
+        return None
+    try:
+        tabla = pq.read_table(ARCHIVO_HECHOS)
+    except (OSError, pa.ArrowException):
+        return None
+    metadata = tabla.schema.metadata or {}
+    if CLAVE_ULTIMO_PEDIDO not in metadata:
+        return None
+    datos = json.loads(metadata[CLAVE_ULTIMO_PEDIDO])
+    return _tipar(tabla.to_pandas()), datos['ultimo_pedido'], datos['nombres']
+
+def _guardar_parquet(hechos, ultimo_pedido, nombres):
+    tabla = pa.Table.from_pandas(hechos, preserve_index=False)
+    metadata = dict(tabla.schema.metadata or {})
+    metadata[CLAVE_ULTIMO_PEDIDO] = json.dumps(
+        {'ultimo_pedido': ultimo_pedido, 'nombres': nombres}, ensure_ascii=False
+    ).encode('utf-8')
+    os.makedirs(DIRECTORIO_ESTADISTICAS, exist_ok=True)
+    temporal = f"{ARCHIVO_HECHOS}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        pq.write_table(tabla.replace_schema_metadata(metadata), temporal)
+        os.replace(temporal, ARCHIVO_HECHOS)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+class MotorEstadisticas:
+    def __init__(self):
+        self._bloqueo = threading.Lock()
+        self.hechos = _hechos_vacios()
+        self.ultimo_pedido = 0
+        self.nombres = {}
+        self._resultados = {}
+        guardado = _leer_parquet()
+        if guardado is not None:
+            self.hechos, self.ultimo_pedido, self.nombres = guardado
+
+    # Suma los pedidos nuevos. Es barato si no hay (una consulta por la clave primaria).
+    def actualizar(self):
+        asegurar_tablas_pedidos()
+        if _ultimo_pedido() == self.ultimo_pedido:
+            return 0
+        with self._bloqueo:
+            # Otra sesión pudo haberlos sumado mientras se esperaba el bloqueo
+            ultimo = _ultimo_pedido()
+            if ultimo == self.ultimo_pedido:
+                return 0
+            if ultimo < self.ultimo_pedido:
+                # La base se reemplazó: se arma todo de nuevo
+                self.hechos, self.ultimo_pedido, self.nombres = _hechos_vacios(), 0, {}
+            nuevos, nombres = _leer_lineas(self.ultimo_pedido, ultimo)
+            partes = [parte for parte in (self.hechos, nuevos) if not parte.empty]
+            hechos = pd.concat(partes, ignore_index=True) if partes else nuevos
+            # concat de category con categorías distintas vuelve a object
+            self.hechos = hechos.astype({columna: 'category' for columna in COLUMNAS_TEXTO})
+            self.nombres.update(nombres)
+            self.ultimo_pedido = ultimo
+            self._resultados = {}
+            agendar_tarea(
+                ('guardar_estadisticas',), _guardar_parquet, self.hechos, self.ultimo_pedido, dict(self.nombres)
+            )
+        return len(nuevos)
+
+    # Resultado guardado hasta el próximo pedido
+    def _memo(self, clave, calcular):
+        clave = (self.ultimo_pedido,) + clave
+        resultado = self._resultados.get(clave)
+        if resultado is None:
+            resultado = calcular()
+            if len(self._resultados) >= LIMITE_RESULTADOS:
+                self._resultados = {}
+            self._resultados[clave] = resultado
+        return resultado
+
+    def _periodo(self, desde, hasta):
+        hechos = self.hechos
+        if desde is not None:
+            hechos = hechos[hechos['fecha'] >= pd.Timestamp(desde)]
+        if hasta is not None:
+            hechos = hechos[hechos['fecha'] <= pd.Timestamp(hasta)]
+        return hechos
+
+    # Totales del período
+    def resumen(self, desde=None, hasta=None):
+        def calcular():
+            hechos = self._periodo(desde, hasta)
+            pedidos = hechos['id_pedido'].nunique()
+            importe = float(hechos['importe'].sum())
+            return {
+                'importe': importe,
+                'unidades': float(hechos['cantidad'].sum()),
+                'pedidos': int(pedidos),
+                'ticket_promedio': importe / pedidos if pedidos else 0.0,
+                'clientes': int(hechos['cliente'].nunique()),
+            }
+        return self._memo(('resumen', desde, hasta), calcular)
+
+    # Importe, unidades y pedidos por día, vendedor, cliente o producto
+    def ventas_por(self, dimension, desde=None, hasta=None):
+        columna = DIMENSIONES[dimension]
+        def calcular():
+            hechos = self._periodo(desde, hasta)
+            tabla = hechos.groupby(columna, observed=True).agg(
+                Importe=('importe', 'sum'),
+                Unidades=('cantidad', 'sum'),
+                Pedidos=('id_pedido', 'nunique'),
+            )
+            if dimension == 'dia':
+                return tabla.sort_index()
+            tabla = tabla.sort_values('Importe', ascending=False)
+            total = tabla['Importe'].sum()
+            tabla['% del total'] = (tabla['Importe'] / total * 100).round(1) if total else 0.0
+            if dimension == 'producto':
+                tabla.insert(0, 'Nombre', [self.nombres.get(codigo, '') for codigo in tabla.index])
+            return tabla
+        return self._memo(('ventas_por', dimension, desde, hasta), calcular)
+
+    # Por categoría del catálogo. Un producto con varias categorías suma en
+    # cada una, así que los totales por categoría se superponen. 'version'
+    # identifica el catálogo usado (la firma de su archivo).
+    def ventas_por_categoria(self, categorias_por_codigo, version, desde=None, hasta=None):
+        def calcular():
+            productos = self.ventas_por('producto', desde, hasta)
+            categorias = pd.Series(
+                [categorias_por_codigo.get(codigo) for codigo in productos.index], index=productos.index, dtype='object'
+            ).fillna('Sin categoría').astype(str).str.split(',')
+            desplegado = productos[['Importe', 'Unidades']].assign(Categoria=categorias).explode('Categoria')
+            desplegado['Categoria'] = desplegado['Categoria'].str.strip()
+            return desplegado.groupby('Categoria').sum().sort_values('Importe', ascending=False)
+        # La clave incluye la versión del catálogo (cambia cuando se modifica)
+        return self._memo(('ventas_por_categoria', version, desde, hasta), calcular)
+
+    def mas_vendidos(self, dimension='producto', cantidad=10, desde=None, hasta=None, por='Importe'):
+        return self.ventas_por(dimension, desde, hasta).sort_values(por, ascending=False).head(cantidad)
+
+    # Productos ordenados por importe con su clase A/B/C según el acumulado
+    def analisis_abc(self, desde=None, hasta=None):
+        def calcular():
+            productos = self.ventas_por('producto', desde, hasta)[['Nombre', 'Importe', 'Unidades']].copy()
+            total = productos['Importe'].sum()
+            acumulado = productos['Importe'].cumsum() / total if total else productos['Importe'] * 0
+            productos['% acumulado'] = (acumulado * 100).round(1)
+            # El producto que cruza el umbral queda en la clase del umbral
+            anterior = acumulado.shift(fill_value=0)
+            productos['Clase'] = np.select(
+                [anterior < UMBRALES_ABC[0], anterior < UMBRALES_ABC[1]], ['A', 'B'], default='C'
+            )
+            return productos
+        return self._memo(('analisis_abc', desde, hasta), calcular)
+
+_motor = None
+_bloqueo_motor = threading.Lock()
+
+# Motor único del proceso (la tabla de hechos es compartida por todas las sesiones)
+def obtener_motor():
+    global _motor
+    if _motor is None:
+        with _bloqueo_motor:
+            if _motor is None:
+                _motor = MotorEstadisticas()
+    _motor.actualizar()
+    return _motor
@@ -0,0 +1,212 @@
+import glob
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from base_datos import agendar_tarea
+
+# ===============================
+# Historial de Ventas (solo agregado, por mes)
+# ===============================
+
+# Cada venta se agrega al final del CSV de su mes (historial_ventas/AAAA-MM.csv)
+# con una sola escritura en modo append y fsync: guardar no depende del tamaño
+# del historial y un corte a mitad de escritura como mucho deja una última
+# línea incompleta, que el lector descarta. Los meses cerrados se compactan a
+# Parquet; para no duplicar filas si algo se corta en el medio, el CSV primero
+# se renombra a un pendiente único (AAAA-MM.<id>.compactando) y el Parquet
+# anota qué pendientes ya incluye.
+
+DIRECTORIO_HISTORIAL = 'historial_ventas'
+ARCHIVO_HISTORIAL_ANTERIOR = 'historial_ventas.csv'
+COLUMNAS_HISTORIAL = ['Producto', 'Cantidad', 'Precio Unitario', 'Subtotal', 'Vendedor', 'Cliente', 'Fecha', 'Total']
+COLUMNAS_TEXTO = ['Producto', 'Vendedor', 'Cliente', 'Fecha']
+CLAVE_FUENTES = b'soop_fuentes'
+
+_bloqueo = threading.Lock()
+
+def _ruta(mes, extension):
+    return os.path.join(DIRECTORIO_HISTORIAL, f"{mes}.{extension}")
+
+def _pendientes(mes):
+    return sorted(glob.glob(os.path.join(DIRECTORIO_HISTORIAL, f"{mes}.*.compactando")))
+
+def _mes_actual():
+    return datetime.now().strftime("%Y-%m")
+
+# Agrega las filas al final del archivo con una sola escritura
+def _agregar_filas(ruta, filas):
+    descriptor = os.open(ruta, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        tamaño = os.fstat(descriptor).st_size
+        texto = filas.to_csv(index=False, header=tamaño == 0, lineterminator='\n')
+        # Si una escritura anterior quedó cortada, la línea rota queda sola
+        # (el lector la descarta) y la venta nueva empieza en su propia línea
+        if tamaño and os.pread(descriptor, 1, tamaño - 1) != b'\n':
+            texto = '\n' + texto
+        datos = texto.encode('utf-8')
+        while datos:
+            datos = datos[os.write(descriptor, datos):]
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+# Escritura completa de un archivo: temporal + fsync + renombrar
+def _escribir_atomico(ruta, escribir):
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        escribir(temporal)
+        with open(temporal, 'rb') as archivo:
+            os.fsync(archivo.fileno())
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+def _leer_csv(ruta, columnas=None):
+    usar = None if columnas is None else (lambda columna: columna in columnas or columna == 'Total')
+    df = pd.read_csv(ruta, usecols=usar, dtype={columna: str for columna in COLUMNAS_TEXTO}, on_bad_lines='skip')
+    if 'Total' not in df.columns:
+        return df.iloc[0:0]
+    # Una línea cortada a mitad de escritura queda sin 'Total'
+    df = df[pd.to_numeric(df['Total'], errors='coerce').notna()]
+    return df if columnas is None else df[[columna for columna in df.columns if columna in columnas]]
+
+def _fuentes_compactadas(ruta_parquet):
+    metadata = pq.read_schema(ruta_parquet).metadata or {}
+    return set(json.loads(metadata.get(CLAVE_FUENTES, b'[]')))
+
+# Todas las ventas de un mes: Parquet compactado, pendientes que todavía no
+# incluye y el CSV donde se siguen agregando
+def _leer_particion(mes, columnas=None):
+    partes = []
+    compactadas = set()
+    ruta_parquet = _ruta(mes, 'parquet')
+    if os.path.exists(ruta_parquet):
+        compactadas = _fuentes_compactadas(ruta_parquet)
+        presentes = set(pq.read_schema(ruta_parquet).names)
+        partes.append(pd.read_parquet(ruta_parquet, columns=None if columnas is None else [c for c in columnas if c in presentes]))
+    for ruta in _pendientes(mes):
+        if os.path.basename(ruta) not in compactadas:
+            partes.append(_leer_csv(ruta, columnas))
+    if os.path.exists(_ruta(mes, 'csv')):
+        partes.append(_leer_csv(_ruta(mes, 'csv'), columnas))
+    partes = [parte for parte in partes if not parte.empty]
+    if not partes:
+        return pd.DataFrame(columns=columnas or COLUMNAS_HISTORIAL)
+    return pd.concat(partes, ignore_index=True)
+
+# ===============================
+# Migración del CSV Único Anterior
+# ===============================
+
+# El historial_ventas.csv de antes se reparte por mes como pendientes de
+# nombre fijo: si se corta, volver a correr reescribe los mismos archivos
+def _migrar_historial_anterior():
+    if not os.path.exists(ARCHIVO_HISTORIAL_ANTERIOR):
+        return 0
+    with _bloqueo:
+        if not os.path.exists(ARCHIVO_HISTORIAL_ANTERIOR):
+            return 0
+        os.makedirs(DIRECTORIO_HISTORIAL, exist_ok=True)
+        df = _leer_csv(ARCHIVO_HISTORIAL_ANTERIOR).reindex(columns=COLUMNAS_HISTORIAL)
+        for mes, filas in df.groupby(df['Fecha'].astype(str).str[:7], sort=False):
+            destino = os.path.join(DIRECTORIO_HISTORIAL, f"{mes}.historial-anterior.compactando")
+            _escribir_atomico(destino, lambda temporal, filas=filas: filas.to_csv(temporal, index=False, lineterminator='\n'))
+        os.replace(ARCHIVO_HISTORIAL_ANTERIOR, ARCHIVO_HISTORIAL_ANTERIOR + '.migrado')
+    return len(df)
+
+# ===============================
+# Escritura y Lectura
+# ===============================
+
+# Agrega las filas de una venta (un DataFrame con las columnas del historial)
+def registrar_venta(df_venta):
+    _migrar_historial_anterior()
+    df = df_venta.reindex(columns=COLUMNAS_HISTORIAL)
+    os.makedirs(DIRECTORIO_HISTORIAL, exist_ok=True)
+    with _bloqueo:
+        for mes, filas in df.groupby(df['Fecha'].astype(str).str[:7], sort=False):
+            _agregar_filas(_ruta(mes, 'csv'), filas)
+    return len(df)
+
+# Meses con ventas ('AAAA-MM'), de más viejo a más nuevo
+def meses_disponibles():
+    if not os.path.isdir(DIRECTORIO_HISTORIAL):
+        return []
+    meses = {
+        nombre[:7] for nombre in os.listdir(DIRECTORIO_HISTORIAL)
+        if nombre.endswith(('.csv', '.parquet', '.compactando'))
+    }
+    return sorted(meses)
+
+# Ventas entre dos fechas (inclusive). Solo se leen los meses del rango y,
+# si se piden, solo algunas columnas.
+def leer_historial(desde=None, hasta=None, columnas=None):
+    _migrar_historial_anterior()
+    desde = pd.Timestamp(desde).strftime("%Y-%m-%d") if desde is not None else None
+    hasta = (pd.Timestamp(hasta) + timedelta(days=1)).strftime("%Y-%m-%d") if hasta is not None else None
+    meses = [
+        mes for mes in meses_disponibles()
+        if (desde is None or mes >= desde[:7]) and (hasta is None or mes <= hasta[:7])
+    ]
+    columnas_lectura = None if columnas is None else list(dict.fromkeys(list(columnas) + ['Fecha']))
+    partes = [_leer_particion(mes, columnas_lectura) for mes in meses]
+    partes = [parte for parte in partes if not parte.empty]
+    if not partes:
+        return pd.DataFrame(columns=columnas or COLUMNAS_HISTORIAL)
+    df = pd.concat(partes, ignore_index=True)
+    fechas = df['Fecha'].astype(str)
+    if desde is not None:
+        df = df[fechas >= desde]
+    if hasta is not None:
+        df = df[fechas[df.index] < hasta]
+    df = df.reset_index(drop=True)
+    return df if columnas is None else df[list(columnas)]
+
+# ===============================
+# Compactación de Meses Cerrados
+# ===============================
+
+def debe_compactar_historial():
+    mes_actual = _mes_actual()
+    return any(
+        mes < mes_actual and (os.path.exists(_ruta(mes, 'csv')) or _pendientes(mes))
+        for mes in meses_disponibles()
+    )
+
+def _escribir_parquet(df, ruta, fuentes):
+    df = df.astype({columna: 'string' for columna in COLUMNAS_TEXTO if columna in df.columns})
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(tabla.schema.metadata or {})
+    metadata[CLAVE_FUENTES] = json.dumps(sorted(fuentes)).encode('utf-8')
+    _escribir_atomico(ruta, lambda temporal: pq.write_table(tabla.replace_schema_metadata(metadata), temporal))
+
+# Pasa a Parquet los meses cerrados (los del mes actual siguen en CSV)
+def compactar_historial():
+    mes_actual = _mes_actual()
+    compactados = 0
+    with _bloqueo:
+        for mes in meses_disponibles():
+            if mes >= mes_actual:
+                continue
+            ruta_csv = _ruta(mes, 'csv')
+            if os.path.exists(ruta_csv):
+                os.replace(ruta_csv, os.path.join(DIRECTORIO_HISTORIAL, f"{mes}.{uuid.uuid4().hex}.compactando"))
+            pendientes = _pendientes(mes)
+            if not pendientes:
+                continue
+            df = _leer_particion(mes)
+            _escribir_parquet(df, _ruta(mes, 'parquet'), [os.path.basename(ruta) for ruta in pendientes])
+            # Ya están en el Parquet (y anotados): se pueden borrar
+            for ruta in pendientes:
+                os.remove(ruta)
+            compactados += 1
+    return compactados
+
+def compactar_historial_en_segundo_plano():
+    agendar_tarea(('compactar_historial',), compactar_historial)
@@ -0,0 +1,182 @@
+import os
+import numpy as np
+import pandas as pd
+from cache_columnar import leer_excel
+from indice_productos import IndiceProductos, normalizar_codigo_barras
+from motor_precios import calcular_precios, aplicar_precios
+
+# ===============================
+# Importación de Listas de Precios de Proveedores
+# ===============================
+
+# Una lista de proveedor (Excel o CSV) se cruza con el catálogo por 'Codigo' y,
+# si no aparece, por 'Codigo de Barras', usando los diccionarios de
+# IndiceProductos (una búsqueda por fila, sin comparar columnas enteras). En
+# los productos cuyo costo cambió, el costo anterior pasa a 'Ultimo Costo', se
+# recalculan los precios con el motor de precios y todo se escribe de una vez.
+
+ARCHIVO_PROVEEDORES = 'ProveedoresSoop.xlsx'
+
+# Encabezados que suelen traer las listas -> columna del catálogo
+SINONIMOS_COLUMNAS = {
+    'codigo': 'Codigo',
+    'código': 'Codigo',
+    'cod': 'Codigo',
+    'articulo': 'Codigo',
+    'artículo': 'Codigo',
+    'codigo de barras': 'Codigo de Barras',
+    'código de barras': 'Codigo de Barras',
+    'cod barras': 'Codigo de Barras',
+    'ean': 'Codigo de Barras',
+    'costo': 'Costo (Pesos)',
+    'costo (pesos)': 'Costo (Pesos)',
+    'precio': 'Costo (Pesos)',
+    'precio costo': 'Costo (Pesos)',
+    'costo usd': 'Costo (USD)',
+    'costo (usd)': 'Costo (USD)',
+    'costo fob': 'Costo (USD)',
+    'precio usd': 'Costo (USD)',
+}
+
+COLUMNAS_COSTO = ['Costo (Pesos)', 'Costo (USD)']
+
+# Un costo nuevo más de 5 veces mayor (o menor) que el anterior se marca para
+# revisar: suele ser un error de formato en la lista, no un aumento real
+FACTOR_COSTO_DUDOSO = 5
+
+# Proveedores del directorio: nombre -> prefijo de sus códigos (ej. 'JO' -> 'JO-HPC5')
+def cargar_proveedores(ruta=ARCHIVO_PROVEEDORES):
+    if not os.path.exists(ruta):
+        return {}
+    df = leer_excel(ruta)
+    df.columns = df.columns.str.strip()
+    if 'Proveedor' not in df.columns:
+        return {}
+    prefijos = df['CodigoProveedor'] if 'CodigoProveedor' in df.columns else pd.Series('', index=df.index)
+    return {
+        str(nombre).strip(): (str(prefijo).strip() if pd.notna(prefijo) else '')
+        for nombre, prefijo in zip(df['Proveedor'], prefijos) if pd.notna(nombre)
+    }
+
+def leer_lista_proveedor(archivo, nombre_archivo):
+    if nombre_archivo.lower().endswith('.csv'):
+        lista = pd.read_csv(archivo, encoding='ISO-8859-1', sep=';', on_bad_lines='skip', dtype=str)
+    else:
+        lista = pd.read_excel(archivo, engine='openpyxl', dtype=str)
+    lista.columns = lista.columns.str.strip()
+    renombres = {col: SINONIMOS_COLUMNAS[col.lower()] for col in lista.columns if col.lower() in SINONIMOS_COLUMNAS}
+    lista = lista.rename(columns=renombres)
+    # Si dos encabezados caen en la misma columna, queda el primero
+    lista = lista.loc[:, ~lista.columns.duplicated()]
+    if 'Codigo' not in lista.columns and 'Codigo de Barras' not in lista.columns:
+        raise ValueError("la lista no tiene columna de código ni de código de barras")
+    if not any(col in lista.columns for col in COLUMNAS_COSTO):
+        raise ValueError("la lista no tiene columna de costo")
+    return lista
+
+def _numerico(serie):
+    # Acepta '1.234,56' y '1.234' (punto de miles) además de '1234.56'. Sin
+    # coma, un punto seguido de exactamente tres cifras se toma como
+    # separador de miles ('1.234' es mil doscientos treinta y cuatro, pero
+    # '0.125' sigue siendo un octavo)
+    texto = serie.astype('string').str.strip()
+    con_coma = texto.str.contains(',', regex=False, na=False)
+    con_miles = texto.str.fullmatch(r'-?[1-9]\d{0,2}(\.\d{3})+', na=False)
+    texto = texto.where(~(con_coma | con_miles), texto.str.replace('.', '', regex=False))
+    texto = texto.where(~con_coma, texto.str.replace(',', '.', regex=False))
+    return pd.to_numeric(texto, errors='coerce')
+
+# Cambios de costo fuera de lo razonable (ver FACTOR_COSTO_DUDOSO)
+def _costo_dudoso(antes, despues):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = despues / antes
+    return (antes > 0) & ((factor > FACTOR_COSTO_DUDOSO) | (factor < 1 / FACTOR_COSTO_DUDOSO))
+
+# Posición en el catálogo de cada fila de la lista (NaN si no se encontró)
+def cruzar_con_catalogo(lista, indice, prefijo=''):
+    posiciones = pd.Series(np.nan, index=lista.index)
+    if 'Codigo' in lista.columns:
+        codigos = lista['Codigo'].astype('string').str.strip()
+        posiciones = codigos.map(indice.por_codigo).astype(float)
+        # Listas que traen el código sin el prefijo del proveedor
+        if prefijo:
+            faltan = posiciones.isna() & codigos.notna()
+            posiciones[faltan] = (prefijo + '-' + codigos[faltan]).map(indice.por_codigo)
+    if 'Codigo de Barras' in lista.columns:
+        faltan = posiciones.isna() & lista['Codigo de Barras'].notna()
+        barras = lista.loc[faltan, 'Codigo de Barras'].map(normalizar_codigo_barras)
+        posiciones[faltan] = barras.map(indice.por_codigo_barras)
+    return posiciones
+
+# Aplica la lista al catálogo y devuelve (catálogo nuevo, resumen, detalle de
+# cambios, filas no encontradas). No escribe nada: el llamador decide si guardar.
+# En el detalle, 'Revisar' marca los cambios de costo dudosos.
+def importar_lista(df, lista, reglas, proveedor=None, prefijo='', marca_tiempo=None):
+    indice = IndiceProductos(df)
+    posiciones = cruzar_con_catalogo(lista, indice, prefijo)
+    encontradas = posiciones.notna()
+    no_encontradas = lista[~encontradas]
+
+    # Si un producto aparece varias veces en la lista, vale la última fila
+    cruce = lista[encontradas].assign(_posicion=posiciones[encontradas].astype(int))
+    cruce = cruce.drop_duplicates('_posicion', keep='last')
+    filas = cruce['_posicion'].to_numpy()
+
+    resultado = df.copy()
+    cambiaron = np.zeros(len(df), dtype=bool)
+    detalle = []
+    for columna in COLUMNAS_COSTO:
+        if columna not in cruce.columns:
+            continue
+        nuevo = _numerico(cruce[columna]).to_numpy()
+        if columna not in resultado.columns:
+            resultado[columna] = np.nan
+        actual = pd.to_numeric(resultado[columna].iloc[filas], errors='coerce').to_numpy()
+        cambia = ~np.isnan(nuevo) & ~np.isclose(np.nan_to_num(actual, nan=-1.0), nuevo)
+        if not cambia.any():
+            continue
+        filas_cambio = filas[cambia]
+        ultimo = f"Ultimo {columna}"
+        if ultimo not in resultado.columns:
+            resultado[ultimo] = np.nan
+        # El costo vigente pasa a ser el último costo
+        posicion_ultimo = resultado.columns.get_loc(ultimo)
+        posicion_costo = resultado.columns.get_loc(columna)
+        resultado[ultimo] = resultado[ultimo].astype(object)
+        resultado[columna] = resultado[columna].astype(object)
+        resultado.iloc[filas_cambio, posicion_ultimo] = actual[cambia]
+        resultado.iloc[filas_cambio, posicion_costo] = nuevo[cambia]
+        cambiaron[filas_cambio] = True
+        detalle.append(pd.DataFrame({
+            'Codigo': resultado['Codigo'].iloc[filas_cambio].to_numpy() if 'Codigo' in resultado.columns else filas_cambio,
+            'Nombre': resultado['Nombre'].iloc[filas_cambio].to_numpy() if 'Nombre' in resultado.columns else '',
+            'Costo': columna,
+            'Antes': actual[cambia],
+            'Después': nuevo[cambia],
+            'Revisar': _costo_dudoso(actual[cambia], nuevo[cambia]),
+        }))
+
+    if proveedor and 'Proveedor' in resultado.columns:
+        sin_proveedor = resultado['Proveedor'].iloc[filas].isna() | (resultado['Proveedor'].iloc[filas].astype(str).str.strip() == '')
+        resultado['Proveedor'] = resultado['Proveedor'].astype(object)
+        resultado.iloc[filas[sin_proveedor.to_numpy()], resultado.columns.get_loc('Proveedor')] = proveedor
+
+    # Nuevos precios solo para los productos cuyo costo cambió
+    if cambiaron.any():
+        a_recalcular = resultado[cambiaron]
+        recalculado = aplicar_precios(a_recalcular, calcular_precios(a_recalcular, reglas), marca_tiempo)
+        resultado = resultado.astype({col: object for col in recalculado.columns if resultado[col].dtype != recalculado[col].dtype})
+        resultado.loc[cambiaron] = recalculado
+
+    detalle = pd.concat(detalle, ignore_index=True) if detalle else pd.DataFrame(
+        columns=['Codigo', 'Nombre', 'Costo', 'Antes', 'Después', 'Revisar']
+    )
+    resumen = {
+        'filas_lista': len(lista),
+        'encontradas': int(encontradas.sum()),
+        'no_encontradas': len(no_encontradas),
+        'costos_actualizados': int(cambiaron.sum()),
+        'sin_cambios': len(cruce) - int(cambiaron.sum()),
+        'costos_dudosos': int(detalle['Revisar'].sum()),
+    }
+    return resultado, resumen, detalle, no_encontradas
@@ -0,0 +1,58 @@
+import pandas as pd
+
+# ===============================
+# Índice de Productos por Código, Nombre y Código de Barras
+# ===============================
+
+# Los códigos de barras numéricos pueden venir del Excel como 7791234567890.0
+def normalizar_codigo_barras(valor):
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+# Streamlit vuelve a correr toda la página en cada interacción; con este índice
+# buscar un producto es una consulta a un diccionario en lugar de comparar
+# toda la columna. Se arma una vez por versión del catálogo.
+class IndiceProductos:
+    def __init__(self, df):
+        self.df = df
+        self.por_codigo = {}
+        self.por_nombre = {}
+        self.por_codigo_barras = {}
+        codigos = df['Codigo'] if 'Codigo' in df.columns else pd.Series(index=df.index, dtype='object')
+        nombres = df['Nombre'] if 'Nombre' in df.columns else pd.Series(index=df.index, dtype='object')
+        for posicion, (codigo, nombre) in enumerate(zip(codigos, nombres)):
+            # Ante repetidos gana la primera fila, igual que el .iloc[0] de antes
+            if pd.notna(codigo):
+                self.por_codigo.setdefault(str(codigo), posicion)
+            if pd.notna(nombre):
+                self.por_nombre.setdefault(nombre, posicion)
+        if 'Codigo de Barras' in df.columns:
+            for posicion, codigo_barras in enumerate(df['Codigo de Barras']):
+                if pd.notna(codigo_barras):
+                    self.por_codigo_barras.setdefault(normalizar_codigo_barras(codigo_barras), posicion)
+
+    def _fila(self, posicion):
+        if posicion is None:
+            return None
+        return self.df.iloc[posicion]
+
+    # Fila del producto con ese código (comparado como texto), o None
+    def buscar_codigo(self, codigo):
+        return self._fila(self.por_codigo.get(str(codigo)))
+
+    # Fila del primer producto con ese nombre, o None
+    def buscar_nombre(self, nombre):
+        return self._fila(self.por_nombre.get(nombre))
+
+    # Fila del producto escaneado. Si el código no figura como código de barras
+    # se prueba como 'Codigo' (muchos productos usan el mismo valor en ambos).
+    def buscar_codigo_barras(self, codigo_barras):
+        codigo_barras = normalizar_codigo_barras(codigo_barras)
+        posicion = self.por_codigo_barras.get(codigo_barras)
+        if posicion is None:
+            posicion = self.por_codigo.get(codigo_barras)
+        return self._fila(posicion)
+
+    def __len__(self):
+        return len(self.df)
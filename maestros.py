@@ -0,0 +1,14 @@
+# ===============================
+# Archivos Maestros y Columnas Compartidas
+# ===============================
+
+# Constantes que usan tanto las páginas como la capa de datos (repositorio),
+# el armado de olas y los procesos de fondo. Este módulo no importa
+# Streamlit, así esos módulos no dependen del runtime de la interfaz.
+
+# Archivos maestros que leen las páginas de ventas
+ARCHIVO_PRODUCTOS = 'archivo_modificado_productos_20240928_201237.xlsx'
+ARCHIVO_CLIENTES = 'archivo_modificado_clientes_20240928_200050.xlsx'
+
+# Ubicación de un producto en el depósito
+COLUMNAS_UBICACION = ['Pasillo', 'Estante', 'Columna']
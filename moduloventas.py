@@ -1,8 +1,20 @@
 import streamlit as st
 import pandas as pd
-from openpyxl import load_workbook
-import json
+from buscador import selector_busqueda
+from cache_imagenes import obtener_miniatura
+from registro_stock import debe_compactar, compactar_stock, compactar_stock_en_segundo_plano
+from registro_pedidos import importar_pedidos_excel, exportar_pedidos_excel, exportar_pedidos_en_segundo_plano
 from datetime import datetime
+from repositorio import agregar_pedido, listar_equipo, agregar_miembro, eliminar_miembro
+from documentos import TIPOS_DOCUMENTO, documento_pedido, generar_documentos_en_segundo_plano
+from borradores import guardar_item_borrador, quitar_item_borrador, vaciar_borrador, cargar_borrador, adoptar_borrador
+from reservas import sesion_terminada
+from catalogo import (
+    ARCHIVO_PRODUCTOS, obtener_busqueda_productos, obtener_busqueda_clientes,
+    stock_disponible, reservar_stock_sesion, liberar_stock_sesion,
+    renovar_reservas_sesion, confirmar_reservas_sesion, asegurar_reservas_pedido,
+    id_sesion, heredar_reservas_sesion
+)
 
 # ===============================
 # Inicialización del Estado de Sesión
@@ -12,95 +24,261 @@ from datetime import datetime
 if 'pedido' not in st.session_state:
     st.session_state.pedido = []
 
-if 'df_productos' not in st.session_state:
-    file_path_productos = 'archivo_modificado_productos_20240928_201237.xlsx'  # Archivo de productos
-    try:
-        st.session_state.df_productos = pd.read_excel(file_path_productos)
-    except Exception as e:
-        st.error(f"Error al cargar el archivo de productos: {e}")
-        st.stop()
+# Mientras la sesión siga activa sus reservas de stock no vencen
+renovar_reservas_sesion()
 
-if 'df_clientes' not in st.session_state:
-    file_path_clientes = 'archivo_modificado_clientes_20240928_200050.xlsx'  # Archivo de clientes
-    try:
-        st.session_state.df_clientes = pd.read_excel(file_path_clientes)
-    except Exception as e:
-        st.error(f"Error al cargar el archivo de clientes: {e}")
-        st.stop()
+# Catálogo de productos y clientes compartidos por todas las sesiones.
+# Se recargan solo cuando el archivo Excel cambia en disco.
+file_path_productos = ARCHIVO_PRODUCTOS  # Archivo de productos
+try:
+    indice_productos, motor_productos = obtener_busqueda_productos()
+    df_productos = indice_productos.df
+except Exception as e:
+    st.error(f"Error al cargar el archivo de productos: {e}")
+    st.stop()
 
-# Inicializar 'delete_confirm' como un diccionario si no existe
-if 'delete_confirm' not in st.session_state:
-    st.session_state.delete_confirm = {}
+try:
+    df_clientes, motor_clientes, directorio_clientes = obtener_busqueda_clientes()
+except Exception as e:
+    st.error(f"Error al cargar el archivo de clientes: {e}")
+    st.stop()
 
-# Inicializar 'df_equipo' si no existe
+# Equipo de trabajo desde la base (la primera vez se importa equipo.xlsx)
 if 'df_equipo' not in st.session_state:
-    # Definir los miembros del equipo
-    data_equipo = {
-        'Nombre': [
-            'Joni', 'Eduardo', 'Johan', 'Martin',
-            'Marian', 'Sofi', 'Valen', 'Emily',
-            'Maria-Jose', 'Tu Nombre'
-        ],
-        'Rol': [
-            'Presidente', 'Gerente General', 'Jefe de Depósito', 'Armar Pedidos',
-            'Vendedora', 'Vendedora', 'Vendedora', 'Vendedora',
-            'Fotógrafa y Catalogador', 'Super Admin'
-        ],
-        'Departamento': [
-            'Dirección', 'Dirección', 'Depósito', 'Depósito',
-            'Ventas', 'Ventas', 'Ventas', 'Ventas',
-            'Marketing', 'Dirección'
-        ],
-        'Nivel de Acceso': [
-            'Alto', 'Alto', 'Medio', 'Medio',
-            'Bajo', 'Bajo', 'Bajo', 'Bajo',
-            'Medio', 'Super Admin'
-        ]
-    }
-    st.session_state.df_equipo = pd.DataFrame(data_equipo)
+    try:
+        st.session_state.df_equipo = listar_equipo()
+    except Exception as e:
+        st.error(f"Error al cargar el equipo: {e}")
+        st.stop()
 
 # Inicializar 'usuario' en sesión si no existe
 if 'usuario' not in st.session_state:
     st.session_state.usuario = None
 
 # ===============================
-# Función para Guardar Pedido en Excel
+# Función para Guardar Pedido
 # ===============================
 
-def guardar_pedido_excel(file_path, order_data):
+def guardar_pedido(file_path, order_data):
     try:
-        book = load_workbook(file_path)
-        if 'Pedidos' in book.sheetnames:
-            sheet = book['Pedidos']
-        else:
-            sheet = book.create_sheet('Pedidos')
-            # Escribir encabezados
-            sheet.append(['ID Pedido', 'Cliente', 'Vendedor', 'Fecha', 'Hora', 'Items'])
-        
-        # Generar ID de pedido
-        if sheet.max_row == 1:
-            id_pedido = 1
-        else:
-            last_id = sheet['A'][sheet.max_row - 1].value
-            id_pedido = last_id + 1 if last_id is not None else 1
-        
-        # Formatear los ítems como JSON
-        items_json = json.dumps(order_data['items'], ensure_ascii=False)
-        
-        # Agregar nueva fila
-        sheet.append([
-            id_pedido,
-            order_data['cliente'],
-            order_data['vendedor'],
-            order_data['fecha'],
-            order_data['hora'],
-            items_json
-        ])
-        
-        # Guardar el libro
-        book.save(file_path)
+        # La primera vez también copia los pedidos de la hoja 'Pedidos'
+        id_pedido = agregar_pedido(order_data, file_path)
     except Exception as e:
         st.error(f"Error al guardar el pedido: {e}")
+        return None
+
+    # Regenerar la hoja 'Pedidos' del Excel sin bloquear la venta
+    exportar_pedidos_en_segundo_plano(file_path)
+    return id_pedido
+
+# Remito y lista de picking del pedido recién guardado (quedan en la sesión
+# para poder descargarlos después de que la página se vuelva a dibujar)
+def preparar_documentos_pedido(id_pedido):
+    try:
+        st.session_state.documentos_ultimo_pedido = {
+            'id': id_pedido,
+            **{tipo: documento_pedido(id_pedido, tipo) for tipo in TIPOS_DOCUMENTO}
+        }
+    except Exception as e:
+        st.session_state.documentos_ultimo_pedido = None
+        st.warning(f"No se pudieron generar los documentos del pedido: {e}")
+
+def mostrar_documentos_ultimo_pedido():
+    documentos = st.session_state.get('documentos_ultimo_pedido')
+    if not documentos:
+        return
+    id_pedido = documentos['id']
+    columnas = st.columns([1] * len(TIPOS_DOCUMENTO) + [2])
+    for columna, (tipo, titulo) in zip(columnas, TIPOS_DOCUMENTO.items()):
+        with columna:
+            st.download_button(
+                f"📄 {titulo} del pedido #{id_pedido}",
+                documentos[tipo],
+                file_name=f"pedido_{id_pedido}_{tipo}.pdf",
+                mime="application/pdf",
+                key=f"descargar_{tipo}_{id_pedido}"
+            )
+
+# ===============================
+# Borrador del Pedido en Curso
+# ===============================
+
+# Al entrar (o al cambiar de vendedor) se recupera el pedido que quedó a
+# medio cargar y se vuelven a tomar sus reservas de stock
+def recuperar_borrador(usuario):
+    if st.session_state.get('borrador_de') == usuario:
+        return
+    # Las reservas del pedido del vendedor anterior se sueltan (su borrador sigue guardado)
+    for item in st.session_state.pedido:
+        liberar_stock_sesion(item['Codigo'], item['Cantidad'])
+    sesion = id_sesion()
+    st.session_state.pedido = cargar_borrador(usuario, sesion)
+    st.session_state.borrador_de = usuario
+    # Cada pestaña tiene su borrador; una sesión nueva (recarga, reinicio del
+    # servidor) adopta el de una sesión del vendedor que ya terminó, con sus reservas
+    anterior = adoptar_borrador(usuario, sesion, sesion_terminada) if not st.session_state.pedido else None
+    if anterior is not None:
+        st.session_state.pedido = cargar_borrador(usuario, sesion)
+        sin_stock = heredar_reservas_sesion(anterior, st.session_state.pedido, indice_productos.buscar_codigo)
+        st.session_state.aviso_borrador = (len(st.session_state.pedido), sin_stock)
+    elif st.session_state.pedido:
+        sin_stock = asegurar_reservas_pedido(st.session_state.pedido, indice_productos.buscar_codigo)
+        st.session_state.aviso_borrador = (len(st.session_state.pedido), sin_stock)
+
+def mostrar_aviso_borrador():
+    aviso = st.session_state.pop('aviso_borrador', None)
+    if aviso is None:
+        return
+    cantidad, sin_stock = aviso
+    st.info(f"Se recuperó tu pedido en curso ({cantidad} producto(s)).")
+    if sin_stock:
+        st.warning("Ya no hay stock suficiente para: " + ", ".join(sin_stock) + ". Ajustá esas cantidades antes de guardar.")
+
+# Suelta las reservas y borra el pedido en curso
+def descartar_pedido():
+    for item in st.session_state.pedido:
+        liberar_stock_sesion(item['Codigo'], item['Cantidad'])
+    st.session_state.pedido = []
+    vaciar_borrador(st.session_state.usuario['Nombre'], id_sesion())
+
+# ===============================
+# Carga por Lector de Código de Barras
+# ===============================
+
+# Unidades que suma cada escaneo: el múltiplo forzado del producto, o 1
+def unidades_por_escaneo(producto_data):
+    multiplo = producto_data.get('forzar multiplos')
+    if pd.notna(multiplo) and multiplo > 0:
+        return int(multiplo)
+    return 1
+
+# Se ejecuta cuando el lector "tipea" el código y el Enter final
+def procesar_escaneo():
+    codigo_leido = st.session_state.codigo_escaneado.strip()
+    # Vaciar la caja para el próximo escaneo
+    st.session_state.codigo_escaneado = ""
+    if not codigo_leido:
+        return
+
+    producto_data = indice_productos.buscar_codigo_barras(codigo_leido)
+    if producto_data is None:
+        st.session_state.ultimo_escaneo = ('error', f"No se encontró ningún producto con el código {codigo_leido}.")
+        return
+
+    cantidad = unidades_por_escaneo(producto_data)
+    # La reserva se toma antes de tocar el pedido: si otro vendedor se llevó
+    # el stock, el pedido queda como estaba
+    if not reservar_stock_sesion(producto_data, cantidad):
+        st.session_state.ultimo_escaneo = ('error', f"No hay stock suficiente de {producto_data['Nombre']}.")
+        return
+
+    # Si el producto ya está en el pedido se suma la cantidad
+    item = next((item for item in st.session_state.pedido if item['Codigo'] == producto_data['Codigo']), None)
+    if item is None:
+        item = {
+            'Codigo': producto_data['Codigo'],
+            'Nombre': producto_data['Nombre'],
+            'Cantidad': 0,
+            'Precio': float(producto_data['Precio']),
+            'Importe': 0
+        }
+        st.session_state.pedido.append(item)
+    item['Cantidad'] += cantidad
+    item['Importe'] = item['Cantidad'] * item['Precio']
+    guardar_item_borrador(st.session_state.usuario['Nombre'], id_sesion(), item)
+    st.session_state.ultimo_escaneo = ('ok', f"+{cantidad} {producto_data['Nombre']} (total: {item['Cantidad']})")
+
+# Fragmento: cada escaneo vuelve a dibujar solo este panel, no toda la página
+@st.fragment
+def panel_escaneo():
+    st.text_input(
+        "📷 Código de barras",
+        key="codigo_escaneado",
+        on_change=procesar_escaneo,
+        placeholder="Escaneá un producto...",
+        help="Cada lectura agrega el producto al pedido. Si ya estaba, suma su cantidad (o su múltiplo forzado)."
+    )
+    if 'ultimo_escaneo' in st.session_state:
+        tipo, mensaje = st.session_state.ultimo_escaneo
+        if tipo == 'ok':
+            st.success(mensaje)
+        else:
+            st.error(mensaje)
+    st.caption(f"{len(st.session_state.pedido)} producto(s) en el pedido.")
+    # El detalle del pedido se actualiza al terminar de escanear
+    if st.button("Ver pedido actualizado", key="actualizar_pedido_escaneo"):
+        st.rerun()
+
+# ===============================
+# Tabla del Pedido Actual
+# ===============================
+
+COLUMNAS_TABLA_PEDIDO = ['Codigo', 'Nombre', 'Cantidad', 'Precio', 'Importe']
+
+# Aplica de una vez todo lo que se cambió en la tabla (cantidades y ítems
+# marcados para quitar). Después se cambia la clave de la tabla para que se
+# vuelva a dibujar con el pedido ya actualizado.
+def aplicar_cambios_pedido(clave):
+    cambios = st.session_state[clave]['edited_rows']
+    usuario = st.session_state.usuario['Nombre']
+    avisos = []
+    quitar = []
+    for fila, valores in cambios.items():
+        item = st.session_state.pedido[int(fila)]
+        nueva = valores.get('Cantidad', item['Cantidad'])
+        if valores.get('Quitar') or not nueva or nueva <= 0:
+            quitar.append(int(fila))
+            continue
+        nueva = int(nueva)
+        diferencia = nueva - item['Cantidad']
+        if diferencia == 0:
+            continue
+        producto_data = indice_productos.buscar_codigo(item['Codigo'])
+        multiplo = unidades_por_escaneo(producto_data) if producto_data is not None else 1
+        if nueva % multiplo:
+            avisos.append(f"{item['Nombre']} se vende de a {multiplo} unidades.")
+            continue
+        if diferencia > 0 and (producto_data is None or not reservar_stock_sesion(producto_data, diferencia)):
+            avisos.append(f"No hay stock suficiente para llevar {item['Nombre']} a {nueva} unidades.")
+            continue
+        if diferencia < 0:
+            liberar_stock_sesion(item['Codigo'], -diferencia)
+        item['Cantidad'] = nueva
+        item['Importe'] = nueva * item['Precio']
+        guardar_item_borrador(usuario, id_sesion(), item)
+    for fila in sorted(quitar, reverse=True):
+        producto_eliminado = st.session_state.pedido.pop(fila)
+        # Reponer el stock
+        liberar_stock_sesion(producto_eliminado['Codigo'], producto_eliminado['Cantidad'])
+        quitar_item_borrador(usuario, id_sesion(), producto_eliminado['Codigo'])
+    st.session_state.avisos_tabla_pedido = avisos
+    st.session_state.version_tabla_pedido = st.session_state.get('version_tabla_pedido', 0) + 1
+
+# Todo el pedido en un solo componente: cambiar cantidades o quitar ítems es
+# una sola ida y vuelta, sin un grupo de columnas y botones por renglón.
+# Devuelve el pedido como DataFrame (para los totales).
+def tabla_pedido():
+    pedido_df = pd.DataFrame(st.session_state.pedido, columns=COLUMNAS_TABLA_PEDIDO)
+    clave = f"tabla_pedido_{st.session_state.get('version_tabla_pedido', 0)}"
+    st.data_editor(
+        pedido_df.assign(Quitar=False),
+        key=clave,
+        on_change=aplicar_cambios_pedido,
+        args=(clave,),
+        hide_index=True,
+        use_container_width=True,
+        disabled=['Codigo', 'Nombre', 'Precio', 'Importe'],
+        column_config={
+            'Codigo': st.column_config.TextColumn("Código"),
+            'Cantidad': st.column_config.NumberColumn("Cantidad", min_value=0, step=1, help="Con 0 se quita el producto."),
+            'Precio': st.column_config.NumberColumn("Precio", format="$%.2f"),
+            'Importe': st.column_config.NumberColumn("Importe", format="$%.2f"),
+            'Quitar': st.column_config.CheckboxColumn("Quitar", help="Marcá para quitar el producto del pedido."),
+        }
+    )
+    for aviso in st.session_state.pop('avisos_tabla_pedido', []):
+        st.warning(aviso)
+    return pedido_df
 
 # ===============================
 # Función de Autenticación con Autocompletado
@@ -181,6 +359,9 @@ login()
 if not st.session_state.usuario:
     st.stop()
 
+# El pedido que el vendedor dejó a medio cargar (otra pestaña, recarga, reinicio)
+recuperar_borrador(st.session_state.usuario['Nombre'])
+
 # Mostrar información del usuario en la parte superior
 st.markdown(f"### Usuario: **{st.session_state.usuario['Nombre']}**")
 st.markdown(f"### Rol: **{st.session_state.usuario['Rol']}**")
@@ -193,52 +374,85 @@ st.markdown("---")
 st.sidebar.title("📚 Navegación")
 seccion = st.sidebar.radio("Ir a", ["Ventas", "Equipo"])
 
+# Exportación manual de la hoja 'Pedidos' para quienes la consultan desde Excel
+if verificar_acceso('Alto'):
+    if st.sidebar.button("📤 Exportar pedidos a Excel"):
+        try:
+            importar_pedidos_excel(file_path_productos)
+            cantidad_pedidos = exportar_pedidos_excel(file_path_productos)
+            st.sidebar.success(f"Se exportaron {cantidad_pedidos} pedidos a la hoja 'Pedidos'.")
+        except Exception as e:
+            st.sidebar.error(f"Error al exportar los pedidos: {e}")
+    # Remitos y listas de picking de todos los pedidos de hoy, en segundo plano
+    if st.sidebar.button("🖨️ Generar documentos del día"):
+        carpeta = generar_documentos_en_segundo_plano()
+        st.sidebar.success(f"Los documentos de hoy se están generando en '{carpeta}'.")
+    if st.sidebar.button("📦 Volcar stock al Excel"):
+        try:
+            cantidad_productos = compactar_stock(file_path_productos)
+            st.sidebar.success(f"Se actualizó el stock de {cantidad_productos} productos en el Excel.")
+        except Exception as e:
+            st.sidebar.error(f"Error al actualizar el stock en el archivo de productos: {e}")
+
 # ===============================
 # Módulo de Ventas
 # ===============================
 
 if seccion == "Ventas":
+    mostrar_documentos_ultimo_pedido()
+    mostrar_aviso_borrador()
+
     # Colocamos el buscador de cliente
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        cliente_seleccionado = st.selectbox(
-            "🔮 Buscar cliente", [""] + st.session_state.df_clientes['Nombre'].unique().tolist(),
-            help="Escribí el nombre del cliente o seleccioná uno de la lista."
+        # Buscador de clientes: al navegador solo llegan los primeros resultados
+        posicion_cliente = selector_busqueda(
+            "🔮 Buscar cliente", motor_clientes,
+            directorio_clientes.etiqueta,
+            key="buscar_cliente",
+            help="Escribí el nombre del cliente y seleccionalo de la lista."
         )
     
-    # Solo mostramos los demás campos si se selecciona un cliente distinto al espacio vacío
-    if cliente_seleccionado != "":
-        cliente_data = st.session_state.df_clientes[st.session_state.df_clientes['Nombre'] == cliente_seleccionado].iloc[0]
+    # Solo mostramos los demás campos si se selecciona un cliente
+    if posicion_cliente is not None:
+        # Ficha del cliente: acceso directo, sin filtrar la tabla
+        cliente_data = directorio_clientes.ficha(posicion_cliente)
+        cliente_seleccionado = cliente_data.get('Nombre')
     
         # Mostrar descuento y última compra
         with col1:
-            st.write(f"**Descuento:** {cliente_data['Descuento']}%")
-            st.write(f"**Última compra:** {cliente_data['Fecha Modificado']}")
+            st.write(f"**Descuento:** {cliente_data.get('Descuento') or 0}%")
+            st.write(f"**Última compra:** {cliente_data.get('Fecha Modificado') or '-'}")
     
         # Mostrar vendedor principal
         with col2:
-            vendedores = cliente_data['Vendedores'].split(',') if pd.notna(cliente_data['Vendedores']) else ['No asignado']
+            vendedores = str(cliente_data['Vendedores']).split(',') if cliente_data.get('Vendedores') else ['No asignado']
             vendedor_default = vendedores[0]
             vendedor_seleccionado = st.selectbox("Vendedor", vendedores, index=0)
             st.write(f"**Vendedor Principal:** {vendedor_seleccionado}")
     
         # Sección de productos solo aparece si hay cliente seleccionado
         st.header("📁 Buscador de Productos 🔍")
+
+        # Con el lector de código de barras se carga el pedido sin buscar a mano
+        if st.toggle("Modo lector de código de barras", key="modo_escaneo"):
+            panel_escaneo()
     
         # Tres columnas: Buscador, precio, y stock con colores
         col_prod1, col_prod2, col_prod3 = st.columns([2, 1, 1])
     
         with col_prod1:
-            # Buscador de productos con espacio vacío al inicio
-            producto_buscado = st.selectbox(
-                "Buscar producto",
-                [""] + st.session_state.df_productos['Nombre'].unique().tolist(),
-                help="Escribí el nombre del producto o seleccioná uno de la lista."
+            # Buscador de productos por nombre, código o código de barras
+            posicion_producto = selector_busqueda(
+                "Buscar producto", motor_productos,
+                lambda posicion: f"{df_productos['Nombre'].iat[posicion]} ({df_productos['Codigo'].iat[posicion]})",
+                key="buscar_producto",
+                help="Escribí el nombre, el código o el código de barras del producto."
             )
     
-        if producto_buscado:
-            producto_data = st.session_state.df_productos[st.session_state.df_productos['Nombre'] == producto_buscado].iloc[0]
+        if posicion_producto is not None:
+            producto_data = df_productos.iloc[posicion_producto]
     
             with col_prod2:
                 # Mostrar precio
@@ -246,7 +460,7 @@ if seccion == "Ventas":
     
             with col_prod3:
                 # Mostrar stock con colores según la cantidad
-                stock = max(0, producto_data['Stock'])  # Nos aseguramos que el stock no sea negativo
+                stock = max(0, stock_disponible(producto_data))  # Nos aseguramos que el stock no sea negativo
                 if stock <= 0:
                     color = 'red'
                 elif stock < 10:
@@ -293,26 +507,28 @@ if seccion == "Ventas":
                     existe = any(item['Codigo'] == producto_data['Codigo'] for item in st.session_state.pedido)
                     if existe:
                         st.warning("Este producto ya está en el pedido. Por favor, ajusta la cantidad si es necesario.")
+                    elif not reservar_stock_sesion(producto_data, cantidad):
+                        # Otro pedido en curso tomó el stock mientras se elegía la cantidad
+                        st.error(f"Ya no hay {cantidad} unidad(es) disponibles de {producto_data['Nombre']}: otro pedido en curso las reservó.")
                     else:
                         # Añadir producto al pedido con la cantidad seleccionada
                         producto_agregado = {
                             'Codigo': producto_data['Codigo'],
                             'Nombre': producto_data['Nombre'],
                             'Cantidad': cantidad,
-                            'Precio': producto_data['Precio'],
-                            'Importe': cantidad * producto_data['Precio']
+                            'Precio': float(producto_data['Precio']),
+                            'Importe': cantidad * float(producto_data['Precio'])
                         }
                         st.session_state.pedido.append(producto_agregado)
-                        # Descontar del stock
-                        st.session_state.df_productos.loc[
-                            st.session_state.df_productos['Codigo'] == producto_data['Codigo'], 'Stock'
-                        ] -= cantidad
+                        guardar_item_borrador(st.session_state.usuario['Nombre'], id_sesion(), producto_agregado)
                         st.success(f"Se agregó {cantidad} unidad(es) de {producto_data['Nombre']} al pedido.")
     
             with col_der:
                 # Mostrar imagen del producto en la columna aparte
-                if pd.notna(producto_data['imagen']) and producto_data['imagen'] != '':
-                    st.image(producto_data['imagen'], width=200, caption="Imagen del producto")
+                # Miniatura desde la caché local: solo se descarga la primera vez
+                miniatura = obtener_miniatura(producto_data['imagen'], 200)
+                if miniatura:
+                    st.image(miniatura, width=200, caption="Imagen del producto")
                 else:
                     st.write("No hay imagen disponible.")
     
@@ -320,52 +536,10 @@ if seccion == "Ventas":
         if st.session_state.pedido:
             st.header("📦 Pedido actual")
     
-            # Mostrar la tabla del pedido con la opción de eliminar ítems
-            for producto in st.session_state.pedido.copy():  # Use copy to avoid modification during iteration
-                codigo = producto['Codigo']
-                nombre = producto['Nombre']
-                cantidad = producto['Cantidad']
-                precio = producto['Precio']
-                importe = producto['Importe']
-    
-                # Crear columnas para mostrar el producto y el botón de eliminar
-                col1, col2, col3, col4, col5, col6 = st.columns([1, 2, 1, 1, 1, 1])
-                col1.write(codigo)
-                col2.write(nombre)
-                col3.write(cantidad)
-                col4.write(f"${precio}")
-                col5.write(f"${importe}")
-    
-                # Verificar si este producto está pendiente de eliminación
-                if codigo in st.session_state.delete_confirm:
-                    # Mostrar botón de "Sí" y "No" en rojo
-                    with col6:
-                        # Botón "Sí" para confirmar eliminación
-                        if st.button("Sí", key=f"confirmar_si_{codigo}"):
-                            # Eliminar el ítem del pedido
-                            index = next((i for i, item in enumerate(st.session_state.pedido) if item['Codigo'] == codigo), None)
-                            if index is not None:
-                                producto_eliminado = st.session_state.pedido.pop(index)
-                                # Reponer el stock
-                                st.session_state.df_productos.loc[
-                                    st.session_state.df_productos['Codigo'] == producto_eliminado['Codigo'], 'Stock'
-                                ] += producto_eliminado['Cantidad']
-                            # Remover del diccionario de confirmaciones
-                            del st.session_state.delete_confirm[codigo]
-    
-                        # Botón "No" para cancelar eliminación
-                        if st.button("No", key=f"confirmar_no_{codigo}"):
-                            # Cancelar la eliminación
-                            del st.session_state.delete_confirm[codigo]
-                else:
-                    # Mostrar el botón de eliminar normal
-                    with col6:
-                        if st.button('🗑️', key=f"eliminar_{codigo}"):
-                            # Marcar este ítem para eliminación
-                            st.session_state.delete_confirm[codigo] = True
-    
+            # Cantidades editables y casilla para quitar, todo en una sola tabla
+            pedido_df = tabla_pedido()
+
             # Calcular totales
-            pedido_df = pd.DataFrame(st.session_state.pedido)
             total_items = pedido_df['Cantidad'].sum() if not pedido_df.empty else 0
             total_monto = pedido_df['Importe'].sum() if not pedido_df.empty else 0.0
     
@@ -380,11 +554,15 @@ if seccion == "Ventas":
                 st.write(f"<h4 style='text-align:right;'>Total del pedido: ${total_monto:,.2f}</h4>", unsafe_allow_html=True)
     
             # Centrar el botón de guardar pedido
-            col_guardar, _ = st.columns([2, 3])
+            col_guardar, col_descartar = st.columns([2, 3])
             with col_guardar:
                 if st.button("Guardar Pedido"):
+                    # Si la sesión estuvo inactiva y sus reservas vencieron, se vuelven a tomar
+                    sin_stock = asegurar_reservas_pedido(st.session_state.pedido, indice_productos.buscar_codigo)
                     if not st.session_state.pedido:
                         st.warning("No hay ítems en el pedido para guardar.")
+                    elif sin_stock:
+                        st.error("Ya no hay stock suficiente para: " + ", ".join(sin_stock) + ". Ajustá esas cantidades antes de guardar.")
                     else:
                         # Obtener fecha y hora actuales
                         now = datetime.now()
@@ -400,22 +578,28 @@ if seccion == "Ventas":
                             'items': st.session_state.pedido
                         }
     
-                        # Guardar el pedido en la hoja 'Pedidos'
-                        guardar_pedido_excel(file_path_productos, order_data)
-    
-                        # Confirmar al usuario
-                        st.success("Pedido guardado exitosamente.", icon="✅")
-    
-                        # Limpiar el pedido después de guardarlo
-                        st.session_state.pedido = []
-                        st.session_state.delete_confirm = {}
-    
-                        # Guardar los cambios en el stock de productos
-                        try:
-                            with pd.ExcelWriter(file_path_productos, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-                                st.session_state.df_productos.to_excel(writer, sheet_name='Hoja1', index=False)
-                        except Exception as e:
-                            st.error(f"Error al actualizar el stock en el archivo de productos: {e}")
+                        # Guardar el pedido en el registro de pedidos
+                        id_pedido = guardar_pedido(file_path_productos, order_data)
+                        if id_pedido is not None:
+                            # Confirmar al usuario
+                            st.success(f"Pedido #{id_pedido} guardado exitosamente.", icon="✅")
+                            preparar_documentos_pedido(id_pedido)
+    
+                            # El stock ya quedó descontado en el registro de movimientos;
+                            # cada tanto se vuelca a la columna 'Stock' del Excel
+                            if debe_compactar():
+                                compactar_stock_en_segundo_plano(file_path_productos)
+
+                            # Limpiar el pedido después de guardarlo
+                            vaciar_borrador(st.session_state.usuario['Nombre'], id_sesion())
+                            st.session_state.pedido = []
+                            # El registro de stock ya tiene el movimiento: las reservas se sueltan
+                            confirmar_reservas_sesion()
+            # Suelta las reservas y borra el borrador
+            with col_descartar:
+                if st.button("Descartar pedido", key="descartar_pedido"):
+                    descartar_pedido()
+                    st.rerun()
 
 # ===============================
 # Módulo de Equipo
@@ -457,16 +641,11 @@ elif seccion == "Equipo":
                 if submit:
                     if nombre.strip() == "":
                         st.error("El nombre no puede estar vacío.")
-                    elif nombre.strip() in st.session_state.df_equipo['Nombre'].values:
+                    elif not agregar_miembro(nombre.strip(), rol, departamento, nivel_acceso):
                         st.error("El nombre ya existe en el equipo.")
                     else:
-                        nuevo_miembro = {
-                            'Nombre': nombre.strip(),
-                            'Rol': rol,
-                            'Departamento': departamento,
-                            'Nivel de Acceso': nivel_acceso
-                        }
-                        st.session_state.df_equipo = st.session_state.df_equipo.append(nuevo_miembro, ignore_index=True)
+                        # equipo.xlsx se regenera en segundo plano
+                        st.session_state.df_equipo = listar_equipo()
                         st.success(f"Miembro {nombre} agregado exitosamente.")
         
         st.markdown("---")
@@ -485,7 +664,8 @@ elif seccion == "Equipo":
                         if nombre_eliminar == st.session_state.usuario['Nombre']:
                             st.error("No puedes eliminarte a ti mismo.")
                         else:
-                            st.session_state.df_equipo = st.session_state.df_equipo[st.session_state.df_equipo['Nombre'] != nombre_eliminar]
+                            eliminar_miembro(nombre_eliminar)
+                            st.session_state.df_equipo = listar_equipo()
                             st.success(f"Miembro {nombre_eliminar} eliminado exitosamente.")
                     else:
                         st.error("El nombre seleccionado no existe.")
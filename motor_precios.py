@@ -0,0 +1,176 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# ===============================
+# Motor de Precios
+# ===============================
+
+# Los precios de lista salen del costo por un recargo, y los promocionales de
+# un descuento sobre su precio de lista. El costo base es 'Costo (Pesos)' o,
+# para los productos que solo tienen costo en dólares (o si se prefiere el
+# dólar), 'Costo (USD)' por la cotización. Mientras no haya cotización cargada
+# esos productos quedan sin precio calculado (NaN) y conservan el que tenían.
+# Categorías y proveedores pueden tener un factor extra sobre el recargo. Todo
+# el catálogo se calcula de una sola vez con operaciones sobre columnas
+# completas.
+
+ARCHIVO_REGLAS = 'reglas_precios.json'
+
+REGLAS_POR_DEFECTO = {
+    # None: todavía no se cargó la cotización (no se usa el costo en USD)
+    'cotizacion_dolar': None,
+    'preferir_usd': False,
+    'decimales': 2,
+    # Precio de lista -> recargo sobre el costo
+    'recargos': {
+        'Precio x Mayor': 1.5,
+        'Precio Venta': 2.0,
+        'Precio x Menor': 1.8,
+    },
+    # Precio promocional -> (precio de lista, descuento)
+    'promociones': {
+        'Precio Promocional x Mayor': ['Precio x Mayor', 0.10],
+        'Precio Promocional': ['Precio Venta', 0.15],
+        'Precio Promocional x Menor': ['Precio x Menor', 0.05],
+    },
+    # Factores que multiplican el recargo (1.1 = 10% más)
+    'por_categoria': {},
+    'por_proveedor': {},
+}
+
+COLUMNAS_PRECIOS = list(REGLAS_POR_DEFECTO['recargos']) + list(REGLAS_POR_DEFECTO['promociones'])
+
+# Mezcla 'cambios' sobre 'base' también dentro de los diccionarios anidados
+# (un archivo que trae solo algunos recargos conserva los demás)
+def _combinar(base, cambios):
+    for clave, valor in cambios.items():
+        if isinstance(valor, dict) and isinstance(base.get(clave), dict):
+            _combinar(base[clave], valor)
+        else:
+            base[clave] = valor
+    return base
+
+def cargar_reglas(ruta=ARCHIVO_REGLAS):
+    reglas = json.loads(json.dumps(REGLAS_POR_DEFECTO))
+    if os.path.exists(ruta):
+        with open(ruta, encoding='utf-8') as archivo:
+            _combinar(reglas, json.load(archivo))
+    return reglas
+
+# Cotización del dólar de las reglas, o None si no se cargó
+def cotizacion_dolar(reglas):
+    cotizacion = reglas.get('cotizacion_dolar')
+    return float(cotizacion) if cotizacion and float(cotizacion) > 0 else None
+
+def guardar_reglas(reglas, ruta=ARCHIVO_REGLAS):
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(reglas, archivo, ensure_ascii=False, indent=2)
+
+def _numerico(df, columna):
+    if columna not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[columna], errors='coerce').fillna(0.0)
+
+# Factor por categoría: gana la primera categoría del producto que tenga regla
+def _factor_categoria(df, por_categoria):
+    if not por_categoria or 'Categorias' not in df.columns:
+        return np.ones(len(df))
+    categorias = df['Categorias'].astype('string').reset_index(drop=True).str.split(',').explode().str.strip()
+    factores = categorias.map(por_categoria).groupby(level=0).first()
+    return factores.reindex(range(len(df))).fillna(1.0).to_numpy(dtype=float)
+
+def _factor_proveedor(df, por_proveedor):
+    if not por_proveedor or 'Proveedor' not in df.columns:
+        return np.ones(len(df))
+    return df['Proveedor'].astype('string').str.strip().map(por_proveedor).fillna(1.0).to_numpy(dtype=float)
+
+# Costo en pesos sobre el que se aplican los recargos (NaN en los productos
+# que solo tienen costo en USD mientras no haya cotización)
+def costo_base(df, reglas):
+    costo_pesos = _numerico(df, 'Costo (Pesos)').to_numpy()
+    usd = _numerico(df, 'Costo (USD)').to_numpy()
+    cotizacion = cotizacion_dolar(reglas)
+    if cotizacion is None:
+        return np.where((costo_pesos <= 0) & (usd > 0), np.nan, costo_pesos)
+    costo_usd = usd * cotizacion
+    if reglas.get('preferir_usd'):
+        return np.where(costo_usd > 0, costo_usd, costo_pesos)
+    return np.where(costo_pesos > 0, costo_pesos, costo_usd)
+
+# Productos que no se pueden calcular porque falta la cotización del dólar
+def sin_cotizacion(df, reglas):
+    return np.isnan(costo_base(df, reglas))
+
+# Precios de lista y promocionales de todos los productos (mismo índice que df)
+def calcular_precios(df, reglas):
+    factor = _factor_categoria(df, reglas.get('por_categoria')) * _factor_proveedor(df, reglas.get('por_proveedor'))
+    costo = costo_base(df, reglas)
+    decimales = int(reglas.get('decimales', 2))
+
+    precios = {}
+    for columna, recargo in reglas['recargos'].items():
+        precios[columna] = np.round(costo * float(recargo) * factor, decimales)
+    for columna, (columna_lista, descuento) in reglas['promociones'].items():
+        precios[columna] = np.round(precios[columna_lista] * (1 - float(descuento)), decimales)
+    return pd.DataFrame(precios, index=df.index)
+
+# Precios de un solo producto (formulario de carga)
+def precios_producto(costo_pesos, costo_usd, categorias, proveedor, reglas):
+    fila = pd.DataFrame([{
+        'Costo (Pesos)': costo_pesos,
+        'Costo (USD)': costo_usd,
+        'Categorias': ', '.join(categorias) if isinstance(categorias, (list, tuple)) else categorias,
+        'Proveedor': proveedor,
+    }])
+    return {columna: float(valor) for columna, valor in calcular_precios(fila, reglas).iloc[0].items()}
+
+# ===============================
+# Simulación y Aplicación
+# ===============================
+
+# Reporte de lo que cambiaría, sin tocar nada: una fila por precio modificado
+def diferencias_precios(df, nuevos):
+    partes = []
+    for columna in nuevos.columns:
+        antes = _numerico(df, columna)
+        cambia = nuevos[columna].notna().to_numpy() & ~np.isclose(antes.to_numpy(), nuevos[columna].to_numpy())
+        if not cambia.any():
+            continue
+        parte = pd.DataFrame({
+            'Codigo': df['Codigo'][cambia] if 'Codigo' in df.columns else df.index[cambia],
+            'Nombre': df['Nombre'][cambia] if 'Nombre' in df.columns else '',
+            'Precio': columna,
+            'Antes': antes[cambia],
+            'Después': nuevos[columna][cambia],
+        })
+        partes.append(parte)
+    if not partes:
+        return pd.DataFrame(columns=['Codigo', 'Nombre', 'Precio', 'Antes', 'Después', 'Variación %'])
+    reporte = pd.concat(partes)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variacion = (reporte['Después'] - reporte['Antes']) / reporte['Antes'] * 100
+    reporte['Variación %'] = variacion.replace([np.inf, -np.inf], np.nan).round(1)
+    return reporte.reset_index(drop=True)
+
+# Copia del catálogo con los precios nuevos. Donde cambia el 'Precio Venta' se
+# guarda el anterior en 'Ultimo Precio (Pesos)', como hace el formulario. Los
+# precios que no se pudieron calcular (NaN) quedan como estaban.
+def aplicar_precios(df, nuevos, marca_tiempo=None):
+    resultado = df.copy()
+    if 'Precio Venta' in nuevos.columns:
+        anterior = _numerico(df, 'Precio Venta')
+        cambia = nuevos['Precio Venta'].notna().to_numpy() & ~np.isclose(anterior.to_numpy(), nuevos['Precio Venta'].to_numpy())
+        if 'Ultimo Precio (Pesos)' in resultado.columns:
+            resultado['Ultimo Precio (Pesos)'] = resultado['Ultimo Precio (Pesos)'].astype(object)
+            resultado.loc[cambia, 'Ultimo Precio (Pesos)'] = anterior[cambia]
+        if marca_tiempo is not None and 'Ultima Actualizacion' in resultado.columns:
+            resultado['Ultima Actualizacion'] = resultado['Ultima Actualizacion'].astype(object)
+            resultado.loc[cambia, 'Ultima Actualizacion'] = marca_tiempo
+    for columna in nuevos.columns:
+        if columna in resultado.columns:
+            resultado[columna] = nuevos[columna].where(nuevos[columna].notna(), resultado[columna])
+        else:
+            resultado[columna] = nuevos[columna]
+    return resultado
@@ -0,0 +1,113 @@
+import pandas as pd
+from maestros import COLUMNAS_UBICACION
+
+# ===============================
+# Picking por Olas y Recorrido del Depósito
+# ===============================
+
+# Una ola junta varios pedidos guardados: cada producto se levanta una sola
+# vez con la suma de lo que piden todos (y el detalle de cuánto va a cada
+# pedido). La lista se ordena por ubicación en forma de serpentina: el primer
+# pasillo se recorre de punta a punta, el siguiente de vuelta, y así, de modo
+# que quien arma los pedidos camina el depósito una sola vez por ola. Los
+# productos sin ubicación quedan al final.
+
+COLUMNAS_OLA = COLUMNAS_UBICACION + ['Codigo', 'Nombre', 'Cantidad', 'Pedidos', 'Detalle']
+
+# Pedidos por ola si no se indica otra cosa
+TAMAÑO_OLA = 30
+
+# Orden natural de un valor de ubicación: números como números
+# ('2' antes que '10'), texto sin distinguir mayúsculas, vacíos al final
+def clave_natural(valor):
+    texto = str(valor).strip() if valor is not None and not pd.isna(valor) else ''
+    if not texto:
+        return (1, 0, '')
+    try:
+        return (0, 0, float(texto))
+    except ValueError:
+        return (0, 1, texto.lower())
+
+# Posición de cada valor distinto en orden natural: {valor: 0, 1, 2...}
+def _rangos(valores):
+    distintos = sorted(set(valores), key=clave_natural)
+    return {valor: posicion for posicion, valor in enumerate(distintos)}
+
+# Orden de recorrido para una lista de ubicaciones (tuplas Pasillo, Estante,
+# Columna). Devuelve las posiciones de la lista en el orden en que se visitan.
+def orden_ruta(ubicaciones):
+    if not ubicaciones:
+        return []
+    pasillos, estantes, columnas = [
+        [str(valor).strip() if valor is not None else '' for valor in valores]
+        for valores in zip(*ubicaciones)
+    ]
+    # La serpentina se cuenta sobre los pasillos que visita esta ola: si se
+    # saltea un pasillo, el siguiente igual se entra por donde se salió
+    rango_pasillo = _rangos(pasillo for pasillo in pasillos if pasillo)
+    rango_estante = _rangos(estantes)
+    rango_columna = _rangos(columnas)
+    ancho = len(rango_columna) + 1
+
+    def clave(posicion):
+        pasillo = pasillos[posicion]
+        if not pasillo:
+            return (1, 0, 0)
+        numero = rango_pasillo[pasillo]
+        lugar = rango_estante[estantes[posicion]] * ancho + rango_columna[columnas[posicion]]
+        return (0, numero, -lugar if numero % 2 else lugar)
+
+    return sorted(range(len(ubicaciones)), key=clave)
+
+# ===============================
+# Armado de Olas
+# ===============================
+
+# Reparte los pedidos en olas de a 'tamaño' (en el orden recibido)
+def dividir_en_olas(pedidos, tamaño=TAMAÑO_OLA):
+    tamaño = max(1, int(tamaño))
+    return [pedidos[inicio:inicio + tamaño] for inicio in range(0, len(pedidos), tamaño)]
+
+# Lista de picking de una ola: una fila por producto, en orden de recorrido.
+# 'ubicaciones' es {codigo: (Pasillo, Estante, Columna)} (ver catalogo).
+def armar_ola(pedidos, ubicaciones):
+    lineas = pd.DataFrame(
+        [
+            (pedido['id'], str(item.get('Codigo')), item.get('Nombre'), item.get('Cantidad'))
+            for pedido in pedidos for item in pedido['items']
+        ],
+        columns=['id_pedido', 'Codigo', 'Nombre', 'Cantidad']
+    )
+    if lineas.empty:
+        return pd.DataFrame(columns=COLUMNAS_OLA)
+    lineas['Cantidad'] = pd.to_numeric(lineas['Cantidad'], errors='coerce').fillna(0)
+    # Un mismo producto repetido en un pedido cuenta una vez para ese pedido
+    por_pedido = lineas.groupby(['Codigo', 'id_pedido'], sort=False).agg(
+        Nombre=('Nombre', 'first'), Cantidad=('Cantidad', 'sum')
+    ).reset_index()
+    por_pedido['Detalle'] = '#' + por_pedido['id_pedido'].astype(str) + ' x' + por_pedido['Cantidad'].map('{:g}'.format)
+    ola = por_pedido.groupby('Codigo', sort=False).agg(
+        Nombre=('Nombre', 'first'),
+        Cantidad=('Cantidad', 'sum'),
+        Pedidos=('id_pedido', 'size'),
+        Detalle=('Detalle', ', '.join),
+    ).reset_index()
+
+    vacia = ('',) * len(COLUMNAS_UBICACION)
+    ubicacion_ola = [ubicaciones.get(codigo, vacia) for codigo in ola['Codigo']]
+    for indice, columna in enumerate(COLUMNAS_UBICACION):
+        ola.insert(indice, columna, [ubicacion[indice] for ubicacion in ubicacion_ola])
+    ola = ola.iloc[orden_ruta(ubicacion_ola)].reset_index(drop=True)
+    ola.index = ola.index + 1
+    ola.index.name = 'Orden'
+    return ola[COLUMNAS_OLA]
+
+# Cifras de una ola ya armada
+def resumen_ola(pedidos, ola):
+    return {
+        'pedidos': len(pedidos),
+        'lineas': sum(len(pedido['items']) for pedido in pedidos),
+        'productos': len(ola),
+        'unidades': float(ola['Cantidad'].sum()) if not ola.empty else 0.0,
+        'pasillos': int(ola['Pasillo'].replace('', pd.NA).nunique()) if not ola.empty else 0,
+    }
@@ -0,0 +1,250 @@
+import json
+import threading
+from openpyxl import load_workbook
+from base_datos import obtener_conexion, transaccion, asegurar_esquema, agendar_tarea, bloqueo_excel, valor_json
+from registro_stock import ESQUEMA_STOCK, registrar_movimientos
+
+# ===============================
+# Registro de Pedidos (solo agregado)
+# ===============================
+
+# Los pedidos se guardan en SQLite (modo WAL, fsync en cada commit). El ID lo
+# asigna la base dentro de la misma transacción, así dos vendedores nunca
+# reciben el mismo 'ID Pedido'. Cada producto del pedido es una fila de
+# 'lineas_pedido' (con la fecha del pedido, indexada por código y por fecha),
+# así las ventas de un producto se consultan sin abrir el JSON de cada
+# pedido. Las hojas 'Pedidos' e 'Items Pedidos' del Excel se regeneran
+# aparte para quienes las consultan desde Excel.
+
+ESQUEMA_PEDIDOS = """
+CREATE TABLE IF NOT EXISTS pedidos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cliente TEXT,
+    vendedor TEXT,
+    fecha TEXT,
+    hora TEXT,
+    items TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pedidos_fecha ON pedidos (fecha, id);
+CREATE INDEX IF NOT EXISTS idx_pedidos_cliente ON pedidos (cliente, fecha);
+CREATE TABLE IF NOT EXISTS lineas_pedido (
+    id_pedido INTEGER NOT NULL REFERENCES pedidos (id),
+    linea INTEGER NOT NULL,
+    codigo TEXT,
+    nombre TEXT,
+    cantidad NUMERIC,
+    precio NUMERIC,
+    importe NUMERIC,
+    fecha TEXT,
+    datos TEXT,
+    PRIMARY KEY (id_pedido, linea)
+);
+CREATE INDEX IF NOT EXISTS idx_lineas_codigo ON lineas_pedido (codigo, fecha);
+CREATE INDEX IF NOT EXISTS idx_lineas_fecha ON lineas_pedido (fecha, codigo);
+"""
+
+# La columna 'items' de 'pedidos' queda de las versiones anteriores (un JSON
+# con todos los productos); los pedidos nuevos y los migrados la dejan así
+SIN_ITEMS = '[]'
+
+HOJA_PEDIDOS = 'Pedidos'
+ENCABEZADOS_PEDIDOS = ['ID Pedido', 'Cliente', 'Vendedor', 'Fecha', 'Hora']
+HOJA_ITEMS_PEDIDOS = 'Items Pedidos'
+ENCABEZADOS_ITEMS_PEDIDOS = ['ID Pedido', 'Linea', 'Codigo', 'Nombre', 'Cantidad', 'Precio', 'Importe']
+
+# Claves de cada ítem con columna propia; las demás van a 'datos' (JSON)
+CAMPOS_LINEA = {'Codigo': 'codigo', 'Nombre': 'nombre', 'Cantidad': 'cantidad', 'Precio': 'precio', 'Importe': 'importe'}
+
+_items_migrados = False
+_bloqueo_migracion = threading.Lock()
+
+# Crea las tablas y, una vez por proceso, pasa a filas los pedidos con JSON
+def asegurar_tablas_pedidos():
+    global _items_migrados
+    asegurar_esquema('pedidos', ESQUEMA_PEDIDOS)
+    asegurar_esquema('stock', ESQUEMA_STOCK)
+    if _items_migrados:
+        return
+    with _bloqueo_migracion:
+        if not _items_migrados:
+            migrar_items_json()
+            _items_migrados = True
+
+# ===============================
+# Líneas de los Pedidos
+# ===============================
+
+def _fila_linea(id_pedido, linea, fecha, item):
+    item = {clave: valor_json(valor) for clave, valor in item.items()}
+    valores = {columna: item.pop(clave, None) for clave, columna in CAMPOS_LINEA.items()}
+    if valores['codigo'] is not None:
+        valores['codigo'] = str(valores['codigo'])
+    datos = json.dumps(item, ensure_ascii=False) if item else None
+    return (
+        id_pedido, linea, valores['codigo'], valores['nombre'], valores['cantidad'],
+        valores['precio'], valores['importe'], fecha, datos
+    )
+
+def _insertar_lineas(conexion, id_pedido, fecha, items):
+    conexion.executemany(
+        "INSERT INTO lineas_pedido (id_pedido, linea, codigo, nombre, cantidad, precio, importe, fecha, datos) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [_fila_linea(id_pedido, linea, fecha, item) for linea, item in enumerate(items, start=1) if isinstance(item, dict)]
+    )
+
+# Ítem con las mismas claves que arman las páginas de ventas
+def item_de_linea(fila):
+    item = {clave: fila[columna] for clave, columna in CAMPOS_LINEA.items()}
+    if fila['datos']:
+        item.update(json.loads(fila['datos']))
+    return item
+
+# Ítems de varios pedidos: {id_pedido: [ítems en orden]}. 'condicion' filtra
+# los pedidos (SQL sobre la tabla 'pedidos') con sus parámetros.
+def items_de_pedidos(condicion, parametros=()):
+    filas = obtener_conexion().execute(
+        "SELECT id_pedido, codigo, nombre, cantidad, precio, importe, datos FROM lineas_pedido "
+        f"WHERE id_pedido IN (SELECT id FROM pedidos WHERE {condicion}) ORDER BY id_pedido, linea",
+        parametros
+    ).fetchall()
+    items = {}
+    for fila in filas:
+        items.setdefault(fila['id_pedido'], []).append(item_de_linea(fila))
+    return items
+
+def items_pedido(id_pedido):
+    asegurar_tablas_pedidos()
+    return items_de_pedidos("id = ?", (int(id_pedido),)).get(int(id_pedido), [])
+
+# Guarda un pedido junto con sus descuentos de stock y devuelve su ID.
+# El costo no depende de cuántos pedidos ni cuántos productos haya.
+def registrar_pedido(order_data):
+    asegurar_tablas_pedidos()
+    movimientos = [(item['Codigo'], -item['Cantidad']) for item in order_data['items']]
+    with transaccion() as conexion:
+        cursor = conexion.execute(
+            "INSERT INTO pedidos (cliente, vendedor, fecha, hora, items) VALUES (?, ?, ?, ?, ?)",
+            (order_data['cliente'], order_data['vendedor'], order_data['fecha'], order_data['hora'], SIN_ITEMS)
+        )
+        id_pedido = cursor.lastrowid
+        _insertar_lineas(conexion, id_pedido, order_data['fecha'], order_data['items'])
+        registrar_movimientos(conexion, id_pedido, movimientos)
+        return id_pedido
+
+def listar_pedidos():
+    asegurar_tablas_pedidos()
+    return obtener_conexion().execute(
+        "SELECT id, cliente, vendedor, fecha, hora FROM pedidos ORDER BY id"
+    ).fetchall()
+
+# ===============================
+# Migración de los Ítems en JSON
+# ===============================
+
+def _leer_items_json(texto):
+    try:
+        items = json.loads(texto)
+    except (TypeError, ValueError):
+        return None
+    return items if isinstance(items, list) else None
+
+# Pasa a 'lineas_pedido' los pedidos guardados con el JSON de ítems y lo
+# vacía en la misma transacción, así ningún pedido se migra dos veces
+def migrar_items_json():
+    migrados = 0
+    with transaccion() as conexion:
+        pedidos = conexion.execute(
+            "SELECT id, fecha, items FROM pedidos WHERE items IS NOT NULL AND items NOT IN ('', ?)", (SIN_ITEMS,)
+        ).fetchall()
+        for pedido in pedidos:
+            items = _leer_items_json(pedido['items'])
+            # Un JSON que no se entiende se deja como está
+            if items is None:
+                continue
+            conexion.execute("DELETE FROM lineas_pedido WHERE id_pedido = ?", (pedido['id'],))
+            _insertar_lineas(conexion, pedido['id'], pedido['fecha'], items)
+            conexion.execute("UPDATE pedidos SET items = ? WHERE id = ?", (SIN_ITEMS, pedido['id']))
+            migrados += 1
+    return migrados
+
+# ===============================
+# Migración desde la Hoja 'Pedidos'
+# ===============================
+
+_archivos_importados = set()
+
+# Copia a la base los pedidos que ya estaban en la hoja 'Pedidos' del Excel,
+# conservando sus IDs. Los ítems vienen de la hoja 'Items Pedidos' o, en las
+# hojas de antes, del JSON de la columna 'Items'. Solo corre si la base
+# todavía no tiene pedidos.
+def importar_pedidos_excel(file_path):
+    if file_path in _archivos_importados:
+        return 0
+    asegurar_tablas_pedidos()
+    importados = 0
+    with transaccion() as conexion:
+        if conexion.execute("SELECT 1 FROM pedidos LIMIT 1").fetchone() is None:
+            book = load_workbook(file_path, read_only=True)
+            try:
+                fechas = {}
+                if HOJA_PEDIDOS in book.sheetnames:
+                    filas = book[HOJA_PEDIDOS].iter_rows(min_row=2, values_only=True)
+                    for fila in filas:
+                        if not fila or fila[0] is None:
+                            continue
+                        id_pedido, cliente, vendedor, fecha, hora, items = (list(fila) + [None] * 6)[:6]
+                        id_pedido, fecha = int(id_pedido), valor_json(fecha)
+                        conexion.execute(
+                            "INSERT INTO pedidos (id, cliente, vendedor, fecha, hora, items) VALUES (?, ?, ?, ?, ?, ?)",
+                            (id_pedido, cliente, vendedor, fecha, valor_json(hora), SIN_ITEMS)
+                        )
+                        _insertar_lineas(conexion, id_pedido, fecha, _leer_items_json(items) or [])
+                        fechas[id_pedido] = fecha
+                        importados += 1
+                if HOJA_ITEMS_PEDIDOS in book.sheetnames:
+                    filas = book[HOJA_ITEMS_PEDIDOS].iter_rows(min_row=2, values_only=True)
+                    for fila in filas:
+                        if not fila or fila[0] is None or int(fila[0]) not in fechas:
+                            continue
+                        id_pedido, linea, *valores = (list(fila) + [None] * 7)[:7]
+                        item = dict(zip(CAMPOS_LINEA, valores))
+                        conexion.execute(
+                            "INSERT OR REPLACE INTO lineas_pedido (id_pedido, linea, codigo, nombre, cantidad, precio, importe, fecha, datos) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            _fila_linea(int(id_pedido), int(linea), fechas[int(id_pedido)], item)
+                        )
+            finally:
+                book.close()
+    _archivos_importados.add(file_path)
+    return importados
+
+# ===============================
+# Exportación de la Hoja 'Pedidos'
+# ===============================
+
+# Regenera las hojas 'Pedidos' (una fila por pedido) e 'Items Pedidos' (una
+# fila por producto) del Excel a partir de la base
+def exportar_pedidos_excel(file_path):
+    pedidos = listar_pedidos()
+    lineas = obtener_conexion().execute(
+        "SELECT id_pedido, linea, codigo, nombre, cantidad, precio, importe FROM lineas_pedido ORDER BY id_pedido, linea"
+    ).fetchall()
+    with bloqueo_excel:
+        book = load_workbook(file_path)
+        for hoja in (HOJA_PEDIDOS, HOJA_ITEMS_PEDIDOS):
+            if hoja in book.sheetnames:
+                del book[hoja]
+        sheet = book.create_sheet(HOJA_PEDIDOS)
+        sheet.append(ENCABEZADOS_PEDIDOS)
+        for pedido in pedidos:
+            sheet.append([pedido['id'], pedido['cliente'], pedido['vendedor'], pedido['fecha'], pedido['hora']])
+        sheet = book.create_sheet(HOJA_ITEMS_PEDIDOS)
+        sheet.append(ENCABEZADOS_ITEMS_PEDIDOS)
+        for linea in lineas:
+            sheet.append(list(linea))
+        book.save(file_path)
+    return len(pedidos)
+
+# Agenda la exportación sin bloquear la página de ventas
+def exportar_pedidos_en_segundo_plano(file_path):
+    agendar_tarea(('exportar_pedidos', file_path), exportar_pedidos_excel, file_path)
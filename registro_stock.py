@@ -0,0 +1,176 @@
+import os
+import zipfile
+from datetime import datetime, timedelta
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.packaging.custom import CustomPropertyList, IntProperty
+from openpyxl.xml.functions import fromstring
+from base_datos import obtener_conexion, transaccion, asegurar_esquema, agendar_tarea, bloqueo_excel
+
+# ===============================
+# Registro de Movimientos de Stock
+# ===============================
+
+# Cada pedido guardado agrega sus movimientos (Codigo, -cantidad) al registro
+# en la misma transacción que el pedido. Cada tanto los movimientos se
+# compactan: se suman a la columna 'Stock' del Excel y el libro guarda, en sus
+# propiedades, el ID del último movimiento que ya incluye (su "marca"). El
+# stock real de un producto es el 'Stock' de una versión del Excel más los
+# movimientos posteriores a la marca de esa misma versión: quien todavía lee
+# el libro anterior sigue sumando los movimientos que le faltan, y compactar
+# dos veces lo mismo no cambia nada.
+
+ESQUEMA_STOCK = """
+CREATE TABLE IF NOT EXISTS movimientos_stock (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    codigo TEXT NOT NULL,
+    delta INTEGER NOT NULL,
+    id_pedido INTEGER,
+    fecha TEXT NOT NULL,
+    compactado INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_movimientos_pendientes ON movimientos_stock (compactado, id);
+CREATE INDEX IF NOT EXISTS idx_movimientos_codigo ON movimientos_stock (codigo, id);
+"""
+
+HOJA_PRODUCTOS = 'Hoja1'
+
+# Propiedad del libro con el ID del último movimiento sumado al 'Stock'
+PROPIEDAD_MARCA = 'soop_stock_compactado'
+
+# Cuándo vale la pena volver a escribir el Excel
+UMBRAL_MOVIMIENTOS = 200
+INTERVALO_COMPACTACION = timedelta(minutes=15)
+
+def _asegurar_tablas():
+    asegurar_esquema('stock', ESQUEMA_STOCK)
+
+# Registra los movimientos de un pedido. Recibe la conexión de una transacción
+# abierta, para quedar en el mismo commit que el pedido (las tablas de
+# ESQUEMA_STOCK tienen que existir antes de abrir esa transacción).
+def registrar_movimientos(conexion, id_pedido, movimientos):
+    fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for codigo, delta in movimientos:
+        codigo = str(codigo)
+        delta = int(delta)
+        conexion.execute(
+            "INSERT INTO movimientos_stock (codigo, delta, id_pedido, fecha) VALUES (?, ?, ?, ?)",
+            (codigo, delta, id_pedido, fecha)
+        )
+
+# Ajuste manual (fuera de un pedido), en su propia transacción
+def ajustar_stock(codigo, delta, id_pedido=None):
+    _asegurar_tablas()
+    with transaccion() as conexion:
+        registrar_movimientos(conexion, id_pedido, [(codigo, delta)])
+
+# Movimientos de un producto que no están en la versión del Excel con esa marca
+# (sin marca, None, cuentan todos)
+def delta_pendiente(codigo, marca):
+    _asegurar_tablas()
+    fila = obtener_conexion().execute(
+        "SELECT COALESCE(SUM(delta), 0) AS delta FROM movimientos_stock WHERE codigo = ? AND id > ?",
+        (str(codigo), marca or 0)
+    ).fetchone()
+    return fila['delta']
+
+# Marca de la versión del Excel que está en disco. Un libro compactado antes
+# de que existiera la marca no la tiene: incluye lo marcado como compactado.
+# Si el libro no existe o no se puede leer (a medio copiar) devuelve None: se
+# toma como no compactado y no se compacta sobre él.
+def marca_compactacion(file_path):
+    try:
+        with zipfile.ZipFile(file_path) as libro:
+            propiedades = CustomPropertyList.from_tree(fromstring(libro.read('docProps/custom.xml')))
+        for propiedad in propiedades:
+            if propiedad.name == PROPIEDAD_MARCA:
+                return int(propiedad.value)
+    except KeyError:
+        pass
+    except (zipfile.BadZipFile, OSError):
+        return None
+    _asegurar_tablas()
+    return obtener_conexion().execute(
+        "SELECT COALESCE(MAX(id), 0) AS marca FROM movimientos_stock WHERE compactado = 1"
+    ).fetchone()['marca']
+
+# ===============================
+# Compactación al Excel
+# ===============================
+
+def debe_compactar():
+    _asegurar_tablas()
+    fila = obtener_conexion().execute(
+        "SELECT COUNT(*) AS cantidad, MIN(fecha) AS primera FROM movimientos_stock WHERE compactado = 0"
+    ).fetchone()
+    if not fila['cantidad']:
+        return False
+    if fila['cantidad'] >= UMBRAL_MOVIMIENTOS:
+        return True
+    primera = datetime.strptime(fila['primera'], "%Y-%m-%d %H:%M:%S")
+    return datetime.now() - primera >= INTERVALO_COMPACTACION
+
+# Los Excel que salen del convertidor de CSV guardan los números como texto
+def a_entero(valor):
+    if valor is None or pd.isna(valor) or valor == '':
+        return 0
+    return int(float(valor))
+
+# Los movimientos que ya están en el Excel (según su marca) dejan de contar
+# como pendientes. Pone al día la base si el proceso se cortó entre guardar
+# el libro y marcar los movimientos.
+def conciliar_compactacion(file_path):
+    marca = marca_compactacion(file_path)
+    if marca is None:
+        return None
+    with transaccion() as conexion:
+        conexion.execute(
+            "UPDATE movimientos_stock SET compactado = 1 WHERE compactado = 0 AND id <= ?", (marca,)
+        )
+    return marca
+
+# Suma al 'Stock' del Excel los movimientos posteriores a su marca. Los que
+# llegan mientras se escribe quedan para la próxima vez. El libro nuevo (con
+# su marca) reemplaza al anterior de una sola vez.
+def compactar_stock(file_path):
+    _asegurar_tablas()
+    with bloqueo_excel:
+        marca = conciliar_compactacion(file_path)
+        if marca is None:
+            return 0
+        conexion = obtener_conexion()
+        ultimo_id = conexion.execute(
+            "SELECT MAX(id) AS ultimo FROM movimientos_stock WHERE id > ?", (marca,)
+        ).fetchone()['ultimo']
+        if ultimo_id is None:
+            return 0
+        pendientes = {
+            fila['codigo']: fila['total'] for fila in conexion.execute(
+                "SELECT codigo, SUM(delta) AS total FROM movimientos_stock "
+                "WHERE id > ? AND id <= ? GROUP BY codigo", (marca, ultimo_id)
+            )
+        }
+
+        book = load_workbook(file_path)
+        sheet = book[HOJA_PRODUCTOS] if HOJA_PRODUCTOS in book.sheetnames else book.worksheets[0]
+        encabezados = [celda.value for celda in sheet[1]]
+        col_codigo = encabezados.index('Codigo')
+        col_stock = encabezados.index('Stock')
+        for fila in sheet.iter_rows(min_row=2):
+            codigo = fila[col_codigo].value
+            if codigo is None or str(codigo) not in pendientes:
+                continue
+            celda_stock = fila[col_stock]
+            celda_stock.value = a_entero(celda_stock.value) + pendientes[str(codigo)]
+        if PROPIEDAD_MARCA in book.custom_doc_props.names:
+            del book.custom_doc_props[PROPIEDAD_MARCA]
+        book.custom_doc_props.append(IntProperty(name=PROPIEDAD_MARCA, value=ultimo_id))
+        temporal = f"{file_path}.tmp.xlsx"
+        book.save(temporal)
+        os.replace(temporal, file_path)
+
+        conciliar_compactacion(file_path)
+    return len(pendientes)
+
+def compactar_stock_en_segundo_plano(file_path):
+    agendar_tarea(('compactar_stock', file_path), compactar_stock, file_path)
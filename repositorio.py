@@ -0,0 +1,484 @@
+import json
+import os
+import threading
+from datetime import timedelta
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from base_datos import obtener_conexion, transaccion, asegurar_esquema, agendar_tarea, bloqueo_excel, valor_json
+from cache_columnar import firma_archivo, leer_excel
+from maestros import ARCHIVO_PRODUCTOS, ARCHIVO_CLIENTES
+from indice_productos import normalizar_codigo_barras
+from registro_pedidos import asegurar_tablas_pedidos, registrar_pedido, importar_pedidos_excel, items_de_pedidos
+from registro_stock import ajustar_stock, delta_pendiente, marca_compactacion
+
+# ===============================
+# Repositorio de Datos (SQLite)
+# ===============================
+
+# Punto único de acceso a productos, clientes, pedidos y equipo. Los datos
+# viven en la base embebida (soop.db) con índices para las consultas de todos
+# los días; los Excel de siempre siguen siendo la forma de cargarlos y de
+# sacarlos:
+#   - productos y clientes se editan en Excel: la tabla se vuelve a importar
+#     sola cuando el archivo cambia en disco (se compara su firma);
+#   - el equipo se administra desde la app: la base es la fuente y equipo.xlsx
+#     es una copia que se regenera en segundo plano.
+# Cada fila de productos y clientes guarda la fila original completa (JSON) y
+# aparte las columnas por las que se busca.
+
+ARCHIVO_EQUIPO = 'equipo.xlsx'
+
+ESQUEMA_REPOSITORIO = """
+CREATE TABLE IF NOT EXISTS productos (
+    codigo TEXT PRIMARY KEY,
+    nombre TEXT COLLATE NOCASE,
+    codigo_barras TEXT,
+    stock INTEGER NOT NULL DEFAULT 0,
+    precio REAL,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_productos_nombre ON productos (nombre);
+CREATE INDEX IF NOT EXISTS idx_productos_barras ON productos (codigo_barras);
+
+CREATE TABLE IF NOT EXISTS clientes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT COLLATE NOCASE NOT NULL,
+    empresa TEXT COLLATE NOCASE,
+    vendedor TEXT,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_clientes_nombre ON clientes (nombre);
+CREATE INDEX IF NOT EXISTS idx_clientes_empresa ON clientes (empresa);
+
+CREATE TABLE IF NOT EXISTS equipo (
+    nombre TEXT PRIMARY KEY,
+    rol TEXT,
+    departamento TEXT,
+    nivel_acceso TEXT
+);
+
+CREATE TABLE IF NOT EXISTS origenes_excel (
+    tabla TEXT PRIMARY KEY,
+    archivo TEXT NOT NULL,
+    firma TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS marca_stock_productos (
+    unica INTEGER PRIMARY KEY CHECK (unica = 1),
+    marca INTEGER NOT NULL
+);
+"""
+
+# Equipo con el que arranca la app si no hay equipo.xlsx
+EQUIPO_INICIAL = [
+    ('Joni', 'Presidente', 'Dirección', 'Alto'),
+    ('Eduardo', 'Gerente General', 'Dirección', 'Alto'),
+    ('Johan', 'Jefe de Depósito', 'Depósito', 'Medio'),
+    ('Martin', 'Armar Pedidos', 'Depósito', 'Medio'),
+    ('Marian', 'Vendedora', 'Ventas', 'Bajo'),
+    ('Sofi', 'Vendedora', 'Ventas', 'Bajo'),
+    ('Valen', 'Vendedora', 'Ventas', 'Bajo'),
+    ('Emily', 'Vendedora', 'Ventas', 'Bajo'),
+    ('Maria-Jose', 'Fotógrafa y Catalogador', 'Marketing', 'Medio'),
+    ('Vasco', 'Super Admin', 'Dirección', 'Super Admin'),
+]
+
+COLUMNAS_EQUIPO = ['Nombre', 'Rol', 'Departamento', 'Nivel de Acceso']
+
+_bloqueo_importacion = threading.Lock()
+
+def _asegurar_tablas():
+    asegurar_esquema('repositorio', ESQUEMA_REPOSITORIO)
+    asegurar_tablas_pedidos()
+
+# Texto para LIKE con los comodines escapados
+def _patron(texto, prefijo=False):
+    texto = texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"{texto}%" if prefijo else f"%{texto}%"
+
+# ===============================
+# Importación desde Excel
+# ===============================
+
+def _filas_productos(df):
+    filas = []
+    stock = pd.to_numeric(df['Stock'], errors='coerce').fillna(0) if 'Stock' in df.columns else pd.Series(0, index=df.index)
+    precio = pd.to_numeric(df['Precio'], errors='coerce') if 'Precio' in df.columns else pd.Series(None, index=df.index)
+    for registro, stock_fila, precio_fila in zip(df.to_dict('records'), stock, precio):
+        codigo = valor_json(registro.get('Codigo'))
+        if codigo is None:
+            continue
+        codigo_barras = valor_json(registro.get('Codigo de Barras'))
+        filas.append((
+            str(codigo),
+            valor_json(registro.get('Nombre')),
+            normalizar_codigo_barras(codigo_barras) if codigo_barras is not None else None,
+            int(stock_fila),
+            valor_json(precio_fila),
+            json.dumps({columna: valor_json(valor) for columna, valor in registro.items()}, ensure_ascii=False)
+        ))
+    return filas
+
+def _filas_clientes(df):
+    filas = []
+    for registro in df.to_dict('records'):
+        nombre = valor_json(registro.get('Nombre'))
+        if nombre is None:
+            continue
+        filas.append((
+            str(nombre),
+            valor_json(registro.get('Empresa')),
+            valor_json(registro.get('Vendedores')),
+            json.dumps({columna: valor_json(valor) for columna, valor in registro.items()}, ensure_ascii=False)
+        ))
+    return filas
+
+# Tablas que se cargan desde un Excel: archivo, armado de filas e INSERT
+TABLAS_EXCEL = {
+    'productos': (
+        ARCHIVO_PRODUCTOS, _filas_productos,
+        # Ante códigos repetidos gana la primera fila, como en IndiceProductos
+        "INSERT OR IGNORE INTO productos (codigo, nombre, codigo_barras, stock, precio, datos) VALUES (?, ?, ?, ?, ?, ?)"
+    ),
+    'clientes': (
+        ARCHIVO_CLIENTES, _filas_clientes,
+        "INSERT INTO clientes (nombre, empresa, vendedor, datos) VALUES (?, ?, ?, ?)"
+    ),
+}
+
+def _firma_texto(archivo):
+    return json.dumps(firma_archivo(archivo))
+
+# Reemplaza el contenido de la tabla por el del Excel, en una sola transacción
+def importar_excel(tabla, archivo=None):
+    _asegurar_tablas()
+    archivo_defecto, armar_filas, insertar = TABLAS_EXCEL[tabla]
+    archivo = archivo or archivo_defecto
+    firma = _firma_texto(archivo)
+    marca = marca_compactacion(archivo) if tabla == 'productos' else None
+    filas = armar_filas(leer_excel(archivo))
+    with transaccion() as conexion:
+        conexion.execute(f"DELETE FROM {tabla}")
+        conexion.executemany(insertar, filas)
+        if tabla == 'productos':
+            # En la misma transacción que los stocks: se leen siempre juntos
+            # (0 si el libro no tenía marca legible: no compactado)
+            conexion.execute("INSERT OR REPLACE INTO marca_stock_productos (unica, marca) VALUES (1, ?)", (marca or 0,))
+        conexion.execute(
+            "INSERT INTO origenes_excel (tabla, archivo, firma) VALUES (?, ?, ?) "
+            "ON CONFLICT (tabla) DO UPDATE SET archivo = excluded.archivo, firma = excluded.firma",
+            (tabla, archivo, firma)
+        )
+    return len(filas)
+
+# Vuelve a importar la tabla si su Excel cambió desde la última importación.
+# Es barato (un stat del archivo y una consulta): se llama antes de cada lectura.
+def sincronizar(tabla):
+    _asegurar_tablas()
+    archivo = TABLAS_EXCEL[tabla][0]
+    if not os.path.exists(archivo):
+        return False
+    fila = obtener_conexion().execute(
+        "SELECT archivo, firma FROM origenes_excel WHERE tabla = ?", (tabla,)
+    ).fetchone()
+    if fila is not None and fila['archivo'] == archivo and fila['firma'] == _firma_texto(archivo):
+        return False
+    with _bloqueo_importacion:
+        # Otro hilo pudo haberla importado mientras se esperaba el lock
+        fila = obtener_conexion().execute(
+            "SELECT archivo, firma FROM origenes_excel WHERE tabla = ?", (tabla,)
+        ).fetchone()
+        if fila is not None and fila['archivo'] == archivo and fila['firma'] == _firma_texto(archivo):
+            return False
+        importar_excel(tabla, archivo)
+    return True
+
+# ===============================
+# Productos
+# ===============================
+
+# Columnas de un producto y la marca de compactación de su Excel, en la
+# misma consulta (así las dos salen de la misma importación)
+COLUMNAS_PRODUCTO = "codigo, stock, datos, (SELECT marca FROM marca_stock_productos) AS marca"
+
+# Fila original del Excel con el 'Stock' real (el del Excel más los
+# movimientos posteriores a su marca de compactación)
+def _producto(fila):
+    if fila is None:
+        return None
+    producto = json.loads(fila['datos'])
+    producto['Stock'] = fila['stock'] + delta_pendiente(fila['codigo'], fila['marca'] or 0)
+    return producto
+
+def obtener_producto(codigo):
+    sincronizar('productos')
+    return _producto(obtener_conexion().execute(
+        f"SELECT {COLUMNAS_PRODUCTO} FROM productos WHERE codigo = ?", (str(codigo),)
+    ).fetchone())
+
+# Producto escaneado; si el código no figura como código de barras se prueba como 'Codigo'
+def obtener_producto_por_barras(codigo_barras):
+    sincronizar('productos')
+    codigo_barras = normalizar_codigo_barras(codigo_barras)
+    fila = obtener_conexion().execute(
+        f"SELECT {COLUMNAS_PRODUCTO} FROM productos WHERE codigo_barras = ? LIMIT 1", (codigo_barras,)
+    ).fetchone()
+    return _producto(fila) if fila is not None else obtener_producto(codigo_barras)
+
+# Productos cuyo nombre empieza con el texto (usa el índice) y, si faltan
+# resultados, los que lo contienen en el nombre o el código
+def buscar_productos(texto, limite=20):
+    sincronizar('productos')
+    texto = (texto or '').strip()
+    if not texto:
+        return []
+    conexion = obtener_conexion()
+    filas = conexion.execute(
+        f"SELECT {COLUMNAS_PRODUCTO} FROM productos WHERE nombre LIKE ? ESCAPE '\\' ORDER BY nombre LIMIT ?",
+        (_patron(texto, prefijo=True), limite)
+    ).fetchall()
+    if len(filas) < limite:
+        vistos = [fila['codigo'] for fila in filas]
+        excluir = f"AND codigo NOT IN ({', '.join('?' * len(vistos))}) " if vistos else ""
+        filas += conexion.execute(
+            f"SELECT {COLUMNAS_PRODUCTO} FROM productos "
+            "WHERE (nombre LIKE ? ESCAPE '\\' OR codigo LIKE ? ESCAPE '\\') "
+            f"{excluir}ORDER BY nombre LIMIT ?",
+            (_patron(texto), _patron(texto), *vistos, limite - len(filas))
+        ).fetchall()
+    return [_producto(fila) for fila in filas]
+
+def stock_producto(codigo):
+    sincronizar('productos')
+    fila = obtener_conexion().execute(
+        "SELECT stock, (SELECT marca FROM marca_stock_productos) AS marca FROM productos WHERE codigo = ?", (str(codigo),)
+    ).fetchone()
+    if fila is None:
+        return delta_pendiente(codigo, marca_compactacion(ARCHIVO_PRODUCTOS))
+    return fila['stock'] + delta_pendiente(codigo, fila['marca'] or 0)
+
+# Ajuste manual de stock (recuento, rotura, devolución). Queda en el registro
+# de movimientos como cualquier pedido y se compacta al Excel con ellos.
+def ajustar_stock_producto(codigo, delta):
+    ajustar_stock(str(codigo), int(delta))
+    return stock_producto(codigo)
+
+# ===============================
+# Clientes
+# ===============================
+
+def _cliente(fila):
+    return json.loads(fila['datos']) if fila is not None else None
+
+def obtener_cliente(nombre):
+    sincronizar('clientes')
+    return _cliente(obtener_conexion().execute(
+        "SELECT datos FROM clientes WHERE nombre = ? ORDER BY id LIMIT 1", (nombre,)
+    ).fetchone())
+
+# Clientes por nombre o empresa: primero los que empiezan con el texto
+def buscar_clientes(texto, limite=20):
+    sincronizar('clientes')
+    texto = (texto or '').strip()
+    if not texto:
+        return []
+    filas = obtener_conexion().execute(
+        "SELECT datos, (nombre LIKE ? ESCAPE '\\') AS empieza FROM clientes "
+        "WHERE nombre LIKE ? ESCAPE '\\' OR empresa LIKE ? ESCAPE '\\' "
+        "ORDER BY empieza DESC, nombre LIMIT ?",
+        (_patron(texto, prefijo=True), _patron(texto), _patron(texto), limite)
+    ).fetchall()
+    return [_cliente(fila) for fila in filas]
+
+def clientes_de_vendedor(vendedor):
+    sincronizar('clientes')
+    filas = obtener_conexion().execute(
+        "SELECT datos FROM clientes WHERE vendedor = ? ORDER BY nombre", (vendedor,)
+    ).fetchall()
+    return [_cliente(fila) for fila in filas]
+
+# ===============================
+# Pedidos
+# ===============================
+
+# Los ítems salen de 'lineas_pedido' con una sola consulta para todos los pedidos
+def _pedidos(filas, condicion, parametros):
+    items = items_de_pedidos(condicion, parametros) if filas else {}
+    return [dict(fila, items=items.get(fila['id'], [])) for fila in filas]
+
+# Rango de fechas como texto. 'fecha' puede traer hora (pedidos importados
+# del Excel): se compara contra el día siguiente.
+def _rango_fechas(desde, hasta):
+    desde = pd.Timestamp(desde).strftime("%Y-%m-%d")
+    hasta = (pd.Timestamp(hasta if hasta is not None else desde) + timedelta(days=1)).strftime("%Y-%m-%d")
+    return desde, hasta
+
+# Condición SQL para 'desde'/'hasta' opcionales sobre una columna de fecha
+def _condicion_fechas(columna, desde, hasta):
+    condiciones, parametros = [], []
+    if desde is not None:
+        condiciones.append(f"{columna} >= ?")
+        parametros.append(pd.Timestamp(desde).strftime("%Y-%m-%d"))
+    if hasta is not None:
+        condiciones.append(f"{columna} < ?")
+        parametros.append((pd.Timestamp(hasta) + timedelta(days=1)).strftime("%Y-%m-%d"))
+    return ''.join(f" AND {condicion}" for condicion in condiciones), parametros
+
+# Guarda el pedido (con sus movimientos de stock) y devuelve su ID. La primera
+# vez se copian a la base los pedidos que ya estaban en la hoja 'Pedidos'.
+def agregar_pedido(order_data, archivo=ARCHIVO_PRODUCTOS):
+    importar_pedidos_excel(archivo)
+    return registrar_pedido(order_data)
+
+def obtener_pedido(id_pedido):
+    _asegurar_tablas()
+    parametros = (int(id_pedido),)
+    filas = obtener_conexion().execute(
+        "SELECT id, cliente, vendedor, fecha, hora FROM pedidos WHERE id = ?", parametros
+    ).fetchall()
+    pedidos = _pedidos(filas, "id = ?", parametros)
+    return pedidos[0] if pedidos else None
+
+# Pedidos entre dos fechas (inclusive), opcionalmente de un cliente
+def pedidos_por_fecha(desde, hasta=None, cliente=None):
+    _asegurar_tablas()
+    condicion = "fecha >= ? AND fecha < ?"
+    parametros = list(_rango_fechas(desde, hasta))
+    if cliente is not None:
+        condicion = "cliente = ? AND " + condicion
+        parametros = [cliente] + parametros
+    filas = obtener_conexion().execute(
+        f"SELECT id, cliente, vendedor, fecha, hora FROM pedidos WHERE {condicion} ORDER BY fecha, id", parametros
+    ).fetchall()
+    return _pedidos(filas, condicion, parametros)
+
+# Ventas de un producto (una fila por pedido que lo incluye), opcionalmente
+# entre dos fechas. Usa el índice por código y fecha de 'lineas_pedido'.
+def ventas_de_producto(codigo, desde=None, hasta=None):
+    _asegurar_tablas()
+    consulta = (
+        "SELECT l.id_pedido, l.fecha, p.cliente, p.vendedor, l.cantidad, l.precio, l.importe "
+        "FROM lineas_pedido l JOIN pedidos p ON p.id = l.id_pedido WHERE l.codigo = ?"
+    )
+    condicion, parametros = _condicion_fechas('l.fecha', desde, hasta)
+    parametros = [str(codigo)] + parametros
+    filas = obtener_conexion().execute(consulta + condicion + " ORDER BY l.fecha, l.id_pedido", parametros).fetchall()
+    return [dict(fila) for fila in filas]
+
+# Unidades, importe y cantidad de pedidos de un producto, sin traer las filas
+def totales_de_producto(codigo, desde=None, hasta=None):
+    _asegurar_tablas()
+    consulta = (
+        "SELECT COALESCE(SUM(cantidad), 0) AS unidades, COALESCE(SUM(COALESCE(importe, cantidad * precio)), 0) AS importe, "
+        "COUNT(DISTINCT id_pedido) AS pedidos FROM lineas_pedido WHERE codigo = ?"
+    )
+    condicion, parametros = _condicion_fechas('fecha', desde, hasta)
+    return dict(obtener_conexion().execute(consulta + condicion, [str(codigo)] + parametros).fetchone())
+
+# ===============================
+# Equipo
+# ===============================
+
+# La primera vez se carga equipo.xlsx si existe; si no, el equipo inicial
+def _asegurar_equipo():
+    _asegurar_tablas()
+    if obtener_conexion().execute("SELECT 1 FROM equipo LIMIT 1").fetchone() is not None:
+        return
+    miembros = EQUIPO_INICIAL
+    if os.path.exists(ARCHIVO_EQUIPO):
+        df = pd.read_excel(ARCHIVO_EQUIPO).reindex(columns=COLUMNAS_EQUIPO)
+        miembros = [tuple(valor_json(valor) for valor in fila) for fila in df.itertuples(index=False) if pd.notna(fila[0])]
+    with transaccion() as conexion:
+        if conexion.execute("SELECT 1 FROM equipo LIMIT 1").fetchone() is None:
+            conexion.executemany(
+                "INSERT OR IGNORE INTO equipo (nombre, rol, departamento, nivel_acceso) VALUES (?, ?, ?, ?)", miembros
+            )
+    if not os.path.exists(ARCHIVO_EQUIPO):
+        exportar_equipo_en_segundo_plano()
+
+# Equipo como DataFrame, con las columnas de siempre
+def listar_equipo():
+    _asegurar_equipo()
+    filas = obtener_conexion().execute(
+        "SELECT nombre, rol, departamento, nivel_acceso FROM equipo ORDER BY rowid"
+    ).fetchall()
+    return pd.DataFrame([tuple(fila) for fila in filas], columns=COLUMNAS_EQUIPO)
+
+def obtener_miembro(nombre):
+    _asegurar_equipo()
+    fila = obtener_conexion().execute(
+        "SELECT nombre, rol, departamento, nivel_acceso FROM equipo WHERE nombre = ?", (nombre,)
+    ).fetchone()
+    return dict(zip(COLUMNAS_EQUIPO, tuple(fila))) if fila is not None else None
+
+# Devuelve False si ya había un miembro con ese nombre
+def agregar_miembro(nombre, rol, departamento, nivel_acceso):
+    _asegurar_equipo()
+    with transaccion() as conexion:
+        cursor = conexion.execute(
+            "INSERT OR IGNORE INTO equipo (nombre, rol, departamento, nivel_acceso) VALUES (?, ?, ?, ?)",
+            (nombre, rol, departamento, nivel_acceso)
+        )
+    if cursor.rowcount:
+        exportar_equipo_en_segundo_plano()
+    return bool(cursor.rowcount)
+
+def eliminar_miembro(nombre):
+    _asegurar_equipo()
+    with transaccion() as conexion:
+        cursor = conexion.execute("DELETE FROM equipo WHERE nombre = ?", (nombre,))
+    if cursor.rowcount:
+        exportar_equipo_en_segundo_plano()
+    return bool(cursor.rowcount)
+
+# ===============================
+# Exportación a Excel
+# ===============================
+
+# Reemplaza (o crea) una hoja del libro sin tocar las demás. Se escribe en un
+# temporal y se renombra, para que nadie lea el archivo a medio escribir.
+def _escribir_hoja(archivo, hoja, df):
+    with bloqueo_excel:
+        if os.path.exists(archivo):
+            book = load_workbook(archivo)
+            posicion = book.sheetnames.index(hoja) if hoja in book.sheetnames else len(book.sheetnames)
+            if hoja in book.sheetnames:
+                del book[hoja]
+            sheet = book.create_sheet(hoja, posicion)
+        else:
+            book = Workbook()
+            sheet = book.active
+            sheet.title = hoja
+        sheet.append(list(df.columns))
+        for fila in df.itertuples(index=False):
+            sheet.append([valor_json(valor) for valor in fila])
+        temporal = f"{archivo}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            book.save(temporal)
+            os.replace(temporal, archivo)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+def tabla_como_dataframe(tabla):
+    if tabla == 'equipo':
+        return listar_equipo()
+    sincronizar(tabla)
+    orden = 'rowid' if tabla == 'productos' else 'id'
+    filas = obtener_conexion().execute(f"SELECT datos FROM {tabla} ORDER BY {orden}").fetchall()
+    return pd.DataFrame([json.loads(fila['datos']) for fila in filas])
+
+# Escribe la tabla en una hoja de un Excel (por defecto 'Hoja1')
+def exportar_excel(tabla, archivo, hoja='Hoja1'):
+    df = tabla_como_dataframe(tabla)
+    _escribir_hoja(archivo, hoja, df)
+    # Si se escribió sobre el Excel de origen no hace falta volver a importarlo
+    if tabla in TABLAS_EXCEL and archivo == TABLAS_EXCEL[tabla][0]:
+        with transaccion() as conexion:
+            conexion.execute(
+                "UPDATE origenes_excel SET firma = ? WHERE tabla = ?", (_firma_texto(archivo), tabla)
+            )
+    return len(df)
+
+def exportar_equipo_en_segundo_plano():
+    agendar_tarea(('exportar_equipo', ARCHIVO_EQUIPO), exportar_excel, 'equipo', ARCHIVO_EQUIPO)
@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from base_datos import obtener_conexion, transaccion, asegurar_esquema
+
+# ===============================
+# Reservas de Stock Compartidas
+# ===============================
+
+# Mientras un vendedor arma un pedido, lo que agrega queda reservado para
+# todas las sesiones: otro vendedor ve el stock ya descontado y no puede
+# reservar por encima de lo que queda. Las reservas vencen si la sesión deja
+# de renovarlas (TTL) o termina, se liberan al borrar un ítem y se confirman
+# (se quitan, porque el registro de stock ya tiene el movimiento) al guardar
+# el pedido.
+#
+# Por defecto viven en memoria del proceso, con un lock por producto (que
+# existe solo mientras alguien lo usa). Si la app corre en varios procesos,
+# SOOP_RESERVAS=sqlite las guarda en la base.
+
+DURACION_RESERVA = 20 * 60
+
+ESQUEMA_RESERVAS = """
+CREATE TABLE IF NOT EXISTS reservas (
+    codigo TEXT NOT NULL,
+    sesion TEXT NOT NULL,
+    cantidad INTEGER NOT NULL,
+    vence REAL NOT NULL,
+    PRIMARY KEY (codigo, sesion)
+);
+CREATE INDEX IF NOT EXISTS idx_reservas_sesion ON reservas (sesion);
+"""
+
+# Sesiones de Streamlit que ya no existen (pestaña cerrada, sesión vencida)
+def sesion_terminada(sesion):
+    try:
+        from streamlit.runtime import exists, get_instance
+        if not exists():
+            return False
+        return not get_instance().is_active_session(sesion)
+    except Exception:
+        return False
+
+class ReservasEnMemoria:
+    def __init__(self, duracion=DURACION_RESERVA):
+        self.duracion = duracion
+        # codigo -> {sesion: [cantidad, vence]} (sin productos sin reservas)
+        self._reservas = {}
+        # codigo -> [lock, hilos que lo usan o lo esperan]
+        self._bloqueos = {}
+        self._bloqueo_bloqueos = threading.Lock()
+        # Solo para el índice sesion -> códigos (no se toma al reservar un producto)
+        self._bloqueo_sesiones = threading.Lock()
+        self._por_sesion = {}
+
+    # Lock del producto. Se cuenta quién lo usa para quitarlo cuando nadie lo
+    # necesita; así no queda un lock por cada código que alguna vez se reservó.
+    @contextmanager
+    def _bloqueo(self, codigo):
+        with self._bloqueo_bloqueos:
+            entrada = self._bloqueos.setdefault(codigo, [threading.Lock(), 0])
+            entrada[1] += 1
+        try:
+            with entrada[0]:
+                yield
+        finally:
+            with self._bloqueo_bloqueos:
+                entrada[1] -= 1
+                if not entrada[1]:
+                    del self._bloqueos[codigo]
+
+    def _anotar_sesion(self, sesion, codigo, presente):
+        with self._bloqueo_sesiones:
+            codigos = self._por_sesion.setdefault(sesion, set())
+            if presente:
+                codigos.add(codigo)
+            else:
+                codigos.discard(codigo)
+                if not codigos:
+                    del self._por_sesion[sesion]
+
+    # Quita las reservas vencidas de un producto (con su lock tomado)
+    def _purgar(self, codigo, ahora):
+        reservas = self._reservas.get(codigo, {})
+        for sesion in [s for s, (_, vence) in reservas.items() if vence <= ahora or sesion_terminada(s)]:
+            del reservas[sesion]
+            self._anotar_sesion(sesion, codigo, False)
+        if not reservas:
+            self._reservas.pop(codigo, None)
+        return reservas
+
+    def reservado(self, codigo, excepto=None):
+        codigo = str(codigo)
+        with self._bloqueo(codigo):
+            reservas = self._purgar(codigo, time.time())
+            return sum(cantidad for sesion, (cantidad, _) in reservas.items() if sesion != excepto)
+
+    def reservado_por(self, sesion, codigo):
+        codigo = str(codigo)
+        with self._bloqueo(codigo):
+            reserva = self._purgar(codigo, time.time()).get(sesion)
+            return reserva[0] if reserva else 0
+
+    # Suma 'cantidad' a la reserva de la sesión si alcanza el stock. 'stock' es
+    # el stock real del producto (sin reservas). Devuelve True si se reservó.
+    def reservar(self, sesion, codigo, cantidad, stock):
+        codigo = str(codigo)
+        with self._bloqueo(codigo):
+            ahora = time.time()
+            reservas = self._purgar(codigo, ahora)
+            tomado = sum(c for _, (c, _) in reservas.items())
+            if cantidad > stock - tomado:
+                return False
+            actual = reservas.get(sesion, [0, 0])[0]
+            self._reservas.setdefault(codigo, reservas)[sesion] = [actual + cantidad, ahora + self.duracion]
+        self._anotar_sesion(sesion, codigo, True)
+        return True
+
+    def liberar(self, sesion, codigo, cantidad=None):
+        codigo = str(codigo)
+        with self._bloqueo(codigo):
+            reservas = self._reservas.get(codigo, {})
+            reserva = reservas.get(sesion)
+            if reserva is None:
+                return
+            if cantidad is not None and reserva[0] > cantidad:
+                reserva[0] -= cantidad
+                return
+            del reservas[sesion]
+            if not reservas:
+                del self._reservas[codigo]
+        self._anotar_sesion(sesion, codigo, False)
+
+    def _codigos_de(self, sesion):
+        with self._bloqueo_sesiones:
+            return list(self._por_sesion.get(sesion, ()))
+
+    # Extiende el vencimiento de las reservas vigentes de la sesión (las
+    # vencidas no reviven, igual que en ReservasSQLite)
+    def renovar(self, sesion):
+        ahora = time.time()
+        for codigo in self._codigos_de(sesion):
+            with self._bloqueo(codigo):
+                reserva = self._reservas.get(codigo, {}).get(sesion)
+                if reserva is not None and reserva[1] > ahora:
+                    reserva[1] = ahora + self.duracion
+
+    def liberar_sesion(self, sesion):
+        for codigo in self._codigos_de(sesion):
+            self.liberar(sesion, codigo)
+
+class ReservasSQLite:
+    def __init__(self, duracion=DURACION_RESERVA):
+        self.duracion = duracion
+
+    def _asegurar_tablas(self):
+        asegurar_esquema('reservas', ESQUEMA_RESERVAS)
+
+    def reservado(self, codigo, excepto=None):
+        self._asegurar_tablas()
+        fila = obtener_conexion().execute(
+            "SELECT COALESCE(SUM(cantidad), 0) AS total FROM reservas WHERE codigo = ? AND vence > ? AND sesion IS NOT ?",
+            (str(codigo), time.time(), excepto)
+        ).fetchone()
+        return fila['total']
+
+    def reservado_por(self, sesion, codigo):
+        self._asegurar_tablas()
+        fila = obtener_conexion().execute(
+            "SELECT cantidad FROM reservas WHERE codigo = ? AND sesion = ? AND vence > ?",
+            (str(codigo), sesion, time.time())
+        ).fetchone()
+        return fila['cantidad'] if fila else 0
+
+    # La transacción BEGIN IMMEDIATE hace atómicos el control y la reserva entre procesos
+    def reservar(self, sesion, codigo, cantidad, stock):
+        self._asegurar_tablas()
+        codigo = str(codigo)
+        ahora = time.time()
+        with transaccion() as conexion:
+            conexion.execute("DELETE FROM reservas WHERE codigo = ? AND vence <= ?", (codigo, ahora))
+            tomado = conexion.execute(
+                "SELECT COALESCE(SUM(cantidad), 0) AS total FROM reservas WHERE codigo = ?", (codigo,)
+            ).fetchone()['total']
+            if cantidad > stock - tomado:
+                return False
+            conexion.execute(
+                "INSERT INTO reservas (codigo, sesion, cantidad, vence) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (codigo, sesion) DO UPDATE SET cantidad = cantidad + excluded.cantidad, vence = excluded.vence",
+                (codigo, sesion, int(cantidad), ahora + self.duracion)
+            )
+        return True
+
+    def liberar(self, sesion, codigo, cantidad=None):
+        self._asegurar_tablas()
+        with transaccion() as conexion:
+            if cantidad is not None:
+                conexion.execute(
+                    "UPDATE reservas SET cantidad = cantidad - ? WHERE codigo = ? AND sesion = ?",
+                    (int(cantidad), str(codigo), sesion)
+                )
+                conexion.execute("DELETE FROM reservas WHERE codigo = ? AND sesion = ? AND cantidad <= 0", (str(codigo), sesion))
+            else:
+                conexion.execute("DELETE FROM reservas WHERE codigo = ? AND sesion = ?", (str(codigo), sesion))
+
+    def renovar(self, sesion):
+        self._asegurar_tablas()
+        with transaccion() as conexion:
+            conexion.execute(
+                "UPDATE reservas SET vence = ? WHERE sesion = ? AND vence > ?",
+                (time.time() + self.duracion, sesion, time.time())
+            )
+
+    def liberar_sesion(self, sesion):
+        self._asegurar_tablas()
+        with transaccion() as conexion:
+            conexion.execute("DELETE FROM reservas WHERE sesion = ?", (sesion,))
+
+_gestor = None
+_bloqueo_gestor = threading.Lock()
+
+# Gestor único del proceso
+def obtener_gestor():
+    global _gestor
+    if _gestor is None:
+        with _bloqueo_gestor:
+            if _gestor is None:
+                if os.environ.get('SOOP_RESERVAS', '').lower() == 'sqlite':
+                    _gestor = ReservasSQLite()
+                else:
+                    _gestor = ReservasEnMemoria()
+    return _gestor
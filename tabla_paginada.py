@@ -0,0 +1,78 @@
+import pandas as pd
+import streamlit as st
+from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
+
+# ===============================
+# Tabla Paginada con Filtro y Orden en el Servidor
+# ===============================
+
+# El filtro y el orden se hacen con pandas en el servidor y al navegador
+# solo viaja la página que se está mirando, no el catálogo entero.
+
+TAMAÑOS_PAGINA = [25, 50, 100, 200]
+SIN_ORDEN = "(sin ordenar)"
+TODAS_LAS_COLUMNAS = "(todas)"
+
+# Filas que contienen el texto (sin distinguir mayúsculas) en la columna elegida o en cualquiera
+def filtrar(df, texto, columna=TODAS_LAS_COLUMNAS):
+    texto = (texto or '').strip()
+    if not texto or df.empty:
+        return df
+    columnas = df.columns if columna == TODAS_LAS_COLUMNAS else [columna]
+    coincide = pd.Series(False, index=df.index)
+    for col in columnas:
+        coincide |= df[col].astype('string').str.contains(texto, case=False, regex=False, na=False)
+    return df[coincide]
+
+# Ordena numéricamente si la columna es numérica (aunque venga como texto), si no, como texto
+def ordenar(df, columna, ascendente=True):
+    if columna == SIN_ORDEN or columna not in df.columns or df.empty:
+        return df
+    numeros = pd.to_numeric(df[columna], errors='coerce')
+    if numeros.notna().sum() >= df[columna].notna().sum():
+        clave = numeros
+    else:
+        clave = df[columna].astype('string').str.lower()
+    orden = clave.reset_index(drop=True).sort_values(ascending=ascendente, na_position='last', kind='stable').index
+    return df.iloc[orden]
+
+def _mostrar_pagina(pagina, key):
+    gb = GridOptionsBuilder.from_dataframe(pagina)
+    # El orden lo maneja el servidor; en la grilla solo se ajusta el ancho
+    gb.configure_default_column(sortable=False, filter=False, resizable=True)
+    AgGrid(
+        pagina,
+        gridOptions=gb.build(),
+        height=min(600, 35 + 30 * max(len(pagina), 1)),
+        update_mode=GridUpdateMode.NO_UPDATE,
+        fit_columns_on_grid_load=False,
+        key=f"{key}_grilla"
+    )
+
+# Tabla con búsqueda, orden y páginas. Corre como fragmento: cambiar de página
+# o de filtro vuelve a dibujar solo la tabla.
+@st.fragment
+def tabla_paginada(df, key):
+    col_texto, col_columna, col_orden, col_sentido = st.columns([3, 2, 2, 1])
+    with col_texto:
+        texto = st.text_input("Filtrar", key=f"{key}_filtro", placeholder="Texto a buscar...")
+    with col_columna:
+        columna = st.selectbox("En la columna", [TODAS_LAS_COLUMNAS] + list(df.columns), key=f"{key}_columna_filtro")
+    with col_orden:
+        columna_orden = st.selectbox("Ordenar por", [SIN_ORDEN] + list(df.columns), key=f"{key}_orden")
+    with col_sentido:
+        ascendente = st.radio("Sentido", ["↑", "↓"], key=f"{key}_sentido", horizontal=True) == "↑"
+
+    resultado = ordenar(filtrar(df, texto, columna), columna_orden, ascendente)
+
+    col_tamaño, col_pagina, col_total = st.columns([1, 1, 2])
+    with col_tamaño:
+        tamaño = st.selectbox("Filas por página", TAMAÑOS_PAGINA, key=f"{key}_tamaño")
+    paginas = max(1, -(-len(resultado) // tamaño))
+    with col_pagina:
+        pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, step=1, key=f"{key}_pagina_{paginas}")
+    with col_total:
+        st.write(f"{len(resultado):,} de {len(df):,} filas · página {pagina} de {paginas}")
+
+    inicio = (pagina - 1) * tamaño
+    _mostrar_pagina(resultado.iloc[inicio:inicio + tamaño], key)
@@ -0,0 +1,12 @@
+import threading
+import pytest
+import base_datos
+
+# Base SQLite y cachés propios del test: se trabaja en un directorio temporal
+# y se olvidan las conexiones y los esquemas ya creados en el proceso
+@pytest.fixture
+def base_temporal(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(base_datos, '_local', threading.local())
+    monkeypatch.setattr(base_datos, '_esquemas_creados', set())
+    return tmp_path
@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+from importar_proveedor import _numerico, importar_lista
+from motor_precios import REGLAS_POR_DEFECTO, COLUMNAS_PRECIOS
+
+# Costos tal como llegan en las listas de los proveedores
+def test_numerico_formatos():
+    serie = pd.Series(['1234.56', '1.234,56', '1.234', '12.345.678', '1,5', '12.5', '0.125', None])
+    esperado = [1234.56, 1234.56, 1234, 12345678, 1.5, 12.5, 0.125, np.nan]
+    np.testing.assert_allclose(_numerico(serie).to_numpy(dtype=float), esperado)
+
+def test_importar_lista_marca_costos_dudosos():
+    df = pd.DataFrame({'Codigo': ['A', 'B'], 'Nombre': ['a', 'b'], 'Costo (Pesos)': [1200.0, 100.0]})
+    df = df.assign(**{columna: 0.0 for columna in COLUMNAS_PRECIOS})
+    lista = pd.DataFrame({'Codigo': ['A', 'B'], 'Costo (Pesos)': ['1.250', '1.250']})
+    resultado, resumen, detalle, _ = importar_lista(df, lista, REGLAS_POR_DEFECTO)
+    assert resultado['Costo (Pesos)'].tolist() == [1250.0, 1250.0]
+    assert detalle.set_index('Codigo')['Revisar'].to_dict() == {'A': False, 'B': True}
+    assert resumen['costos_dudosos'] == 1
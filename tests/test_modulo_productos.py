@@ -0,0 +1,37 @@
+import os
+import shutil
+from streamlit.testing.v1 import AppTest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _pagina_productos(directorio):
+    for archivo in ['Produt2.xlsx', 'ProveedoresSoop.xlsx']:
+        shutil.copy(os.path.join(RAIZ, archivo), directorio)
+    pagina = AppTest.from_file(os.path.join(RAIZ, 'ModuloProductos.py'), default_timeout=120)
+    pagina.session_state.usuario = {'Nombre': 'Ana'}
+    return pagina.run()
+
+def _boton(pagina, texto):
+    return next(boton for boton in pagina.button if texto in boton.label)
+
+def _resultados_busqueda(pagina):
+    return [selector.options for selector in pagina.selectbox if selector.key == 'buscar_nombre_resultado']
+
+# Un alta se encuentra por nombre y, al deshacerla, el buscador deja de
+# devolverla (antes quedaba el buscador viejo, con posiciones fuera de la tabla)
+def test_busqueda_despues_de_guardar_y_deshacer(base_temporal):
+    pagina = _pagina_productos(base_temporal)
+    pagina.text_input(key='nuevo_codigo').input('ZZ-PRUEBA')
+    pagina.text_input(key='nuevo_nombre').input('Zzyzx de prueba')
+    _boton(pagina, 'Guardar Producto').click().run()
+    assert not pagina.exception
+    # La búsqueda se limpia en la recarga siguiente al guardado
+    pagina.run()
+
+    pagina.text_input(key='buscar_nombre_texto').input('Zzyzx').run()
+    assert not pagina.exception
+    assert _resultados_busqueda(pagina) == [['Zzyzx de prueba (ZZ-PRUEBA)']]
+
+    _boton(pagina, 'Deshacer mi último cambio').click().run()
+    assert not pagina.exception
+    assert _resultados_busqueda(pagina) == []
@@ -0,0 +1,37 @@
+import json
+import numpy as np
+import pandas as pd
+from motor_precios import cargar_reglas, calcular_precios, aplicar_precios, sin_cotizacion
+
+def _catalogo():
+    return pd.DataFrame({
+        'Codigo': ['PESOS', 'USD', 'SIN'],
+        'Costo (Pesos)': [100.0, 0.0, 0.0],
+        'Costo (USD)': [0.0, 10.0, 0.0],
+        'Precio Venta': [1.0, 55.0, 0.0],
+    })
+
+# Sin cotización cargada, los productos con costo solo en USD no se calculan
+# (antes se tomaba 1 USD = 1 ARS) y conservan su precio al aplicar
+def test_sin_cotizacion_no_usa_el_costo_en_usd(tmp_path):
+    reglas = cargar_reglas(tmp_path / 'no_existe.json')
+    df = _catalogo()
+    nuevos = calcular_precios(df, reglas)
+    assert nuevos['Precio Venta'].iloc[0] == 200.0
+    assert np.isnan(nuevos['Precio Venta'].iloc[1])
+    assert sin_cotizacion(df, reglas).tolist() == [False, True, False]
+    assert aplicar_precios(df, nuevos)['Precio Venta'].tolist() == [200.0, 55.0, 0.0]
+
+def test_con_cotizacion(tmp_path):
+    reglas = dict(cargar_reglas(tmp_path / 'no_existe.json'), cotizacion_dolar=1000)
+    assert calcular_precios(_catalogo(), reglas)['Precio Venta'].tolist() == [200.0, 20000.0, 0.0]
+
+# Un archivo con solo algunos recargos conserva los demás y las promociones
+def test_cargar_reglas_combina_diccionarios(tmp_path):
+    ruta = tmp_path / 'reglas_precios.json'
+    ruta.write_text(json.dumps({'recargos': {'Precio Venta': 3.0}, 'cotizacion_dolar': 900}), encoding='utf-8')
+    reglas = cargar_reglas(ruta)
+    assert reglas['recargos'] == {'Precio x Mayor': 1.5, 'Precio Venta': 3.0, 'Precio x Menor': 1.8}
+    assert len(reglas['promociones']) == 3
+    assert reglas['cotizacion_dolar'] == 900
+    calcular_precios(_catalogo(), reglas)
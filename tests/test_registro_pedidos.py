@@ -0,0 +1,94 @@
+import json
+import pytest
+from openpyxl import Workbook, load_workbook
+import registro_pedidos
+from base_datos import obtener_conexion, transaccion
+from registro_pedidos import ESQUEMA_PEDIDOS, SIN_ITEMS, migrar_items_json, importar_pedidos_excel, exportar_pedidos_excel
+from repositorio import agregar_pedido, obtener_pedido, pedidos_por_fecha, totales_de_producto
+
+ITEMS = [
+    {'Codigo': 'TM-26494', 'Nombre': 'Pulsera', 'Cantidad': 2, 'Precio': 10.5, 'Importe': 21.0, 'Unidades por Bulto': 6},
+    {'Codigo': 'AB1-DECO', 'Nombre': 'Deco', 'Cantidad': 1, 'Precio': 4.0, 'Importe': 4.0},
+]
+
+# Base nueva por test, con la migración y la importación del Excel sin hacer
+@pytest.fixture
+def base(base_temporal, monkeypatch):
+    monkeypatch.setattr(registro_pedidos, '_items_migrados', False)
+    monkeypatch.setattr(registro_pedidos, '_archivos_importados', set())
+    return base_temporal
+
+def _libro(ruta, hojas):
+    book = Workbook()
+    book.remove(book.active)
+    for nombre, filas in hojas.items():
+        sheet = book.create_sheet(nombre)
+        for fila in filas:
+            sheet.append(fila)
+    book.save(ruta)
+    return str(ruta)
+
+def _pedido(cliente='Adriana', fecha='2026-10-17'):
+    return {'cliente': cliente, 'vendedor': 'Joni', 'fecha': fecha, 'hora': '10:00', 'items': ITEMS}
+
+def test_agregar_y_leer_pedido(base):
+    archivo = _libro(base / 'productos.xlsx', {'Productos': [['Codigo']]})
+    primero = agregar_pedido(_pedido(), archivo)
+    segundo = agregar_pedido(_pedido('Beto', '2026-10-18'), archivo)
+    assert segundo == primero + 1
+
+    pedido = obtener_pedido(primero)
+    assert (pedido['cliente'], pedido['vendedor'], pedido['fecha']) == ('Adriana', 'Joni', '2026-10-17')
+    # Las claves sin columna propia vuelven desde 'datos'
+    assert pedido['items'] == ITEMS
+    assert [p['id'] for p in pedidos_por_fecha('2026-10-17', '2026-10-18')] == [primero, segundo]
+    assert [p['id'] for p in pedidos_por_fecha('2026-10-18', cliente='Beto')] == [segundo]
+    assert totales_de_producto('TM-26494') == {'unidades': 4, 'importe': 42.0, 'pedidos': 2}
+    assert obtener_conexion().execute("SELECT items FROM pedidos WHERE id = ?", (primero,)).fetchone()['items'] == SIN_ITEMS
+
+# Un pedido de las versiones anteriores (ítems en JSON) pasa a filas una sola vez
+def test_migrar_items_json(base):
+    obtener_conexion().executescript(ESQUEMA_PEDIDOS)
+    with transaccion() as conexion:
+        conexion.execute(
+            "INSERT INTO pedidos (cliente, vendedor, fecha, hora, items) VALUES (?, ?, ?, ?, ?)",
+            ('Adriana', 'Joni', '2026-10-17', '10:00', json.dumps(ITEMS))
+        )
+        conexion.execute(
+            "INSERT INTO pedidos (cliente, vendedor, fecha, hora, items) VALUES (?, ?, ?, ?, ?)",
+            ('Roto', 'Joni', '2026-10-17', '11:00', 'no es JSON')
+        )
+
+    assert obtener_pedido(1)['items'] == ITEMS
+    filas = obtener_conexion().execute("SELECT id, items FROM pedidos ORDER BY id").fetchall()
+    assert [fila['items'] for fila in filas] == [SIN_ITEMS, 'no es JSON']
+    assert migrar_items_json() == 0
+    assert len(obtener_pedido(1)['items']) == 2
+
+# Hoja 'Pedidos' de antes (JSON en 'Items') -> base -> hojas nuevas -> base
+def test_importar_y_exportar_excel(base, monkeypatch):
+    viejo = _libro(base / 'viejo.xlsx', {'Pedidos': [
+        ['ID Pedido', 'Cliente', 'Vendedor', 'Fecha', 'Hora', 'Items'],
+        [7, 'Adriana', 'Joni', '2026-10-17', '10:00', json.dumps(ITEMS)],
+        [9, 'Beto', 'Joni', '2026-10-18', '12:00', None],
+    ]})
+    assert importar_pedidos_excel(viejo) == 2
+    assert importar_pedidos_excel(viejo) == 0
+    assert obtener_pedido(7)['items'] == ITEMS
+    assert obtener_pedido(9)['items'] == []
+    # Los IDs nuevos siguen a los importados
+    assert agregar_pedido(_pedido(), viejo) == 10
+
+    assert exportar_pedidos_excel(viejo) == 3
+    book = load_workbook(viejo, read_only=True)
+    assert book['Items Pedidos'].max_row == 1 + 2 * len(ITEMS)
+    book.close()
+
+    # Otra base vacía importa las hojas exportadas (con 'Items Pedidos')
+    monkeypatch.setattr(registro_pedidos, '_archivos_importados', set())
+    with transaccion() as conexion:
+        conexion.execute("DELETE FROM lineas_pedido")
+        conexion.execute("DELETE FROM pedidos")
+    assert importar_pedidos_excel(viejo) == 3
+    assert [item['Codigo'] for item in obtener_pedido(10)['items']] == ['TM-26494', 'AB1-DECO']
+    assert obtener_pedido(7)['items'][0]['Cantidad'] == 2
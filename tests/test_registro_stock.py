@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+from registro_stock import a_entero, ajustar_stock, delta_pendiente, marca_compactacion, compactar_stock
+
+# Celdas de 'Stock' tal como llegan del Excel, del CSV convertido o de una columna Int32
+def test_a_entero_vacios():
+    for valor in [None, '', np.nan, pd.NA, pd.NaT]:
+        assert a_entero(valor) == 0
+
+def test_a_entero_numeros():
+    assert a_entero('12') == 12
+    assert a_entero('12.0') == 12
+    assert a_entero(7.0) == 7
+    assert a_entero(np.int64(3)) == 3
+
+def test_a_entero_columna_int32():
+    stock = pd.Series([5, None], dtype='Int32')
+    assert [a_entero(valor) for valor in stock] == [5, 0]
+
+# Un libro que falta o está a medio copiar no tiene marca: no compactado
+def test_marca_compactacion_libro_ilegible(base_temporal):
+    (base_temporal / 'roto.xlsx').write_bytes(b'PK\x03\x04 a medio copiar')
+    assert marca_compactacion(base_temporal / 'no_existe.xlsx') is None
+    assert marca_compactacion(base_temporal / 'roto.xlsx') is None
+    ajustar_stock('P1', -2)
+    ajustar_stock('P1', -3)
+    assert delta_pendiente('P1', None) == -5
+    # No se compacta sobre un libro que no se puede leer
+    assert compactar_stock(str(base_temporal / 'roto.xlsx')) == 0
+    assert delta_pendiente('P1', marca_compactacion(base_temporal / 'roto.xlsx')) == -5
@@ -0,0 +1,105 @@
+import threading
+import pytest
+import reservas
+from reservas import ReservasEnMemoria, ReservasSQLite, DURACION_RESERVA
+
+# Reloj manual: las reservas vencen cuando el test lo decide
+class Reloj:
+    def __init__(self):
+        self.ahora = 1_000_000.0
+
+    def time(self):
+        return self.ahora
+
+    def avanzar(self, segundos):
+        self.ahora += segundos
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(reservas, 'time', reloj)
+    return reloj
+
+# Los dos gestores (en memoria y SOOP_RESERVAS=sqlite) cumplen lo mismo
+@pytest.fixture(params=['memoria', 'sqlite'])
+def gestor(request, reloj):
+    if request.param == 'sqlite':
+        request.getfixturevalue('base_temporal')
+        return ReservasSQLite()
+    return ReservasEnMemoria()
+
+def test_reservar_hasta_el_stock(gestor):
+    assert gestor.reservar('A', 'P1', 3, stock=5)
+    assert gestor.reservar('A', 'P1', 2, stock=5)
+    assert not gestor.reservar('A', 'P1', 1, stock=5)
+    assert gestor.reservado('P1') == 5
+    assert gestor.reservado_por('A', 'P1') == 5
+    assert gestor.reservado('P1', excepto='A') == 0
+
+def test_dos_sesiones_el_mismo_producto(gestor):
+    assert gestor.reservar('A', 'P1', 3, stock=5)
+    assert not gestor.reservar('B', 'P1', 3, stock=5)
+    assert gestor.reservar('B', 'P1', 2, stock=5)
+    assert gestor.reservado('P1', excepto='B') == 3
+    assert gestor.reservado_por('B', 'P1') == 2
+    # Lo que libera una sesión queda disponible para la otra
+    gestor.liberar('A', 'P1')
+    assert gestor.reservar('B', 'P1', 3, stock=5)
+    assert gestor.reservado('P1') == 5
+
+def test_vencimiento_y_renovacion(gestor, reloj):
+    assert gestor.reservar('A', 'P1', 4, stock=5)
+    reloj.avanzar(DURACION_RESERVA - 1)
+    gestor.renovar('A')
+    reloj.avanzar(DURACION_RESERVA - 1)
+    assert gestor.reservado_por('A', 'P1') == 4
+    reloj.avanzar(1)
+    assert gestor.reservado('P1') == 0
+    # Una reserva vencida no revive al renovar y su stock es de otro
+    gestor.renovar('A')
+    assert gestor.reservado_por('A', 'P1') == 0
+    assert gestor.reservar('B', 'P1', 5, stock=5)
+
+def test_liberar_parcial_y_confirmar(gestor):
+    assert gestor.reservar('A', 'P1', 4, stock=5)
+    assert gestor.reservar('A', 'P2', 1, stock=1)
+    assert gestor.reservar('B', 'P1', 1, stock=5)
+    gestor.liberar('A', 'P1', 3)
+    assert gestor.reservado_por('A', 'P1') == 1
+    # Al guardar el pedido se confirman (quitan) todas las reservas de la sesión
+    gestor.liberar_sesion('A')
+    assert gestor.reservado_por('A', 'P1') == 0
+    assert gestor.reservado('P2') == 0
+    assert gestor.reservado_por('B', 'P1') == 1
+
+# Muchas sesiones a la vez sobre el último stock: nunca se reserva de más
+def test_reservas_concurrentes(gestor):
+    resultados = []
+    def reservar(numero):
+        resultados.append(gestor.reservar(f"S{numero}", 'P1', 1, stock=5))
+    hilos = [threading.Thread(target=reservar, args=(numero,)) for numero in range(20)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert resultados.count(True) == 5
+    assert gestor.reservado('P1') == 5
+
+def test_memoria_libera_sesiones_terminadas(reloj, monkeypatch):
+    gestor = ReservasEnMemoria()
+    assert gestor.reservar('A', 'P1', 5, stock=5)
+    monkeypatch.setattr(reservas, 'sesion_terminada', lambda sesion: sesion == 'A')
+    assert gestor.reservado('P1') == 0
+    assert gestor.reservar('B', 'P1', 5, stock=5)
+    assert gestor._codigos_de('A') == []
+
+# No quedan locks ni entradas vacías de productos que ya nadie reserva
+def test_memoria_no_acumula_bloqueos(reloj):
+    gestor = ReservasEnMemoria()
+    for numero in range(100):
+        assert gestor.reservar('A', f"P{numero}", 1, stock=1)
+    assert not gestor._bloqueos
+    gestor.liberar_sesion('A')
+    assert not gestor._reservas
+    assert not gestor._bloqueos
+    assert gestor._codigos_de('A') == []